@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+#Usage          :: CompCheck.py [--mode=symm|lean] [--tol=1.0E-6] [--keep] [driver options]
+#                               [FILE ...]
+#Purpose        :: To validate the modes of run_xDH_using_Gaussian.py which must not change
+#                  the xDH components: every FILE (default: Tests/*.gjf) runs twice,
+#                    --mode=symm : "--symm=off" against "--symm=on"
+#                    --mode=lean : the "#p" log against "--lean"
+#                  and the components of the two jobs are compared, those from the
+#                  "ENTVJ=" lines of the SCF and the T2 of the MP2 step, with the wall
+#                  time and the size of the Gaussian log. The other options starting
+#                  with "-" are passed to the driver
+#Authors        :: Igor Ying Zhang, and Xin Xu
+#Version        :: 0.2(20261018)
+#History        :: 0.1) Basic functional
+#                  0.2) "--mode=lean", and the size of the Gaussian log
+
+import sys
+import json
+import subprocess
+from glob       import glob
+from glob       import escape
+from os         import remove
+from os.path    import abspath
+from os.path    import dirname
+from os.path    import getsize
+from os.path    import isfile
+from os.path    import splitext
+from time       import time
+
+ModuDir     = dirname(abspath(__file__))
+Driver      = '%s/run_xDH_using_Gaussian.py' % ModuDir
+ModeDict    = {\
+    'symm': [('NoSymm',['--symm=off']), ('Symm',['--symm=on'])],\
+    'lean': [('Full',[]),               ('Lean',['--lean'])]\
+              }                                                      # (postfix, options)
+Mode        = 'symm'
+Tol         = 1.0E-6                                                 # Hartree
+Keep        = False
+DriverOpt   = []
+FileList    = []
+for arg in sys.argv[1:]:
+    Key, Value  = (arg.split('=',1)+[''])[:2]
+    if Key=='--mode' and Value in ModeDict:
+        Mode        = Value
+    elif Key=='--tol':
+        Tol         = float(Value)
+    elif Key=='--keep':
+        Keep        = True
+    elif Key=='--mode' or Key.lower() in ['--symm','--lean'] or \
+            Key.lower().startswith('--batch'):
+        print('Option "%s" is set by CompCheck.py' % arg)
+        sys.exit(1)
+    elif arg[0]=='-':
+        DriverOpt.append(arg)
+    else:
+        FileList.append(arg)
+if len(FileList)==0:
+    FileList    = sorted(glob('%s/Tests/*.gjf' % escape(ModuDir)))
+
+def run_Mode(FileName, Post, OptList):
+    '''Run a copy of "FileName" without "%chk" by the driver options
+    "OptList", and return (seconds, MB of the log, xDH components or None)'''
+    Base    = '%s-%s' % (splitext(FileName)[0],Post)
+    LogName = '%s/Job_%s.log' % (dirname(Base) or '.',Base.split('/')[-1])
+    with open(FileName,'r') as tmpf:
+        LineList= [x for x in tmpf.readlines() if
+                x.strip().lower().split('=')[0] not in ['%chk','%oldchk']]
+    with open('%s.gjf' % Base,'w') as tmpf:
+        tmpf.writelines(LineList)
+    TStart  = time()
+    subprocess.call([sys.executable,Driver,'--save-comp']+OptList+
+            DriverOpt+['%s.gjf' % Base],cwd=dirname(abspath(FileName)))
+    TEnd    = time()
+    Comp    = None
+    if isfile('%s.xDHComp' % Base):
+        with open('%s.xDHComp' % Base,'r') as tmpf:
+            Comp    = json.load(tmpf)
+    Size    = getsize(LogName)/1024.0**2 if isfile(LogName) else 0.0
+    if not Keep:
+        for tmpName in glob('%s.*' % escape(Base)) + glob(escape(LogName)):
+            remove(tmpName)
+    return TEnd-TStart, Size, Comp
+
+(RefPost, RefOpt), (NewPost, NewOpt) = ModeDict[Mode]
+print('%-20s%10s%10s%9s%11s%11s%11s%11s%6s' % ('Job','T(%s)' % RefPost,
+    'T(%s)' % NewPost,'SpeedUp','MB(%s)' % RefPost,'MB(%s)' % NewPost,
+    'Dev(ENTVJ)','Dev(T2)',''))
+NFail       = 0
+for FileName in FileList:
+    TRef, MRef, CompRef = run_Mode(FileName,RefPost,RefOpt)
+    TNew, MNew, CompNew = run_Mode(FileName,NewPost,NewOpt)
+    Job     = splitext(FileName.split('/')[-1])[0]
+    if CompRef==None or CompNew==None:
+        NFail  += 1
+        print('%-20s%10.1f%10.1f%9s%11.3f%11.3f%11s%11s%6s' % (Job,TRef,TNew,'-',
+            MRef,MNew,'-','-','FAIL'))
+        continue
+    DevSCF  = max([abs(CompNew[x]-CompRef[x]) for x in ['EngySCF','EnoXC']]+
+            [abs(x-y) for x, y in zip(CompNew['ExcList'][:5],CompRef['ExcList'][:5])])
+    DevPT2  = max([abs(x-y) for x, y in zip(CompNew['ExcList'][5:],CompRef['ExcList'][5:])])
+    Pass    = DevSCF<Tol and DevPT2<Tol
+    NFail  += 0 if Pass else 1
+    print('%-20s%10.1f%10.1f%9.2f%11.3f%11.3f%11.1E%11.1E%6s' % (Job,TRef,TNew,
+        TRef/TNew,MRef,MNew,DevSCF,DevPT2,'OK' if Pass else 'FAIL'))
+    sys.stdout.flush()
+sys.exit(1 if NFail>0 else 0)
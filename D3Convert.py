@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+#Usage          :: D3Convert.py pars.f dftd3.f [OUT.npz]
+#Purpose        :: To convert the reference tables of D3 into the NumPy ".npz" data file
+#                  of "dft_d.DispD3" (default OUT: d3data.npz), which is then given to
+#                  "DFTD" by "d3data" or by $XDH_D3_DATA. The tables are read from the
+#                  Fortran sources of the "dftd3" program of the Grimme group (Mulliken
+#                  Center, University of Bonn; also redistributed as "dftd3-lib"):
+#                    pars.f  : the "pars(i:j)=(/.../)" records of C6 with their
+#                              coordination numbers, 5 numbers a record,
+#                    dftd3.f : the "data r2r4 /.../" and "data rcov /.../" tables
+#                  in the fixed or free Fortran form
+#Authors        :: Igor Ying Zhang, and Xin Xu
+#Version        :: 0.1(20261018)
+#History        :: 0.1) Basic functional
+
+import sys
+import re
+import numpy as np
+
+MaxRef      = 5                                                      # References per element
+pNumb       = re.compile(r'[-+]?(?:\d+\.\d*|\.\d+)(?:[dDeE][-+]?\d+)?')
+pPars       = re.compile(r'pars\s*\(\s*(\d+)\s*:\s*(\d+)\s*\)\s*=\s*\(/(.*?)/\)',
+        re.I|re.S)
+
+def get_Numb(Text):
+    '''Return the numbers of the Fortran "Text", without the comments and
+    the continuation marks of the fixed (column 6) or free ("&") form'''
+    NumbList    = []
+    for line in Text.split('\n'):
+        if re.match(r'^[cC*]', line):                                # Fixed form comment
+            continue
+        if re.match(r'^ {5}\S', line):                               # Fixed form continuation
+            line    = line[6:]
+        line    = line.split('!')[0].replace('&',' ')
+        NumbList.extend([float(x.replace('d','e').replace('D','E'))
+            for x in pNumb.findall(line)])
+    return NumbList
+
+def get_Data(Text, Name):
+    '''Return the numbers of "data Name /.../" in "Text"'''
+    p1p     = re.search(r'data\s+%s\s*/(.*?)/' % Name, Text, re.I|re.S)
+    if p1p==None:
+        print('Error :: No "data %s" is found' % Name)
+        sys.exit(1)
+    return get_Numb(p1p.group(1))
+
+def get_Ref(Z):
+    '''Split the encoded atom "Z" of pars.f into (element, reference)'''
+    Z, IRef = int(round(Z)), 0
+    while Z>100:
+        Z, IRef = Z-100, IRef+1
+    return Z, IRef
+
+if len(sys.argv) not in [3,4]:
+    print('Usage :: D3Convert.py pars.f dftd3.f [OUT.npz]')
+    sys.exit(1)
+OutName     = sys.argv[3] if len(sys.argv)==4 else 'd3data.npz'
+with open(sys.argv[2],'r') as tmpf:
+    tmpText = tmpf.read()
+R2R4        = get_Data(tmpText,'r2r4')
+RCov        = get_Data(tmpText,'rcov')
+if len(R2R4)!=len(RCov):
+    print('Error :: %d "r2r4" but %d "rcov" are found' % (len(R2R4),len(RCov)))
+    sys.exit(1)
+NZ          = len(R2R4) + 1                                          # Indexed by IAn, 0 unused
+
+with open(sys.argv[1],'r') as tmpf:
+    tmpText = tmpf.read()
+ParsList    = []
+for p1p in pPars.finditer(tmpText):
+    tmpList = get_Numb(p1p.group(3))
+    if len(tmpList)!=int(p1p.group(2))-int(p1p.group(1))+1:
+        print('Error :: pars(%s:%s) has %d numbers' % (p1p.group(1),p1p.group(2),
+            len(tmpList)))
+        sys.exit(1)
+    ParsList.extend(tmpList)
+if len(ParsList)==0 or len(ParsList)%5!=0:
+    print('Error :: %d numbers of "pars" are found, not records of 5' % len(ParsList))
+    sys.exit(1)
+
+C6AB        = np.zeros((NZ,NZ,MaxRef,MaxRef,3))                      # C6<=0 : absent
+for C6, Z1, Z2, CN1, CN2 in np.array(ParsList).reshape(-1,5):
+    (Z1, I1), (Z2, I2) = get_Ref(Z1), get_Ref(Z2)
+    if max(Z1,Z2)>=NZ or max(I1,I2)>=MaxRef:
+        print('Error :: Record of C6 for atoms %d and %d is out of the tables'
+            % (Z1,Z2))
+        sys.exit(1)
+    C6AB[Z1,Z2,I1,I2]   = [C6, CN1, CN2]
+    C6AB[Z2,Z1,I2,I1]   = [C6, CN2, CN1]
+np.savez(OutName, c6ab=C6AB, r2r4=np.array([0.0]+R2R4), rcov=np.array([0.0]+RCov))
+print('%d C6 records of %d elements are saved in "%s"' % (len(ParsList)//5,NZ-1,
+    OutName))
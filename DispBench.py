@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+#Usage          :: DispBench.py [--atoms=10000,50000,200000] [--nproc=1,2,4,8]
+#                               [--cutoff=15.0|none] [--density=0.1] [--ictrl=0] [--seed=1]
+#Purpose        :: To benchmark the dispersion of "dft_d.DispGrim" (energy and gradient)
+#                  against the number of worker processes, on random boxes of atoms
+#                  (H to Ar) at the given density (atoms/Angstrom^3)
+#Note           :: The speed-up against the cores at 10k/50k/200k atoms is not measured
+#                  yet: so far the script ran on one core only, where the serial times
+#                  (cutoff 15 Angstrom; list/energy/gradient) are 1.4/0.8/1.2 s (10k),
+#                  11/6.3/7.9 s (50k) and 55/25/36 s (200k). Run it with "--nproc=1,2,4,8"
+#                  on a multi-core node for the scaling
+#Authors        :: Igor Ying Zhang, and Xin Xu
+#Version        :: 0.1(20261018)
+#History        :: 0.1) Basic functional
+
+import sys
+from os   import devnull
+from time import time
+try:
+    from  dft_d    import DispGrim
+except:
+    from os import getenv
+    from os.path import isfile
+    HomeDir    = getenv('HOME')                                         # STRING, Home DIR
+    if isfile('%s/.xdh_modules_path' %HomeDir):                       # Load Private Modules DIR
+        with open('%s/.xdh_modules_path'\
+                %HomeDir,'r') as tmpf:
+            ModuDir=tmpf.readline().strip()                              # STRING, PATH of my modules
+            sys.path.append(ModuDir)                                     # Append it into "sys.path"
+    else:
+        print(('Error in loading \"$HOME/.xdh_modules_path\" \n'+\
+            'which contains the absolute path for the relevant py modules'))
+        sys.exit(1)
+    from  dft_d    import DispGrim
+import numpy as np
+
+AtomList    = [10000, 50000, 200000]
+NProcList   = [1, 2, 4, 8]
+Cutoff      = 15.0
+Density     = 0.1
+ICtrl       = 0
+Seed        = 1
+for arg in sys.argv[1:]:
+    Key, Value  = (arg.split('=',1)+[''])[:2]
+    if Key=='--atoms':
+        AtomList    = [int(x) for x in Value.split(',')]
+    elif Key=='--nproc':
+        NProcList   = [int(x) for x in Value.split(',')]
+    elif Key=='--cutoff':
+        Cutoff      = None if Value.lower()=='none' else float(Value)
+    elif Key=='--density':
+        Density     = float(Value)
+    elif Key=='--ictrl':
+        ICtrl       = int(Value)
+    elif Key=='--seed':
+        Seed        = int(Value)
+    else:
+        print('Unknown option "%s"' % arg)
+        sys.exit(1)
+
+NullOut     = open(devnull,'w')                                       # Mute "DispGrim"
+print('%8s%7s%8s%12s%12s%12s%10s%10s' % ('NAtom','NProc','Cutoff',
+    'T(List)/s','T(Engy)/s','T(Grad)/s','SpeedUp','Dev.'))
+for NAtom in AtomList:
+    Rand    = np.random.default_rng(Seed)
+    Edge    = (NAtom/Density)**(1.0/3.0)
+    CList   = (Rand.random((NAtom,3))*Edge).tolist()
+    IAn     = Rand.integers(1,19,NAtom).tolist()
+    TRef    = None
+    for NProc in NProcList:
+        Disp    = DispGrim(NullOut, CList, IAn, ICtrl, 0,\
+            cutoff=Cutoff, nproc=NProc)
+        TList   = time()
+        if Disp.NeighList!=None:
+            Disp.NeighList.get_List(Disp.Coord)
+        TEngy   = time()
+        Engy    = Disp.get_EngyReal()
+        TGrad   = time()
+        Disp.get_ForcList()
+        TEnd    = time()
+        if TRef==None:
+            TRef, ERef  = TEnd-TEngy, Engy
+        print('%8d%7d%8s%12.3f%12.3f%12.3f%10.2f%10.1E' % (NAtom, NProc,
+            Cutoff, TEngy-TList, TGrad-TEngy, TEnd-TGrad,
+            TRef/(TEnd-TEngy), abs(Engy-ERef)/max(abs(ERef),1.0E-30)))
+        sys.stdout.flush()
+        del Disp
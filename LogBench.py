@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+#Usage          :: LogBench.py [--mode=parser|filter] [--size=231|1050] [--in608=0.5]
+#                              [--piece=16] [--ref=DIR] [--keep] [Job_NAME.log]
+#Purpose        :: To benchmark the Gaussian log handled by "xDH_module", on a synthetic log
+#                  of "--size" MB (default), or on a given log named "Job_NAME.log":
+#                    --mode=parser : the xDH components of "xDHLogParser"
+#                      live : the log is fed in pieces of "--piece" MB as "xDH.cut_Log"
+#                             syncs it, and the time left after the job exits is the
+#                             one of "xDH.collect_xDH_component"
+#                      cold : "xDH.collect_xDH_component" on the copied log only
+#                    --mode=filter : "xDH.filter_Log" (by "xDHLogFilter") on the log fed
+#                             in pieces of "--piece" MB, and the size of its output
+#                  with the wall time and the peak RSS of each, in its own process.
+#                  "--ref=DIR" also runs the "xDH_module.py" of DIR, like the one of an
+#                  older version by "git show REV:xDH_module.py > DIR/xDH_module.py"
+#                  The synthetic log has the xDH lines of one job, padded by rows of
+#                  printed matrices, the "--in608" fraction of which is in Link 608.
+#                  It is removed after the run unless "--keep" is given
+#Authors        :: Igor Ying Zhang, and Xin Xu
+#Version        :: 0.2(20261018)
+#History        :: 0.1) Basic functional
+#                  0.2) "--mode=filter"
+
+import sys
+import json
+import random
+import subprocess
+from os         import devnull
+from os         import remove
+from os.path    import abspath
+from os.path    import basename
+from os.path    import dirname
+from os.path    import getsize
+from os.path    import isfile
+from time       import perf_counter
+
+ModuDir     = dirname(abspath(__file__))
+Mode        = 'parser'
+Size        = None                                                   # MB
+In608       = 0.5
+Piece       = 16.0                                                   # MB
+RefDir      = None
+Keep        = False
+Run         = None                                                   # One measurement
+RunDir      = ModuDir
+LogName     = None
+for arg in sys.argv[1:]:
+    Key, Value  = (arg.split('=',1)+[''])[:2]
+    if Key=='--mode' and Value in ['parser','filter']:
+        Mode        = Value
+    elif Key=='--size':
+        Size        = float(Value)
+    elif Key=='--in608':
+        In608       = float(Value)
+    elif Key=='--piece':
+        Piece       = float(Value)
+    elif Key=='--ref':
+        RefDir      = abspath(Value)
+    elif Key=='--keep':
+        Keep        = True
+    elif Key=='--run':
+        Run         = Value
+    elif Key=='--modu':
+        RunDir      = Value
+    elif arg[0]!='-':
+        LogName     = abspath(arg)
+    else:
+        print('Unknown option "%s"' % arg)
+        sys.exit(1)
+
+SCFDone     = ' SCF Done:  E(RB3LYP) =  -56.586844110     A.U. after   12 cycles\n'
+ENTVJList   = [\
+    ' ENTVJ=    -50.565233100 Ex=    -6.123456789 Ec=    -0.300000000 ETotM2e=   -60.0\n',
+    ' ENTVJ=    -50.565233100 Ex=    -5.923456789 Ec=    -0.600000000 ETotM2e=   -60.0\n',
+    ' ENTVJ=    -50.565233100 Ex=    -6.223456789 Ec=    -0.350000000 ETotM2e=   -60.0\n'\
+              ]
+T2List      = [\
+    '     alpha-alpha T2 =       0.1188D-01 E2=     -0.3557D-01\n',
+    '     alpha-beta  T2 =       0.6158D-01 E2=     -0.2034D+00\n',
+    '     beta-beta   T2 =       0.1188D-01 E2=     -0.3557D-01\n'\
+              ]
+
+def write_Log(LogName, Size, In608):
+    '''Write the synthetic log of about "Size" MB'''
+    Rand    = random.Random(1)
+    Block   = ''.join(['%6d%6d' % (i,i) + ''.join(['%15.8f' % Rand.random()
+        for j in range(5)]) + '\n' for i in range(10000)])           # Rows of a matrix
+    NBlock  = int(Size*1024**2/len(Block))
+    N608    = int(NBlock*In608)
+    with open(LogName,'w') as tmpf:
+        tmpf.write(' Entering Gaussian System\n'
+            ' #p 6-311+g(3df,2p) sp scf=tight b3lyp iop(5/33=1) nosymm extraoverlay\n'
+            ' \n Additional overlay cards:\n ------------------\n'
+            ' 8/7=1,10=4/1; 9/16=-1/6; 6//8;\n ------------------\n')
+        for i in range(1,13):
+            tmpf.write(' Cycle %3d  Pass 1  IDiag  1:\n E= -56.5868441\n' % i)
+        for i in range(NBlock-N608):
+            tmpf.write(Block)
+        tmpf.write(SCFDone)
+        tmpf.writelines(T2List)
+        tmpf.write(' (Enter /opt/g16/l608.exe)\n')
+        tmpf.writelines(ENTVJList)
+        for i in range(N608):
+            tmpf.write(Block)
+        tmpf.write(' Leave Link  608 at Tue May 18 15:35:46 2021, MaxMem=   104857600'
+            ' cpu:               0.5 elap:               0.1\n')
+        tmpf.write(' Normal termination of Gaussian 16 at Tue May 18 15:35:46 2021.\n')
+    return
+
+def get_xDH(xDH_module, LogName):
+    '''A bare "xDH" object of the job "Job_NAME.log", for the methods of the log'''
+    class GauIO:
+        JobName         = basename(LogName)[4:-4]
+        MoreOptionDict  = {'scrf':0}
+    class OptHandle:
+        Opt             = False
+    tmpxDH          = xDH_module.xDH.__new__(xDH_module.xDH)
+    tmpxDH.GauIO    = GauIO()
+    tmpxDH.OptClass = OptHandle()
+    tmpxDH.TurnOn   = False
+    tmpxDH.IOut     = open(devnull,'w')
+    tmpxDH.WorkDir  = dirname(LogName)
+    return tmpxDH
+
+def run_One(Run, RunDir, LogName):
+    '''Run one measurement in this process, and print it as JSON'''
+    import resource
+    from os     import chdir
+    sys.path.insert(0, RunDir)
+    import xDH_module
+    chdir(dirname(LogName))
+    tmpxDH  = get_xDH(xDH_module, LogName)
+    Result  = {}
+    TStart  = perf_counter()
+    if Run=='filter':                                                # Filtered as synced
+        NOut    = 0
+        with open(LogName,'r') as tmpf:
+            while True:
+                tmpString = tmpf.read(int(Piece*1024**2))
+                if tmpString=='': break
+                NOut   += len(tmpxDH.filter_Log(tmpString))
+        if getattr(tmpxDH,'LogFilter',None)!=None:
+            NOut   += len(tmpxDH.LogFilter.flush())
+        Result['Time']  = perf_counter()-TStart
+        Result['Out']   = NOut/1024.0**2
+        Result['RSS']   = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
+        print(json.dumps(Result))
+        return
+    if Run=='live' and hasattr(xDH_module,'xDHLogParser'):           # Synced with the job
+        tmpxDH.LogParser = xDH_module.xDHLogParser()
+        with open(LogName,'r') as tmpf:
+            while True:
+                tmpString = tmpf.read(int(Piece*1024**2))
+                if tmpString=='': break
+                tmpxDH.LogParser.feed(tmpString)
+    TExit   = perf_counter()                                         # The job exits
+    if Run=='live' and hasattr(tmpxDH,'LogParser'):
+        tmpxDH.LogParser.close()
+    tmpxDH.collect_xDH_component()
+    TEnd    = perf_counter()
+    Result['Time']  = TEnd-TStart
+    Result['After'] = TEnd-TExit
+    Result['Comp']  = [tmpxDH.EngySCF] + [x for y in tmpxDH.xDHComp for x in y]
+    Result['RSS']   = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
+    print(json.dumps(Result))
+    return
+
+def get_One(Run, RunDir, LogName):
+    '''Run one measurement in a new process, and return its result'''
+    tmpString = subprocess.check_output([sys.executable,abspath(__file__),
+        '--run=%s' % Run,'--modu=%s' % RunDir,'--piece=%s' % Piece,LogName])
+    return json.loads(tmpString.decode().strip().split('\n')[-1])
+
+if Run!=None:
+    run_One(Run, RunDir, LogName)
+    sys.exit(0)
+
+Synthetic   = LogName==None
+if Size==None:
+    Size    = 231.0 if Mode=='parser' else 1050.0
+if Synthetic:
+    LogName = abspath('Job_LogBench.log')
+    write_Log(LogName, Size, In608)
+elif not basename(LogName).startswith('Job_') or not LogName.endswith('.log'):
+    print('The log "%s" should be named as "Job_NAME.log"' % LogName)
+    sys.exit(1)
+try:
+    MB      = getsize(LogName)/1024.0**2
+    print('%s the %.0f MB log "%s" in pieces of %.0f MB' % (
+        'Parse' if Mode=='parser' else 'Filter',MB,LogName,Piece))
+    if Mode=='parser':
+        print('%-8s%14s%14s%14s%14s%8s' % ('Module','T(exit)/s','RSS(live)/MB',
+            'T(cold)/s','RSS(cold)/MB','Comp'))
+    else:
+        print('%-8s%14s%14s%14s%14s' % ('Module','T/s','MB/s','Out/MB','RSS/MB'))
+    RefComp     = None
+    for Name, RunDir in [('new',ModuDir)] + ([('ref',RefDir)] if RefDir else []):
+        if Mode=='filter':
+            Filt    = get_One('filter', RunDir, LogName)
+            print('%-8s%14.2f%14.0f%14.1f%14.0f' % (Name,Filt['Time'],
+                MB/Filt['Time'],Filt['Out'],Filt['RSS']))
+            sys.stdout.flush()
+            continue
+        Live    = get_One('live', RunDir, LogName)
+        Cold    = get_One('cold', RunDir, LogName)
+        if RefComp==None:
+            RefComp = Live['Comp']
+        Same    = Live['Comp']==RefComp and Cold['Comp']==RefComp
+        print('%-8s%14.2f%14.0f%14.2f%14.0f%8s' % (Name,Live['After'],Live['RSS'],
+            Cold['Time'],Cold['RSS'],'OK' if Same else 'DIFF'))
+        sys.stdout.flush()
+finally:
+    if Synthetic and not Keep and isfile(LogName):
+        remove(LogName)
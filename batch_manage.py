@@ -0,0 +1,449 @@
+#!/bin/env python3
+#Module     :: batch_manage
+#Authors    :: Igor Ying Zhang and Xin Xu
+#Purpose    :: 1) Run many Gaussian inputs through the xDH driver in one allocation;
+#           :: 2) Pack the concurrent jobs onto the cores and memory of the node
+#              according to "%nproc" and "%mem" of each input;
+#           :: 3) Summarize E(SCF) and the xDH family energies of all jobs
+#History    :: 1.0(20261018) Build the class "BatchHandle" for the batch mode of
+#                            "run_xDH_using_Gaussian.py"
+try:
+    from  gaussian_manage  import print_Error
+    from  gaussian_manage  import print_List
+    from  gaussian_manage  import print_String
+except:
+    from os import getenv
+    from os.path import isfile
+    import sys
+    HomeDir    = getenv('HOME')                                         # STRING, Home DIR
+    if isfile('%s/.xdh_modules_path' %HomeDir):                       # Load Private Modules DIR
+        with open('%s/.xdh_modules_path'\
+                %HomeDir,'r') as tmpf:
+            ModuDir=tmpf.readline().strip()                              # STRING, PATH of my modules
+            sys.path.append(ModuDir)                                     # Append it into "sys.path"
+    else:
+        print(('Error in loading \"$HOME/.xdh_modules_path\" \n'+\
+            'which contains the absolute path for the relevant py modules'))
+        sys.exit(1)
+    from  gaussian_manage  import print_Error
+    from  gaussian_manage  import print_List
+    from  gaussian_manage  import print_String
+
+MemUnit     = {\
+        'b':1, 'w':8,\
+        'kb':1024,     'mb':1024**2,     'gb':1024**3,     'tb':1024**4,\
+        'kw':8*1024,   'mw':8*1024**2,   'gw':8*1024**3,   'tw':8*1024**4\
+              }
+DefaultMem  = 800*1024**2                                            # Default "%mem" of G16
+
+def get_MemByte(mem):
+    '''Translate the Gaussian-style memory string (like "16GB" or "800MW")
+    into bytes. A bare number is in words, as Gaussian reads it'''
+    from re import compile
+    p1  = compile(r'^\s*(?P<num>\d+(\.\d*)?)\s*(?P<unit>[a-zA-Z]*)\s*$')
+    p1p = p1.match(mem)
+    if not p1p:
+        return None
+    unit = p1p.group('unit').lower()
+    if unit=='':
+        unit = 'w'
+    if unit not in MemUnit:
+        return None
+    return int(float(p1p.group('num'))*MemUnit[unit])
+
+def get_NodeResource(nproc=None, mem=None):
+    '''Return (cores, bytes) available to the batch on this node'''
+    from os import cpu_count
+    from os import getenv
+    from os.path import isfile
+    if nproc is None:
+        for key in ['XDH_BATCH_NPROC',                              # Share of an outer batch
+                'LSB_DJOB_NUMPROC','NCPUS','PBS_NP','SLURM_CPUS_ON_NODE']:
+            try:
+                nproc = int(getenv(key))
+                break
+            except (TypeError, ValueError):
+                continue
+        else:
+            try:
+                from os import sched_getaffinity
+                nproc = len(sched_getaffinity(0))
+            except ImportError:
+                nproc = cpu_count() or 1
+    if mem is None and getenv('XDH_BATCH_MEM'):
+        mem = int(getenv('XDH_BATCH_MEM'))
+    if mem is None:
+        mem = 0
+        if isfile('/proc/meminfo'):
+            with open('/proc/meminfo','r') as tmpf:
+                for line in tmpf:
+                    if line.startswith('MemTotal:'):
+                        mem = int(line.split()[1])*1024
+                        break
+        if mem==0:
+            mem = DefaultMem*nproc
+    return nproc, mem
+
+def get_JobResource(FileName):
+    '''Read "%nproc" and "%mem" of the Gaussian input "FileName" through
+    "GauIO.MachineList", and return (cores, bytes) requested by the job'''
+    from io import StringIO
+    import gaussian_manage as gaum
+    tmpIO   = gaum.GauIO(StringIO(), FileName, 0)
+    try:
+        tmpIO.get_MachAndOpt()
+    except SystemExit:                                               # Invalid input, let the
+        return 1, DefaultMem                                         #  driver report it
+    NProc   = 1
+    Mem     = DefaultMem
+    for line in tmpIO.MachineList:
+        tmpList = line[1:].split('=',1)
+        if len(tmpList)!=2: continue
+        key     = tmpList[0].strip().lower()
+        value   = tmpList[1].strip()
+        if key in ['nproc','nprocshared','nprocs']:
+            try:
+                NProc = int(value)
+            except ValueError:
+                pass
+        elif key=='cpu':                                             # %cpu=0-7,16-23
+            NProc = 0
+            for item in value.split(','):
+                tmpRange = item.split('-')
+                try:
+                    if len(tmpRange)==1:
+                        NProc += 1
+                    else:
+                        NProc += int(tmpRange[1])-int(tmpRange[0])+1
+                except ValueError:
+                    NProc += 1
+        elif key=='mem':
+            tmpMem = get_MemByte(value)
+            if tmpMem is not None:
+                Mem = tmpMem
+    del tmpIO
+    return max(NProc,1), Mem
+
+def get_BatchInput(Target):
+    '''Expand the batch target to a list of Gaussian inputs.
+    Target is a directory, a glob pattern, a manifest listing one input
+    per line ("#" for comments), or a single input file'''
+    from glob import glob
+    from os.path import isdir
+    from os.path import isfile
+    from os.path import splitext
+    from os.path import join
+    from os.path import dirname
+    InpExt  = ['.gjf','.com','.inp']
+    if isdir(Target):
+        InpList = []
+        for ext in InpExt:
+            InpList.extend(glob(join(Target,'*%s' %ext)))
+        return sorted(InpList)
+    if isfile(Target):
+        if splitext(Target)[1].lower() in InpExt:
+            return [Target]
+        InpList = []
+        with open(Target,'r') as tmpf:
+            for line in tmpf:
+                line = line.split('#')[0].strip()
+                if len(line)==0: continue
+                if line[0]!='/':                                     # Relative to the manifest
+                    line = join(dirname(Target),line)
+                InpList.extend(sorted(glob(line)) or [line])
+        return InpList
+    return sorted(glob(Target))
+
+def get_LinkDepend(InpList):
+    '''Return the index of the section that each "--Link1--" section of
+    InpList must wait for, or None if it can start at once. A section
+    follows the last earlier one writing the same "%chk", or the one
+    writing its "%oldchk"; a section reading a checkpoint (geom=check,
+    guess=read, ...) without a "%chk" of its own follows the previous one'''
+    from io import StringIO
+    from os.path import splitext
+    from os.path import basename
+    import gaussian_manage as gaum
+    ReadKey     = ['check','read','allcheck','chkbasis']             # Options reading a chkfile
+    def get_ChkName(option):
+        return splitext(basename(option.split('=',1)[1].strip()))[0].lower()
+    ChkList     = []
+    DepList     = []
+    for i, FileName in enumerate(InpList):
+        tmpIO   = gaum.GauIO(StringIO(), FileName, 0)
+        try:
+            tmpIO.get_MachAndOpt()
+        except SystemExit:                                           # Invalid input, keep the order
+            ChkList.append(None)
+            DepList.append(i-1 if i>0 else None)
+            continue
+        ChkName = None if tmpIO.MoreOptionDict['%chk']==1 else tmpIO.ChkName.lower()
+        OldChk  = None
+        for option in tmpIO.MachineList:
+            if option.lower().startswith('%oldchk') and option.find('=')!=-1:
+                OldChk = get_ChkName(option)
+        ReadChk = OldChk!=None
+        for option in tmpIO.OptionList:
+            tmpList = option.lower().replace('(',' ').replace(')',' ')\
+                    .replace('=',' ').replace(',',' ').split()
+            if len(tmpList)>0 and tmpList[0] in ['geom','guess','geometry',
+                    'allcheck','chkbasis'] and \
+                    len(set(tmpList)&set(ReadKey))>0:
+                ReadChk = True
+        Depend  = None
+        for j in range(i-1,-1,-1):
+            if ChkList[j]!=None and ChkList[j] in [ChkName,OldChk]:
+                Depend = j
+                break
+        else:
+            if ReadChk and ChkName==None and i>0:
+                Depend = i-1
+        ChkList.append(ChkName)
+        DepList.append(Depend)
+        del tmpIO
+    return DepList
+
+def split_BatchArgv(argv):
+    '''Split the command line of the batch mode into the driver options
+    passed to every job and the batch targets'''
+    ValueOpt    = ['-p','-g','-s']                                   # Options followed by a value
+    OptList     = []
+    TargetList  = []
+    i = 1
+    while i < len(argv):
+        tmpArg = argv[i]
+        if tmpArg.lower() in ValueOpt:
+            OptList.extend(argv[i:i+2])
+            i += 2
+            continue
+        if tmpArg.lower().startswith('--batch'):                     # Batch options stay here
+            pass
+        elif tmpArg[0]=='-':
+            OptList.append(tmpArg)
+        else:
+            TargetList.append(tmpArg)
+        i += 1
+    return OptList, TargetList
+
+def collect_xDHEnergy(FileName):
+    '''Collect [(Method, Energy),...] from the xDH output file.
+    The first item is E(SCF) of the DFA, followed by the xDH family.
+    Only the energy lines printed by "xDH.collect_EngyReal" are matched,
+    not the E(...) echoed from the job title or the Gaussian log'''
+    from re import compile
+    p1  = compile(r'^  E\((?P<scf>[^)\s]+)\) *= +(?P<escf>-?\d+\.\d{8}) A\.U\.'
+            r'    E\((?P<name>[^)\s]+)\) *= +(?P<engy>-?\d+\.\d{8}) A\.U\.$')
+    p2  = compile(r'^=>E\((?P<name>[^)\s]+)\) *= +(?P<engy>-?\d+\.\d{8}) A\.U\.$')
+    EngyList = []
+    with open(FileName,'r') as tmpf:
+        for line in tmpf:
+            if len(EngyList)==0:
+                p1p = p1.match(line)
+                if p1p:
+                    EngyList.append((p1p.group('scf'),float(p1p.group('escf'))))
+                    EngyList.append((p1p.group('name'),float(p1p.group('engy'))))
+            else:
+                p2p = p2.match(line)
+                if p2p:
+                    EngyList.append((p2p.group('name'),float(p2p.group('engy'))))
+                elif not line.startswith('='):
+                    break
+    return EngyList
+
+class BatchHandle:
+    '''\
+    Run a batch of Gaussian inputs through "run_xDH_using_Gaussian.py".\n\
+    Every input is an independent driver process with its own ".xDH" file.\n\
+    The jobs are bin-packed onto the node: a job is launched as soon as\n\
+    its "%nproc" cores and "%mem" bytes fit into what is left, trying the\n\
+    largest pending jobs first.\n\
+      INPUT VARIABLES    ::\n\
+    iout                : FLOW of the batch summary file\n\
+    InpList             : LIST of Gaussian inputs\n\
+    OptList             : LIST of driver options passed to every job\n\
+    nproc, mem          : INTEGER, cores and bytes for the batch (None: the node)\n\
+    bugctrl             : INTEGER to control the print level\
+    '''
+    def __init__(self, iout, InpList, OptList, nproc=None, mem=None, bugctrl=1,
+            DepList=None):
+        '''\
+        Analyse the resource requirement of each job\n\
+        DepList[i] is the index of the job that InpList[i] waits for, or None\
+        '''
+        from os         import getenv
+        from os.path    import abspath
+        from os.path    import isfile
+        self.IOut       = iout
+        self.IPrint     = bugctrl
+        self.OptList    = OptList[:]
+        self.NProc, self.Mem = get_NodeResource(nproc, mem)
+        self.HomeDir    = getenv('HOME')                             # STRING, Home DIR
+        with open('%s/.xdh_modules_path' %self.HomeDir,'r') as tmpf:
+            self.ModuDir=tmpf.readline().strip()                     # STRING, PATH of my modules
+
+        self.JobList    = []                                         # LIST of job dictionaries
+        if DepList==None:
+            DepList     = [None]*len(InpList)
+        JobDict         = {}                                         # Index of InpList -> job
+        for i, FileName in enumerate(InpList):
+            FileName = abspath(FileName)
+            if not isfile(FileName):
+                print_String(self.IOut,
+                    'Warning: the input "%s" does not exist' % FileName,1)
+                continue
+            NProc, Mem = get_JobResource(FileName)
+            if NProc>self.NProc or Mem>self.Mem:
+                print_String(self.IOut,
+                    'Warning: "%s" requests %d cores and %d MB, more than'
+                    % (FileName,NProc,Mem//1024**2) +\
+                    ' the batch owns; it will run alone',1)
+            self.JobList.append({'Input':FileName, 'NProc':NProc,
+                'Mem':Mem, 'Status':'pending', 'Return':None,
+                'Wall':0.0, 'Energy':[],
+                'After':JobDict.get(DepList[i])})
+            JobDict[i]  = self.JobList[-1]
+        if len(self.JobList)==0:
+            print_Error(self.IOut,'No Gaussian input is found for the batch')
+        print_String(self.IOut,
+            'Batch of %d jobs on %d cores and %d MB'
+            % (len(self.JobList),self.NProc,self.Mem//1024**2),2)
+        return
+    def start_Job(self, Job, Done):
+        '''Launch one driver process, and report to the queue "Done" on exit'''
+        import sys
+        import subprocess
+        from threading import Thread
+        from time import time
+        from os import environ
+        from os.path import split
+        from os.path import splitext
+        Path, FileName = split(Job['Input'])
+        Name = splitext(FileName)[0]
+        Cmd  = [sys.executable,
+                '%s/run_xDH_using_Gaussian.py' % self.ModuDir] +\
+                self.OptList + [FileName]
+        Job['Status'] = 'running'
+        Job['Start']  = time()
+        Env  = dict(environ,                                         # For its "--Link1--" sections
+                XDH_BATCH_NPROC='%d' % min(Job['NProc'],self.NProc),
+                XDH_BATCH_MEM='%d' % min(Job['Mem'],self.Mem))
+        with open('%s/%s.out' % (Path,Name),'w') as tmpf:
+            Proc = subprocess.Popen(Cmd, cwd=Path, env=Env,
+                stdout=tmpf, stderr=subprocess.STDOUT)
+        def wait_Job():
+            Job['Return'] = Proc.wait()
+            Job['Wall']   = time()-Job['Start']
+            Done.put(Job)
+        Thread(target=wait_Job, daemon=True).start()
+        return
+    def run_Batch(self):
+        '''\
+        Schedule all jobs: first-fit on cores and memory, biggest first\
+        '''
+        from queue import Queue
+        from os.path import split
+        from os.path import splitext
+        Done        = Queue()
+        Pending     = sorted(self.JobList,
+                key=lambda x: (x['NProc'],x['Mem']), reverse=True)
+        FreeProc    = self.NProc
+        FreeMem     = self.Mem
+        NRun        = 0
+        while len(Pending)>0 or NRun>0:
+            for Job in Pending[:]:
+                if Job['After']!=None and Job['After']['Status']!='done':
+                    if Job['After']['Status'] in ['pending','running']:
+                        continue                                     # Wait for its chkfile
+                    Job['Status'] = 'skipped'
+                    Pending.remove(Job)
+                    print_String(self.IOut,
+                        'Skip "%s", as "%s" is %s'
+                        % (split(Job['Input'])[1],split(Job['After']['Input'])[1],
+                        Job['After']['Status']),1)
+                    continue
+                NProc   = min(Job['NProc'],self.NProc)
+                Mem     = min(Job['Mem'],self.Mem)
+                if NProc<=FreeProc and Mem<=FreeMem:
+                    FreeProc -= NProc
+                    FreeMem  -= Mem
+                    NRun     += 1
+                    Pending.remove(Job)
+                    self.start_Job(Job, Done)
+                    if self.IPrint>=2:
+                        print_String(self.IOut,
+                            'Start "%s" on %d cores (%d free)'
+                            % (split(Job['Input'])[1],NProc,FreeProc),1)
+            if NRun==0:                                              # Only skipped ones left
+                continue
+            Job = Done.get()                                         # Block until one finishes
+            FreeProc += min(Job['NProc'],self.NProc)
+            FreeMem  += min(Job['Mem'],self.Mem)
+            NRun     -= 1
+            Job['Status'] = 'done' if Job['Return']==0 else 'failed'
+            if Job['Status']=='done' and len(collect_xDHEnergy(
+                    '%s.xDH' % splitext(Job['Input'])[0]))==0:
+                Job['Status'] = 'failed'                             # "print_Error" exits by 0
+            if self.IPrint>=1:
+                print_String(self.IOut,
+                    '%s "%s" in %.1f s'
+                    % (Job['Status'].capitalize(),
+                    split(Job['Input'])[1],Job['Wall']),1)
+            self.IOut.flush()
+        return
+    def collect_Summary(self):
+        '''\
+        Print the table of E(SCF) and every xDH family energy of the batch\
+        '''
+        from os.path import isfile
+        from os.path import splitext
+        from os.path import split
+        from glob import glob
+        import json
+        MethList    = []
+        for Job in self.JobList:
+            Name = splitext(Job['Input'])[0]
+            OutList = ['%s.xDH' % Name] if isfile('%s.xDH' % Name) else\
+                sorted(glob('%s-Link*.xDH' % Name))
+            for OutName in OutList[:1]:
+                Job['Energy'].extend(collect_xDHEnergy(OutName))
+            if len(Job['Energy'])==0 and Job['Status']=='done':
+                Job['Status'] = 'failed'
+            for AbortName in [x[:-4]+'.xDHAbort' for x in OutList]:
+                if isfile(AbortName):                                # Stopped by "xDHAbort"
+                    with open(AbortName,'r') as tmpf:
+                        try:
+                            Job['Abort'] = json.load(tmpf)
+                        except ValueError:
+                            continue
+                    Job['Status'] = 'aborted'
+                    break
+            for xMethod, xEngy in Job['Energy'][1:]:
+                if xMethod not in MethList:
+                    MethList.append(xMethod)
+        Head    = '%-24s%8s%18s' % ('Job','Status','E(SCF)') +\
+                ''.join(['%18s' % ('E(%s)' % x) for x in MethList])
+        TmpList = [Head,'-'*len(Head)]
+        for Job in self.JobList:
+            tmpDict = dict(Job['Energy'][1:])
+            Line    = '%-24s%8s' % (splitext(split(Job['Input'])[1])[0][:24],
+                    Job['Status'])
+            if len(Job['Energy'])>0:
+                Line = Line + '%18.8f' % Job['Energy'][0][1]
+            else:
+                Line = Line + '%18s' % '-'
+            for xMethod in MethList:
+                if xMethod in tmpDict:
+                    Line = Line + '%18.8f' % tmpDict[xMethod]
+                else:
+                    Line = Line + '%18s' % '-'
+            TmpList.append(Line)
+        for Job in self.JobList:
+            if 'Abort' in Job:
+                TmpList.append('%s is aborted by "%s": %s' % (
+                    splitext(split(Job['Input'])[1])[0],
+                    Job['Abort']['Detector'],Job['Abort']['Reason']))
+        print_List(self.IOut,TmpList,2,
+            'Summary of the batch (%d jobs, %d failed) in A.U. :'
+            % (len(self.JobList),
+            len([x for x in self.JobList if x['Status']!='done'])))
+        return TmpList
@@ -0,0 +1,788 @@
+#!/bin/env python3
+#Module     :: deriv_manage
+#Authors    :: Igor Ying Zhang and Xin Xu
+#Purpose    :: 1) Numerical derivatives of the xDH energy by central differences: the
+#              displaced geometries are independent xDH single points, which run
+#              together through "batch_manage.BatchHandle";
+#           :: 2) Geometry optimization for "gaussian_manage.OptHandle" by the
+#              rational function optimization (RFO) on the BFGS-updated Hessian
+#           :: 3) Harmonic frequencies and thermochemistry by the numerical Hessian
+#           :: 4) Dipole moments and polarizabilities by finite fields
+#History    :: 1.0(20261018) Build the class "DerivHandle" for "opt" of the xDH methods
+#              1.1(20261018) "DerivHandle.run_Freq" for "freq": harmonic frequencies, normal
+#                            modes and thermochemistry; the displaced points equivalent by
+#                            the point group of the molecule run only once
+#              1.2(20261018) "DerivHandle.run_Polar" for "polar": the dipole moment and the
+#                            polarizability by the +-F and +-2F field points, Richardson
+#                            extrapolated
+#              1.3(20261018) "get_Group" and "get_PointGroup" as functions, also for the
+#                            "--symm=auto" of "xDH.check_Symm"; the points run by "--symm=off"
+try:
+    from  gaussian_manage  import print_Error
+    from  gaussian_manage  import print_List
+    from  gaussian_manage  import print_String
+except:
+    from os import getenv
+    from os.path import isfile
+    import sys
+    HomeDir    = getenv('HOME')                                         # STRING, Home DIR
+    if isfile('%s/.xdh_modules_path' %HomeDir):                       # Load Private Modules DIR
+        with open('%s/.xdh_modules_path'\
+                %HomeDir,'r') as tmpf:
+            ModuDir=tmpf.readline().strip()                              # STRING, PATH of my modules
+            sys.path.append(ModuDir)                                     # Append it into "sys.path"
+    else:
+        print(('Error in loading \"$HOME/.xdh_modules_path\" \n'+\
+            'which contains the absolute path for the relevant py modules'))
+        sys.exit(1)
+    from  gaussian_manage  import print_Error
+    from  gaussian_manage  import print_List
+    from  gaussian_manage  import print_String
+
+Br2Ang      = 0.5291772083                                           # Bohr -> Angstrom
+OptConv     = [0.00045, 0.00030, 0.00180, 0.00120]                  # Max/RMS force, Max/RMS
+                                                                     #  displacement (Gaussian)
+SymmTol     = 0.01                                                   # Bohr, to match atoms
+                                                                     #  by symmetry
+PhysDict    = {\
+    'h'    : 6.62607015E-34,   'k'    : 1.380649E-23,   'c'    : 2.99792458E10,\
+    'NA'   : 6.02214076E23,    'amu'  : 1.66053906660E-27,\
+    'Eh'   : 4.3597447222071E-18, 'atm'  : 101325.0,     'cal'  : 4.184\
+              }                                                      # SI, "c" in cm/s
+AtMass      = {\
+     1:  1.00782504,   2:  4.00260325,   3:  7.01600450,   4:  9.01218220,\
+     5: 11.00930540,   6: 12.00000000,   7: 14.00307401,   8: 15.99491464,\
+     9: 18.99840320,  10: 19.99244018,  11: 22.98976966,  12: 23.98504187,\
+    13: 26.98153841,  14: 27.97692649,  15: 30.97376151,  16: 31.97207069,\
+    17: 34.96885271,  18: 39.96238312,  19: 38.96370690,  20: 39.96259098,\
+    21: 44.95591000,  22: 47.94794700,  23: 50.94396300,  24: 51.94051000,\
+    25: 54.93804900,  26: 55.93494200,  27: 58.93320000,  28: 57.93534800,\
+    29: 62.92960100,  30: 63.92914700,  31: 68.92558100,  32: 73.92117900,\
+    33: 74.92159600,  34: 79.91652100,  35: 78.91833600,  36: 83.91150700,\
+    37: 84.91178900,  38: 87.90561400,  39: 88.90584800,  40: 89.90470400,\
+    41: 92.90637800,  42: 97.90540800,  43: 97.90721600,  44: 101.9043490,\
+    45: 102.9055040,  46: 105.9034830,  47: 106.9050930,  48: 113.9033580,\
+    49: 114.9038780,  50: 119.9021970,  51: 120.9038180,  52: 129.9062230,\
+    53: 126.9044680,  54: 131.9041550,  55: 132.9054470,  56: 137.9052410,\
+    57: 138.9063480,  72: 179.9465490,  73: 180.9479960,  74: 183.9509330,\
+    75: 186.9557530,  76: 191.9614790,  77: 192.9629240,  78: 194.9647740,\
+    79: 196.9665520,  80: 201.9706260,  81: 204.9744120,  82: 207.9766360,\
+    83: 208.9803840,  84: 208.9824160,  85: 209.9871310,  86: 222.0175700 \
+              }                                                      # Most abundant isotopes
+
+def get_CompEngy(tmpDict, xMethod=None):
+    '''Return the energy of "xMethod" (default: the xDH of the job) from the
+    xDH components saved by "xDH.dump_Comp"'''
+    import xDH_module as xDH
+    if xMethod==None: xMethod = tmpDict['xDH']
+    tmpEnergy = tmpDict['EnoXC']
+    for x,y in zip(tmpDict['ExcList'],xDH.xDH.xDHDict[xMethod][2:]):
+        tmpEnergy = tmpEnergy + x*y
+    return tmpEnergy
+
+def get_Group(X, IAn):
+    '''\
+    Return the symmetry operations [(R, Perm),...] of the geometry "X"\n\
+    (Bohr, at the center of mass) of the atomic numbers "IAn", with\n\
+    R@X[a] = X[Perm[a]] for every atom within "SymmTol". An operation is\n\
+    fixed by the images of two atoms off one line through the center,\n\
+    tried among their equivalent atoms. A linear molecule gives the\n\
+    operations of D2h (or C2v) about its principal axes\
+    '''
+    import numpy as np
+    from itertools  import permutations
+    from itertools  import product
+    IAn     = np.array(IAn)
+    Norm    = np.sqrt((X**2).sum(axis=1))
+    def get_Class(a):
+        return np.where((IAn==IAn[a])&(abs(Norm-Norm[a])<SymmTol))[0]
+    def get_Perm(R):
+        Y       = X@R.T
+        Dist    = np.sqrt(((Y[:,None,:]-X[None,:,:])**2).sum(axis=2))
+        Dist[IAn[:,None]!=IAn[None,:]] = np.inf
+        Perm    = Dist.argmin(axis=1)
+        if Dist[np.arange(len(X)),Perm].max()>SymmTol or \
+                len(set(Perm.tolist()))!=len(X):
+            return None
+        return tuple(Perm.tolist())
+    Far     = [a for a in range(len(X)) if Norm[a]>SymmTol]
+    if len(Far)==0:                                                  # One atom
+        return [(np.eye(3),tuple(range(len(X))))]
+    a       = min(Far,key=lambda x: len(get_Class(x)))
+    NonLine = [b for b in Far if
+            np.sqrt((np.cross(X[a],X[b])**2).sum())>SymmTol*Norm[b]]
+    RList   = []
+    if len(NonLine)==0:                                              # Linear molecule
+        Axis    = np.linalg.svd(X)[2].T
+        for Perm in permutations(range(3)):
+            for Sign in product([1,-1],repeat=3):
+                S   = np.zeros((3,3))
+                S[list(Perm),[0,1,2]] = Sign
+                RList.append(Axis@S@Axis.T)
+    else:
+        b       = min(NonLine,key=lambda x: len(get_Class(x)))
+        MInv    = np.linalg.inv(np.array([X[a],X[b],np.cross(X[a],X[b])]).T)
+        for a1 in get_Class(a):
+            for b1 in get_Class(b):
+                if abs(X[a1]@X[b1]-X[a]@X[b])>SymmTol*(Norm[a]+Norm[b]):
+                    continue
+                for Det in [1,-1]:
+                    R = np.array([X[a1],X[b1],
+                        Det*np.cross(X[a1],X[b1])]).T@MInv
+                    U, S, VT = np.linalg.svd(R)                      # The nearest orthogonal one
+                    RList.append(U@VT)
+    Group   = []
+    for R in RList:
+        Perm    = get_Perm(R)
+        if Perm!=None and not any([abs(R-x[0]).max()<1.0E-3 for x in Group]):
+            Group.append((R,Perm))
+    return Group
+
+def get_PointGroup(Coord, IAn):
+    '''\
+    Return (XSym, Center, Frame, Group, OpList) of the geometry "Coord"\n\
+    (Bohr) of the atomic numbers "IAn":\n\
+      Group  : the point group [(R, Perm),...] of "get_Group"\n\
+      XSym   : the geometry averaged over the point group, in the frame\n\
+               Frame@(x-Center) of the most operations which exchange the\n\
+               Cartesian axes, like the D2h subgroup\n\
+      OpList : those operations as [(Perm, Axis, Sign),...], which move\n\
+               the displacement of atom a along axis c to atom Perm[a]\n\
+               along axis Axis[c] with the sign Sign[c]\
+    '''
+    import numpy as np
+    Mass    = np.array([AtMass.get(x,2.0*x) for x in IAn])
+    X       = Coord.reshape(-1,3)
+    Center  = Mass@X/Mass.sum()
+    X       = X-Center
+    Group   = get_Group(X,IAn)
+    XSym    = np.zeros_like(X)
+    for R, Perm in Group:
+        XSym    = XSym+X[list(Perm)]@R
+    XSym    = XSym/len(Group)
+    AxisList= list(np.linalg.svd(XSym)[2])+[np.eye(3)[x] for x in range(3)]
+    for R, Perm in Group:
+        w, U    = np.linalg.eigh((R+R.T)*0.5)
+        if abs(np.trace(R)+np.linalg.det(R))<1.0E-3:                 # C2 axis or mirror normal
+            AxisList.append(U[:,0] if np.linalg.det(R)<0 else U[:,2])
+    def get_Op(R):
+        if abs(abs(R).round()-abs(R)).max()>1.0E-3:
+            return None
+        Axis    = [int(abs(R[:,c]).argmax()) for c in range(3)]
+        return Axis, [int(round(R[Axis[c],c])) for c in range(3)]
+    Best    = None
+    for z in AxisList:
+        for x in AxisList:
+            if abs(x@z)>1.0E-3: continue
+            F       = np.array([x,np.cross(z,x),z])
+            NOp     = len([R for R, Perm in Group if get_Op(F@R@F.T)!=None])
+            if Best==None or NOp>Best[0]:
+                Best    = (NOp,F)
+    Frame   = Best[1]
+    OpList  = []
+    for R, Perm in Group:
+        tmpOp   = get_Op(Frame@R@Frame.T)
+        if tmpOp!=None:
+            OpList.append((Perm,tmpOp[0],tmpOp[1]))
+    return XSym@Frame.T, Center, Frame, Group, OpList
+
+class DerivHandle:
+    '''\
+    Numerical derivatives of the xDH energy.\n\
+    Every point is a Gaussian input written from the parsed input, with the\n\
+    displaced Cartesian geometry, run by the driver in "NAME-Deriv/".\n\
+    All the points of one derivative run together, each on its share of the\n\
+    cores, and read the orbitals of the last reference point as the guess.\n\
+      INPUT VARIABLES    ::\n\
+    iout                : FLOW of output file\n\
+    GauIO               : "GauIO" of the parsed input, before "xDH" modifies it\n\
+    OptClass            : "OptHandle" of the job\n\
+    OptList             : LIST of driver options passed to every point, without\n\
+                          "--cache-clear" and with the absolute "--cache-dir="\n\
+    nproc, mem          : INTEGER, cores and bytes for the points (None: the node)\n\
+    step                : FLOAT, the displacement in Bohr\n\
+    field               : INTEGER, the field of "run_Polar" in 0.0001 a.u.\n\
+    bugctrl             : INTEGER to control the print level\
+    '''
+    def __init__(self, iout, GauIO, OptClass, OptList, nproc=None, mem=None,
+            step=0.005, field=10, bugctrl=1):
+        '''\
+        Keep a copy of the input as the template of the displaced points\
+        '''
+        from io         import StringIO
+        import numpy as np
+        import gaussian_manage as gaum
+        import batch_manage as batm
+
+        self.IOut       = iout
+        self.IPrint     = bugctrl
+        self.OptClass   = OptClass
+        self.OptList    = [x for x in OptList if x.lower()!='--save-comp' and
+                not x.lower().startswith('--symm=')] +\
+                ['--save-comp','--symm=off']                         # Points report by ".xDHComp",
+                                                                     #  not symmetrized by Gaussian
+        self.Step       = step
+        self.Field      = field
+        self.WorkDir    = GauIO.WorkDir
+        self.Name       = GauIO.JobName.replace('.','_')             # Chkfile without "."
+        self.DerivDir   = '%s/%s-Deriv' % (self.WorkDir,self.Name)
+        self.NWave      = 0                                          # INTEGER, runs of points
+        self.Seed       = None                                       # STRING, chkfile of the guess
+
+        if GauIO.MoreOptionDict['allcheck']==1 or \
+                GauIO.MoreOptionDict['checkpoint']==1 or not GauIO.CartesianFlag:
+            print_Error(self.IOut,
+                'Numerical xDH derivatives need the Cartesian geometry'
+                ' in the input')
+        self.GauIO      = gaum.GauIO(StringIO(),None,0)              # Template of the points
+        self.GauIO.copy_DataIO(GauIO)
+        self.GauIO.IOut     = StringIO()
+        self.GauIO.IPrint   = 0
+        self.GauIO.MachineList = [x for x in GauIO.MachineList if
+                x.lower().split('=')[0].strip() not in
+                ['%chk','%oldchk','%nproc','%nprocshared','%nprocs','%cpu','%mem']]
+        self.GauIO.OptionList  = [x for x in OptClass.OptionList if
+                x.lower().split('=')[0].split('(')[0] not in ['guess','p']]
+        self.NAtom      = GauIO.NAtom
+        self.Coord      = np.array(GauIO.CList,dtype=float).reshape(-1)/Br2Ang
+
+        self.NProc, self.Mem        = batm.get_NodeResource(nproc, mem)
+        self.JobProc, self.JobMem   = batm.get_JobResource(GauIO.FileName)
+        return
+    def get_Share(self, NJob):
+        '''Return (cores, bytes) of each of "NJob" points running together'''
+        JobProc = max(1,min(self.JobProc,self.NProc//max(NJob,1)))
+        NSlot   = max(1,min(NJob,self.NProc//JobProc))
+        JobMem  = min(self.JobMem,self.Mem//NSlot)
+        return JobProc, JobMem
+    def write_Job(self, Name, Coord, NProc, Mem, OptList=[], Seed=True):
+        '''Write the input "Name.com" of the geometry "Coord" (Bohr) with
+        the extra options "OptList" into "NAME-Deriv/", seeded by the
+        chkfile of "self.Seed" if it exists and "Seed" is True'''
+        import shutil
+        from io         import StringIO
+        from os         import rename
+        from os.path    import isfile
+        import gaussian_manage as gaum
+        tmpIO   = gaum.GauIO(StringIO(),None,0)
+        tmpIO.copy_DataIO(self.GauIO)
+        tmpIO.ChkName   = Name
+        tmpIO.MachineList = ['%%chk=%s' % Name, '%%nprocshared=%d' % NProc,
+                '%%mem=%dMB' % max(Mem//1024**2,1)] + tmpIO.MachineList
+        tmpIO.GeomList  = ['%-16s%16.8f%16.8f%16.8f' % (tmpIO.AtLabel[i],
+                Coord[3*i]*Br2Ang,Coord[3*i+1]*Br2Ang,Coord[3*i+2]*Br2Ang)
+                for i in range(self.NAtom)]
+        tmpIO.OptionList = tmpIO.OptionList + OptList
+        if Seed and self.Seed!=None and isfile(self.Seed):           # Orbitals of the reference
+            shutil.copy2(self.Seed,'%s/%s.chk' % (self.DerivDir,Name))
+            tmpIO.OptionList.append('guess=read')
+        tmpIO.form_Inp()
+        rename('%s.com' % Name,'%s/%s.com' % (self.DerivDir,Name))
+        del tmpIO
+        return '%s/%s.com' % (self.DerivDir,Name)
+    def run_Point(self, PointList):
+        '''\
+        Run the points [(Key, Coord[, OptList[, Seed]]),...] together,\n\
+        and return the dictionary {Key: xDH components}; "OptList" and\n\
+        "Seed" go to "write_Job". The chkfile of the point keyed by ()\n\
+        becomes the guess of the next run\
+        '''
+        import json
+        from io         import StringIO
+        from os         import mkdir
+        from os         import remove
+        from os.path    import exists
+        from os.path    import isfile
+        import batch_manage as batm
+        if not exists(self.DerivDir):
+            mkdir(self.DerivDir)
+        self.NWave += 1
+        NProc, Mem  = self.get_Share(len(PointList))
+        NameList    = ['%s-%03d-%04d' % (self.Name,self.NWave,i)
+                for i in range(len(PointList))]
+        InpList     = [self.write_Job(Name,Point[1],NProc,Mem,*Point[2:])
+                for Name, Point in zip(NameList,PointList)]
+        print_String(self.IOut,
+            'Run %d xDH points together, %d cores and %d MB each'
+            % (len(InpList),NProc,Mem//1024**2),1)
+        self.IOut.flush()
+        tmpOut      = self.IOut if self.IPrint>=2 else StringIO()
+        BatchClass  = batm.BatchHandle(tmpOut,InpList,self.OptList,
+                self.NProc,self.Mem,self.IPrint-1)
+        BatchClass.run_Batch()
+        CompDict    = {}
+        FailList    = []
+        for Name, Point in zip(NameList,PointList):
+            Key      = Point[0]
+            CompName = '%s/%s.xDHComp' % (self.DerivDir,Name)
+            if not isfile(CompName):
+                FailList.append(Name)
+                continue
+            with open(CompName,'r') as tmpf:
+                CompDict[Key] = json.load(tmpf)
+            if Key==() and isfile('%s/%s.chk' % (self.DerivDir,Name)):
+                if self.Seed!=None and isfile(self.Seed):
+                    remove(self.Seed)
+                self.Seed = '%s/%s.chk' % (self.DerivDir,Name)
+        if len(FailList)>0:
+            print_Error(self.IOut,
+                'The xDH points %s fail; see their outputs in "%s"'
+                % (', '.join(FailList),self.DerivDir))
+        if self.IPrint<2:                                            # Keep only the guess
+            for Name in NameList:
+                for tmpExt in ['com','xDH','xDHComp','xDHAbort','xDHProf','out','chk']:
+                    tmpName = '%s/%s.%s' % (self.DerivDir,Name,tmpExt)
+                    if isfile(tmpName) and tmpName!=self.Seed:
+                        remove(tmpName)
+                if isfile('%s/Job_%s.log' % (self.DerivDir,Name)):
+                    remove('%s/Job_%s.log' % (self.DerivDir,Name))
+        return CompDict
+    def get_Deriv(self, Coord, Hess=False, OpList=None):
+        '''\
+        Return the energy, the gradient (Hartree/Bohr), the Hessian\n\
+        (Hartree/Bohr^2, if "Hess") and the xDH components at "Coord".\n\
+        The 6N points +-h and, for the Hessian, the 2*3N(3N-1)/2 points\n\
+        (+h,+h) and (-h,-h) of each coordinate pair run together:\n\
+          H(i,i) = [E(+i)+E(-i)-2E0]/h^2\n\
+          H(i,j) = [E(+i+j)+E(-i-j)-E(+i)-E(-i)-E(+j)-E(-j)+2E0]/(2h^2)\n\
+        With the symmetry operations "OpList" of "get_Symm", only one point\n\
+        of each set of equivalent points is run\
+        '''
+        import numpy as np
+        h       = self.Step
+        NCoor   = len(Coord)
+        def get_Point(Key):
+            tmpCoord = Coord.copy()
+            for i, Sign in Key:
+                tmpCoord[i] += Sign*h
+            return (Key, tmpCoord)
+        KeyList = []
+        for i in range(NCoor):
+            KeyList.extend([((i,1),), ((i,-1),)])
+        if Hess:
+            for i in range(NCoor):
+                for j in range(i):
+                    KeyList.extend([((i,1),(j,1)), ((i,-1),(j,-1))])
+        if OpList==None:
+            RepDict = dict([(Key,Key) for Key in KeyList])
+        else:                                                        # Key -> the equivalent point
+            RepDict = dict([(Key,self.get_SymmKey(Key,OpList))
+                for Key in KeyList])
+            print_String(self.IOut,
+                '%d of %d displaced points are unique by symmetry'
+                % (len(set(RepDict.values())),len(KeyList)),1)
+        RepDict[()] = ()
+        PointList = [get_Point(Key) for Key in
+                sorted(set(RepDict.values())) if Key!=()]
+        if self.Seed==None:                                          # The reference goes first,
+            CompDict = self.run_Point([get_Point(())])              #   to seed the others
+            CompDict.update(self.run_Point(PointList))
+        else:
+            CompDict = self.run_Point([get_Point(())]+PointList)
+        Engy    = dict([(Key,get_CompEngy(CompDict[Rep]))
+            for Key, Rep in RepDict.items()])
+        E0      = Engy[()]
+        Grad    = np.zeros(NCoor)
+        for i in range(NCoor):
+            Grad[i] = (Engy[((i,1),)]-Engy[((i,-1),)])/(2.0*h)
+        if not Hess:
+            return E0, Grad, None, CompDict[()]
+        Hessian = np.zeros((NCoor,NCoor))
+        for i in range(NCoor):
+            Hessian[i,i] = (Engy[((i,1),)]+Engy[((i,-1),)]-2.0*E0)/h**2
+            for j in range(i):
+                Hessian[i,j] = (Engy[((i,1),(j,1))]+Engy[((i,-1),(j,-1))]
+                    -Engy[((i,1),)]-Engy[((i,-1),)]
+                    -Engy[((j,1),)]-Engy[((j,-1),)]+2.0*E0)/(2.0*h**2)
+                Hessian[j,i] = Hessian[i,j]
+        return E0, Grad, Hessian, CompDict[()]
+    def get_SymmKey(self, Key, OpList):
+        '''Return the point equivalent to the displaced point "Key" by the
+        symmetry operations "OpList", the same for all equivalent points'''
+        KeyList = [tuple(sorted([(3*Perm[i//3]+Axis[i%3],Sign[i%3]*s)
+            for i, s in Key])) for Perm, Axis, Sign in OpList]
+        return min(KeyList)
+    def get_Symm(self, Coord):
+        '''\
+        Return (XSym, Center, Frame, OpList, Sigma) of the geometry "Coord"\n\
+        by "get_PointGroup", with XSym flattened and the rotational symmetry\n\
+        number Sigma\
+        '''
+        import numpy as np
+        XSym, Center, Frame, Group, OpList = get_PointGroup(Coord,self.GauIO.IAn)
+        if np.linalg.matrix_rank(XSym,SymmTol)<2:                    # Linear: C(inf)v or D(inf)h
+            Sigma   = 2 if any([abs(R+np.eye(3)).max()<1.0E-3 for R, Perm in Group]) else 1
+        else:
+            Sigma   = len([R for R, Perm in Group if np.linalg.det(R)>0])
+        print_String(self.IOut,
+            'The point group has %d operations, %d of which reduce the'
+            ' displaced points; the rotational symmetry number is %d'
+            % (len(Group),len(OpList),Sigma),1)
+        return XSym.reshape(-1), Center, Frame, OpList, Sigma
+    def get_Internal(self, Coord):
+        '''Return the orthonormal basis (3N, 3N-6 or 3N-5) orthogonal to the
+        translations and rotations of the molecule at "Coord"'''
+        import numpy as np
+        X       = Coord.reshape(-1,3)
+        X       = X - X.mean(axis=0)
+        TR      = np.zeros((len(Coord),6))
+        for a in range(3):
+            TR[a::3,a]  = 1.0
+            TR[:,3+a]   = np.cross(np.eye(3)[a],X).reshape(-1)
+        U, S, VT= np.linalg.svd(TR)
+        NTR     = int((S>1.0E-6*S[0]).sum())
+        return U[:,NTR:]
+    def get_RFOStep(self, V, Grad, Hessian, Trust):
+        '''Return the RFO step in the internal space "V" within "Trust",
+        and its predicted energy change'''
+        import numpy as np
+        if V.shape[1]==0:
+            return np.zeros(len(Grad)), 0.0
+        w, U    = np.linalg.eigh(V.T@Hessian@V)
+        w       = np.maximum(w,0.005)
+        gt      = U.T@(V.T@Grad)
+        Aug     = np.zeros((len(w)+1,len(w)+1))
+        Aug[:-1,:-1]    = np.diag(w)
+        Aug[:-1,-1]     = gt
+        Aug[-1,:-1]     = gt
+        Lamb    = np.linalg.eigvalsh(Aug)[0]
+        tmpStep = -gt/(w-Lamb)
+        Norm    = np.sqrt((tmpStep**2).sum())
+        if Norm>Trust:
+            tmpStep = tmpStep*(Trust/Norm)
+        Step    = V@(U@tmpStep)
+        return Step, gt@tmpStep+0.5*(w*tmpStep**2).sum()
+    def get_PosHess(self, V, Hessian):
+        '''Return the Hessian in the internal space "V" with the negative
+        eigenvalues flipped and the small ones raised to 0.005 Hartree/Bohr^2,
+        since BFGS never corrects a curvature along which no step is taken'''
+        import numpy as np
+        w, U    = np.linalg.eigh(V.T@Hessian@V)
+        VU      = V@U
+        return (VU*np.maximum(abs(w),0.005))@VU.T
+    def get_ModelHess(self):
+        '''The initial Hessian without "CalcFC": 0.5 Hartree/Bohr^2 for
+        every Cartesian coordinate'''
+        import numpy as np
+        return 0.5*np.eye(3*self.NAtom)
+    def print_Geom(self, Coord, Info):
+        '''Print the Cartesian geometry (Angstrom)'''
+        print_List(self.IOut,['%-16s%16.8f%16.8f%16.8f'
+            % (self.GauIO.AtLabel[i],Coord[3*i]*Br2Ang,
+            Coord[3*i+1]*Br2Ang,Coord[3*i+2]*Br2Ang)
+            for i in range(self.NAtom)],2,Info)
+        return
+    def run_Opt(self):
+        '''\
+        Optimize the geometry, and return the xDH components at the last\n\
+        point. "OptHandle.MaxStep" (0.01 Bohr) is the trust radius;\n\
+        "CalcFC" computes the Hessian at the first point, and "CalcAll"\n\
+        at every point; otherwise the model Hessian is updated by BFGS\
+        '''
+        import numpy as np
+        OptClass    = self.OptClass
+        Coord       = self.Coord.copy()
+        MaxStep     = OptClass.MaxStep*0.01
+        Trust       = MaxStep
+        MaxCycle    = OptClass.MaxCycle if OptClass.MaxCycle>0 else\
+                max(20,6*self.NAtom)
+        Hessian     = None
+        Old         = None                                           # (E, Grad, Step, DEPred)
+        print_String(self.IOut,
+            'Geometry optimization by numerical xDH gradients'
+            ' (step %.4f Bohr, %d points per gradient)'
+            % (self.Step,6*self.NAtom+1),2)
+        for NStep in range(1,MaxCycle+1):
+            CalcHess    = OptClass.OptType==2 or \
+                    (OptClass.OptType==1 and NStep==1)
+            E0, Grad, tmpHess, Comp = self.get_Deriv(Coord,CalcHess)
+            V           = self.get_Internal(Coord)
+            if tmpHess is not None:
+                Hessian = self.get_PosHess(V,tmpHess)
+            elif Hessian is None:
+                Hessian = self.get_ModelHess()
+            elif Old!=None:                                          # BFGS update
+                s       = Old[2]
+                y       = Grad-Old[1]
+                Hs      = Hessian@s
+                if y@s>1.0E-10 and s@Hs>1.0E-10:
+                    Hessian = Hessian+np.outer(y,y)/(y@s)-np.outer(Hs,Hs)/(s@Hs)
+            if Old!=None and abs(Old[3])>1.0E-12:                    # Trust radius
+                Ratio   = (E0-Old[0])/Old[3]
+                Norm    = np.sqrt((Old[2]**2).sum())
+                if Ratio<0.25:
+                    Trust = max(0.25*Norm,0.01)
+                elif Ratio>0.75 and Norm>0.8*Trust:
+                    Trust = min(2.0*Trust,MaxStep)
+            Forc        = V@(V.T@Grad)
+            Step, DEPred= self.get_RFOStep(V,Grad,Hessian,Trust)
+            ValList     = [abs(Forc).max(), np.sqrt((Forc**2).mean()),
+                    abs(Step).max(), np.sqrt((Step**2).mean())]
+            ConvList    = [x<y for x, y in zip(ValList,OptConv)]
+            print_String(self.IOut,
+                'Step %3d :: E(%s) = %16.8f A.U.'
+                % (NStep,Comp['xDH'],E0),1)
+            print_List(self.IOut,['%-22s%12.6f%12.6f%8s'
+                % (x,y,z,'YES' if c else 'NO') for x,y,z,c in
+                zip(['Maximum Force','RMS     Force',
+                'Maximum Displacement','RMS     Displacement'],
+                ValList,OptConv,ConvList)],2,
+                '%-20s%12s%12s%12s' % ('Item','Value','Threshold','Converged?'))
+            self.IOut.flush()
+            if all(ConvList) or (ValList[0]<OptConv[0]*0.01 and
+                    ValList[1]<OptConv[1]*0.01):
+                OptClass.Conv   = True
+                break
+            Old         = (E0, Grad, Step, DEPred)
+            Coord       = Coord+Step
+            self.write_Geom(Coord)
+        if OptClass.Conv:
+            print_String(self.IOut,
+                'Optimization completed in %d steps' % NStep,1)
+        else:
+            print_String(self.IOut,
+                'Optimization stopped: the number of steps exceeds %d'
+                % MaxCycle,1)
+        self.Coord      = Coord
+        self.print_Geom(Coord,'%s geometry (Angstrom) ::'
+            % ('Optimized' if OptClass.Conv else 'Last'))
+        return Comp
+    def run_Freq(self, Coord=None):
+        '''\
+        Harmonic frequencies and thermochemistry at "Coord" (default: the\n\
+        input, or the last geometry of "run_Opt"), and return the xDH\n\
+        components there. The geometry is symmetrized first, and the\n\
+        Hessian (Hartree/Bohr^2) in the input orientation is kept in\n\
+        "GauIO.HessList" as the lower triangle by rows\
+        '''
+        import numpy as np
+        if Coord is None: Coord = self.Coord
+        IOClass     = self.OptClass.IOClass
+        NCoor       = 3*self.NAtom
+        print_String(self.IOut,
+            'Harmonic frequencies by the numerical xDH Hessian (step %.4f Bohr)'
+            % self.Step,2)
+        XSym, Center, Frame, OpList, Sigma = self.get_Symm(Coord)
+        E0, Grad, Hessian, Comp = self.get_Deriv(XSym,True,OpList)
+        Q           = np.kron(np.eye(self.NAtom),Frame)              # Back to the input orientation
+        Grad        = Q.T@Grad
+        Hessian     = Q.T@Hessian@Q
+        X           = (XSym.reshape(-1,3)@Frame+Center).reshape(-1)
+        IOClass.ForcList = (-Grad).tolist()
+        IOClass.HessList = Hessian[np.tril_indices(NCoor)].tolist()
+        self.Coord  = X
+        self.print_Geom(X,'Symmetrized geometry (Angstrom) ::')
+        Freq, Mode  = self.get_Freq(X,Hessian)
+        self.get_Thermo(X,Freq,E0,Sigma)
+        return Comp
+    def get_Freq(self, X, Hessian):
+        '''Return the harmonic frequencies (cm^-1, imaginary ones negative)
+        and the normalized Cartesian normal modes (3N, NVib) of the Hessian
+        at the geometry "X", and print them like Gaussian'''
+        import numpy as np
+        IAn     = self.GauIO.IAn
+        Mass    = np.array([AtMass.get(x,2.0*x) for x in IAn])
+        M3      = np.repeat(Mass,3)
+        if self.NAtom==1:
+            return np.zeros(0), np.zeros((3,0))
+        XC      = X.reshape(-1,3)-Mass@X.reshape(-1,3)/Mass.sum()
+        TR      = np.zeros((len(X),6))                               # Mass-weighted
+        for a in range(3):
+            TR[a::3,a]  = np.sqrt(Mass)
+            TR[:,3+a]   = (np.cross(np.eye(3)[a],XC)*np.sqrt(Mass)[:,None]).reshape(-1)
+        U, S, VT= np.linalg.svd(TR)
+        V       = U[:,int((S>1.0E-6*S[0]).sum()):]
+        w, L    = np.linalg.eigh(V.T@(Hessian/np.sqrt(np.outer(M3,M3)))@V)
+        Conv    = PhysDict['Eh']/(Br2Ang*1.0E-10)**2/PhysDict['amu']  # Hartree/(Bohr^2 amu) -> s^-2
+        Freq    = np.sign(w)*np.sqrt(abs(w)*Conv)/(2.0*np.pi*PhysDict['c'])
+        Mode    = (V@L)/np.sqrt(M3)[:,None]
+        RedMass = 1.0/(Mode**2).sum(axis=0)
+        Mode    = Mode*np.sqrt(RedMass)
+        FrcCons = (2.0*np.pi*PhysDict['c']*Freq)**2*RedMass*PhysDict['amu']*0.01
+        FrcCons = FrcCons*np.sign(Freq)                              # N/m -> mDyne/A
+        TmpList = []
+        for k0 in range(0,len(Freq),3):
+            Cols    = range(k0,min(k0+3,len(Freq)))
+            TmpList.append(' '*14+''.join(['%23d' % (k+1) for k in Cols]))
+            for Info, tmpList in [('Frequencies --',Freq),
+                    ('Red. masses --',RedMass),('Frc consts  --',FrcCons)]:
+                TmpList.append(Info+''.join(['%23.4f' % tmpList[k] for k in Cols]))
+            TmpList.append('Atom  AN'+'      X      Y      Z'.rjust(23)*len(Cols))
+            for a in range(self.NAtom):
+                TmpList.append('%4d%4d' % (a+1,IAn[a])+''.join(['%9.2f%7.2f%7.2f'
+                    % tuple(Mode[3*a:3*a+3,k]) for k in Cols]))
+        print_List(self.IOut,TmpList,2,
+            'Harmonic frequencies (cm**-1), reduced masses (AMU), force constants'
+            ' (mDyne/A) and normal coordinates ::')
+        NImag   = int((Freq<0.0).sum())
+        if NImag>0:
+            print_String(self.IOut,
+                '%d imaginary frequencies (negative signs), not counted in the'
+                ' thermochemistry' % NImag,1)
+        return Freq, Mode
+    def get_Thermo(self, X, Freq, E0, Sigma):
+        '''\
+        Print the ideal-gas, rigid-rotor, harmonic-oscillator thermochemistry\n\
+        at "OptHandle.Temp" and "OptHandle.Pres" like Gaussian, and return\n\
+        the corrections [ZPE, E, H, G] (Hartree) to the energy "E0"\
+        '''
+        import numpy as np
+        h, k, c = PhysDict['h'], PhysDict['k'], PhysDict['c']
+        R       = k*PhysDict['NA']                                   # J/(mol K)
+        T       = self.OptClass.Temp
+        P       = self.OptClass.Pres*PhysDict['atm']
+        Mass    = np.array([AtMass.get(x,2.0*x) for x in self.GauIO.IAn])
+        kT      = k*T/PhysDict['Eh']                                 # Hartree
+        qTrans  = (2.0*np.pi*Mass.sum()*PhysDict['amu']*k*T/h**2)**1.5*k*T/P
+        STrans  = R*(np.log(qTrans)+2.5)
+        ETrans  = 1.5*kT
+        XC      = X.reshape(-1,3)-Mass@X.reshape(-1,3)/Mass.sum()
+        Inertia = np.linalg.eigvalsh((Mass*(XC**2).sum(axis=1)).sum()*np.eye(3)
+                -(XC.T*Mass)@XC)*PhysDict['amu']*(Br2Ang*1.0E-10)**2
+        Inertia = Inertia[Inertia>1.0E-50]
+        ThetaR  = h**2/(8.0*np.pi**2*Inertia*k)
+        if len(ThetaR)==0:                                           # Atom
+            SRot, ERot  = 0.0, 0.0
+        elif len(ThetaR)<3:                                          # Linear
+            SRot    = R*(np.log(T/(Sigma*ThetaR[-1]))+1.0)
+            ERot    = kT
+        else:
+            SRot    = R*(np.log(np.sqrt(np.pi)/Sigma*T**1.5/np.sqrt(ThetaR.prod()))+1.5)
+            ERot    = 1.5*kT
+        ThetaV  = h*c*Freq[Freq>0.0]/k
+        ZPE     = 0.5*h*c*Freq[Freq>0.0].sum()/PhysDict['Eh']
+        EVib    = ZPE+(h*c*Freq[Freq>0.0]/PhysDict['Eh']/(np.exp(ThetaV/T)-1.0)).sum()
+        SVib    = R*((ThetaV/T)/(np.exp(ThetaV/T)-1.0)-np.log(1.0-np.exp(-ThetaV/T))).sum()
+        SElec   = R*np.log(max(self.GauIO.Spin,1))
+        STot    = STrans+SRot+SVib+SElec
+        ECorr   = ETrans+ERot+EVib
+        HCorr   = ECorr+kT
+        GCorr   = HCorr-T*STot/PhysDict['NA']/PhysDict['Eh']
+        Cal     = PhysDict['cal']
+        TmpList = [\
+            'Temperature %9.3f Kelvin.  Pressure %9.5f Atm.'
+                % (T,self.OptClass.Pres),
+            'Rotational symmetry number %2d.' % Sigma,
+            'Zero-point correction=%29.6f (Hartree/Particle)' % ZPE,
+            'Thermal correction to Energy=%22.6f' % ECorr,
+            'Thermal correction to Enthalpy=%20.6f' % HCorr,
+            'Thermal correction to Gibbs Free Energy=%11.6f' % GCorr,
+            'Sum of electronic and zero-point Energies=%20.6f' % (E0+ZPE),
+            'Sum of electronic and thermal Energies=%23.6f' % (E0+ECorr),
+            'Sum of electronic and thermal Enthalpies=%21.6f' % (E0+HCorr),
+            'Sum of electronic and thermal Free Energies=%18.6f' % (E0+GCorr),
+            '%-16s%16s' % ('','S (Cal/Mol-K)'),
+            '%-16s%16.3f' % ('Total',STot/Cal),
+            '%-16s%16.3f' % ('Electronic',SElec/Cal),
+            '%-16s%16.3f' % ('Translational',STrans/Cal),
+            '%-16s%16.3f' % ('Rotational',SRot/Cal),
+            '%-16s%16.3f' % ('Vibrational',SVib/Cal)\
+                  ]
+        print_List(self.IOut,TmpList,2,'Thermochemistry ::')
+        return [ZPE, ECorr, HCorr, GCorr]
+    def run_Polar(self, Coord=None):
+        '''\
+        The dipole moment and the polarizability at "Coord" (default: the\n\
+        input, or the last geometry of "run_Opt") by the uniform fields\n\
+        +-F and +-2F of "field=" (F = "self.Field"*0.0001 a.u.), and return\n\
+        the xDH components there. Along each axis a:\n\
+          mu(a)      = -[E(+F)-E(-F)]/(2F)\n\
+          alpha(a,a) = -[E(+F)+E(-F)-2E0]/F^2\n\
+        and both are Richardson extrapolated, X = [4X(F)-X(2F)]/3, which\n\
+        cancels the F^2 error. The field of "field=" has one direction, so\n\
+        alpha(a,b) comes from alpha(n,n) of n = (a+b)/sqrt(2), by the\n\
+        geometry rotated to put n on the axis a. The results are kept in\n\
+        "GauIO.DipoList" and "GauIO.PolaList" (xx, xy, yy, xz, yz, zz)\
+        '''
+        import numpy as np
+        if Coord is None: Coord = self.Coord
+        IOClass     = self.OptClass.IOClass
+        if any([x.lower().startswith('field') for x in self.GauIO.OptionList]):
+            print_Error(self.IOut,
+                'Finite-field polarizabilities do not work with "field=" in the input')
+        F           = self.Field*1.0E-4
+        AxisList    = ['x','y','z']
+        PairList    = [(0,1), (0,2), (1,2)]
+        print_String(self.IOut,
+            'Dipole moment and polarizability by finite xDH fields'
+            ' (F = %.4f a.u.)' % F,2)
+        def get_Point(Key, tmpCoord, Seed):
+            Axis, n = Key[-2:]
+            return (Key, tmpCoord, ['field=%s%+d' % (AxisList[Axis],n*self.Field)],
+                    Seed)
+        PointList   = [get_Point((a,n),Coord,True)
+                for a in range(3) for n in [1,-1,2,-2]]
+        for k, (a, b) in enumerate(PairList):                       # n = (a+b)/sqrt(2) -> a
+            R       = np.eye(3)
+            R[a,a], R[a,b], R[b,a], R[b,b] = [np.sqrt(0.5)*x for x in [1,1,-1,1]]
+            tmpCoord= (Coord.reshape(-1,3)@R.T).reshape(-1)
+            PointList.append((('Rot',k), tmpCoord, [], False))       # The rotated reference
+            PointList.extend([get_Point(('Rot',k,a,n),tmpCoord,False)
+                for n in [1,-1,2,-2]])
+        if self.Seed==None:                                          # The reference goes first,
+            CompDict = self.run_Point([((),Coord)])                 #   to seed the others
+            CompDict.update(self.run_Point(PointList))
+        else:
+            CompDict = self.run_Point([((),Coord)]+PointList)
+        Engy        = dict([(Key,get_CompEngy(Comp))
+            for Key, Comp in CompDict.items()])
+        def get_Diff(Ref, Key):
+            '''Return [mu, alpha] by F, by 2F and extrapolated'''
+            Diff    = []
+            for n in [1,2]:
+                Ep, Em  = Engy[Key+(n,)], Engy[Key+(-n,)]
+                Diff.append([-(Ep-Em)/(2.0*n*F), -(Ep+Em-2.0*Engy[Ref])/(n*F)**2])
+            Diff.append([(4.0*x-y)/3.0 for x, y in zip(*Diff)])
+            return Diff
+        Dipo        = np.zeros((3,3))                                # (F, 2F, extrap.) x axis
+        Pola        = np.zeros((3,3,3))
+        for a in range(3):
+            Diff    = get_Diff((),(a,))
+            for l in range(3):
+                Dipo[l,a], Pola[l,a,a] = Diff[l]
+        for k, (a, b) in enumerate(PairList):
+            Diff    = get_Diff(('Rot',k),('Rot',k,a))
+            for l in range(3):
+                Pola[l,a,b] = Diff[l][1]-0.5*(Pola[l,a,a]+Pola[l,b,b])
+                Pola[l,b,a] = Pola[l,a,b]
+        IOClass.DipoList = Dipo[2].tolist()
+        IOClass.PolaList = [Pola[2][i,j] for i in range(3) for j in range(i+1)]
+        TmpList = ['%-10s%16s%16s%16s' % ('','F','2F','Extrap.')]
+        for a in range(3):
+            TmpList.append('%-10s%16.6f%16.6f%16.6f'
+                % tuple(['mu(%s)' % AxisList[a]]+Dipo[:,a].tolist()))
+        for i in range(3):
+            for j in range(i+1):
+                TmpList.append('%-10s%16.6f%16.6f%16.6f'
+                    % tuple(['a(%s%s)' % (AxisList[j],AxisList[i])]
+                    +Pola[:,j,i].tolist()))
+        print_List(self.IOut,TmpList,2,
+            'Dipole moment and polarizability (a.u.) in the input orientation ::')
+        w           = np.linalg.eigvalsh(Pola[2])
+        print_String(self.IOut,
+            'Dipole moment = %.6f a.u. (%.4f Debye); isotropic polarizability'
+            ' = %.6f a.u., anisotropy = %.6f a.u.' % (np.sqrt((Dipo[2]**2).sum()),
+            np.sqrt((Dipo[2]**2).sum())*2.541746, w.mean(),
+            np.sqrt(0.5*((w[0]-w[1])**2+(w[1]-w[2])**2+(w[2]-w[0])**2))),1)
+        return CompDict[()]
+    def write_Geom(self, Coord):
+        '''Update "GeomOpt/geom" of "OptHandle" by the geometry "Coord"'''
+        with open('%s/GeomOpt/geom' % self.WorkDir,'w') as tmpf:
+            tmpf.write('%5i\n' % self.NAtom)
+            for i in range(self.NAtom):
+                tmpf.write('%-16s%16.8f%16.8f%16.8f\n' % (self.GauIO.AtLabel[i],
+                    Coord[3*i]*Br2Ang,Coord[3*i+1]*Br2Ang,Coord[3*i+2]*Br2Ang))
+        return
+    def clean_Deriv(self):
+        '''Copy the last guess back to the chkfile of the input, and remove
+        "NAME-Deriv/" unless the print level is 2 or more'''
+        import shutil
+        from os.path    import exists
+        from os.path    import isfile
+        if self.Seed!=None and isfile(self.Seed) and \
+                self.OptClass.IOClass.MoreOptionDict['%chk']==0:
+            shutil.copy2(self.Seed,'%s/%s.chk'
+                % (self.WorkDir,self.OptClass.IOClass.ChkName))
+        if self.IPrint<2 and exists(self.DerivDir):
+            shutil.rmtree(self.DerivDir)
+        return
@@ -2,8 +2,8 @@
 # Module	:: dft_d
 # Authors	:: Igor Ying Zhang, and Xin Xu
 # Purpose	:: To handle dispersion contribution for molecular systems
-__Version__ = 'V2.1(20091101)'
-# Revise    :: 2009-11-01
+__Version__ = 'V4.0(20261018)'
+# Revise    :: 2026-10-18
 #
 # History   :: V1.0(20090907) :: 1) build new class "DFTD" to handle DFT+D scheme, cooperating
 #                                   with Gaussian package.
@@ -31,7 +31,61 @@ __Version__ = 'V2.1(20091101)'
 #                                   based on developed twelve-order coefficients.
 #              V2.2(20100717) :: 1) Add four input arguments for D parameters fitting:
 #                                   1: self.R0Para; 2: self.C6Para; 3: self.C12Para; 4: self.DPara
+#              V3.0(20261018) :: 1) "DispGrim.get_EngyReal" works on NumPy arrays: the atom pairs
+#                                   are generated in tiles by "DispGrim.get_PairTile", and the
+#                                   pair terms of all "ICtrl" are evaluated by "get_PairEngy".
+#                                2) Load the print functions from "gaussian_manage" instead of
+#                                   the retired "my_io"
+#              V3.1(20261018) :: 1) Analytic dispersion gradient for all "ICtrl" in
+#                                   "DispGrim.get_ForcList", from the radial derivatives of
+#                                   "DispGrim.get_PairDeri", and its finite-difference check
+#                                   "DispGrim.check_ForcList"
+#              V3.2(20261018) :: 1) Analytic dispersion Hessian in "DispGrim.get_HessList", full or
+#                                   packed lower triangle; complete "get_DampHess" and
+#                                   "get_HessSix"
+#              V3.3(20261018) :: 1) Optional cutoff of the pairs in "DispGrim", with the new class
+#                                   "DispNeigh" (cell list + neighbor list with skin) and the
+#                                   tail estimate "DispGrim.get_EngyTail"
+#              V3.4(20261018) :: 1) "DispGrim.get_EngyReal" and "get_ForcList" may run on "nproc"
+#                                   worker processes sharing the arrays ("run_DispPool")
+#              V3.5(20261018) :: 1) New class "DispBatch" to evaluate the dispersion of many
+#                                   molecules for many parameter sets at once
+#              V3.6(20261018) :: 1) New class "DispTraj" to stream the dispersion energy and
+#                                   gradient over trajectories; the pair parameters are
+#                                   gathered by "DispGrim.get_PairPara"
+#              V3.7(20261018) :: 1) New class "DispMC" for incremental dispersion along Monte
+#                                   Carlo moves, with accept/reject
+#              V3.8(20261018) :: 1) New class "DispD3" for the D3(BJ) dispersion with the ATM
+#                                   term, used by "DFTD" for the methods of "DFTD.D3Dict"
+#              V3.9(20261018) :: 1) The pair decomposition of "DispGrim.get_EngyReal" is streamed
+#                                   tile by tile to the output, or to a binary file "pairout"
+#              V4.0(20261018) :: 1) Z x Z tables of the combined parameters, shared by all
+#                                   "DispGrim" of the default parameters ("get_ParaTable")
+#                                2) The pair indices of small molecules are shared as well
 #                                   
+try:
+    from  gaussian_manage  import print_Error
+    from  gaussian_manage  import print_List
+    from  gaussian_manage  import print_String
+    from  gaussian_manage  import my_plus
+except:
+    from os import getenv
+    from os.path import isfile
+    import sys
+    HomeDir    = getenv('HOME')                                         # STRING, Home DIR
+    if isfile('%s/.xdh_modules_path' %HomeDir):                       # Load Private Modules DIR
+        with open('%s/.xdh_modules_path'\
+                %HomeDir,'r') as tmpf:
+            ModuDir=tmpf.readline().strip()                              # STRING, PATH of my modules
+            sys.path.append(ModuDir)                                     # Append it into "sys.path"
+    else:
+        print(('Error in loading \"$HOME/.xdh_modules_path\" \n'+\
+            'which contains the absolute path for the relevant py modules'))
+        sys.exit(1)
+    from  gaussian_manage  import print_Error
+    from  gaussian_manage  import print_List
+    from  gaussian_manage  import print_String
+    from  gaussian_manage  import my_plus
 
 
 class DispGrim:
@@ -101,16 +155,31 @@ class DispGrim:
                   ]                                                  # R0Para (in Anstrom)
 
     DPara   = 20.0                                                   # Damp parameter
+    TileSize= 2**20                                                  # Atom pairs in one tile
+    ParaTable   = None                                               # Z x Z tables of the default
+                                                                     #  parameters, see "get_ParaTable"
+    PairIndex   = {}                                                 # (I, J) of all pairs of small
+    PairIndexMax= 256                                                #  molecules, up to this size
 
     def __init__(self, iout, clist, ian, iop=0, bugctrl=0,\
-        c6para=None, c12para=None, r0para=None, dpara=None):
+        c6para=None, c12para=None, r0para=None, dpara=None,\
+        cutoff=None, skin=2.0, nproc=1, pairout=None):
         '''\
-        Initialize parameters in this class\
+        Initialize parameters in this class\n\
+        cutoff  : REAL, cutoff radius (Angstrom) of the pairs, evaluated\n\
+                  by the neighbor list "DispNeigh"; all pairs if None\n\
+        skin    : REAL, skin distance (Angstrom) of the neighbor list\n\
+        nproc   : INTEGER, worker processes for "get_EngyReal" and\n\
+                  "get_ForcList" (see "run_DispPool")\n\
+        pairout : STRING, file to stream the pair decomposition of\n\
+                  "get_EngyReal" into, as binary records ("get_PairType")\
         '''
-        from my_io import print_Error
+        import numpy as np
         self.IOut   = iout
         self.CList  = clist
         self.IAn    = ian
+        self.Coord  = np.array(clist,dtype=float).reshape(-1,3)      # ARRAY(N,3), in Angstrom
+        self.IAnArr = np.array(ian,dtype=int)                        # ARRAY(N)
         self.IPrint = bugctrl
         self.ICtrl  = iop                                            # ICtrl = 0 : Grimme Disp.
                                                                      #         1 : 6-order term
@@ -120,6 +189,15 @@ class DispGrim:
         self.EngyReal = 0.0
         self.ForcList = []
         self.HessList = []
+        self.EngyTail = 0.0                                          # Estimated disp. beyond cutoff
+        self.Cutoff   = cutoff
+        self.NProc    = max(1, int(nproc))                           # Worker processes
+        self.PairOut  = pairout                                      # Binary pair decomposition
+        self.Table    = None                                         # Z x Z parameter tables
+        if cutoff==None:
+            self.NeighList = None
+        else:
+            self.NeighList = DispNeigh(iout, cutoff, skin, bugctrl)
 
         if r0para==None:                                             # Now loading dispersion parameters
             self.R0Para = DispGrim.R0Para[:]
@@ -171,239 +249,555 @@ class DispGrim:
         YTerm   = Factor * (Atom1[1]-Atom2[1])
         ZTerm   = Factor * (Atom1[2]-Atom2[2])
         return (XTerm, YTerm, ZTerm)
-    def get_EngyReal(self):
+    def set_Coord(self, clist):
         '''\
-        Calculate the dispersion energy\
+        Move the atoms to the new geometry "clist" (in Angstrom)\
         '''
-        from my_io import print_String
-        from my_io import print_List
-        from my_io import print_List_free
-        from math  import sqrt
-        if len(self.IAn)==1:
-            self.EngyReal   = 0.0
-            print_String(self.IOut,'E(%s)%s= %16.8f A.U. '
-                %('Disp',' '*5,self.EngyReal),2)
-            return self.EngyReal
+        import numpy as np
+        self.CList  = clist
+        self.Coord  = np.array(clist,dtype=float).reshape(-1,3)
+        return
+    def get_TaskList(self):
+        '''\
+        Split the pair space (i>j) into tasks of about "TileSize" pairs :\n\
+            (0, i0, i1) : the rows i0 <= i < i1 of all pairs\n\
+            (1, k0, k1) : the pairs k0 <= k < k1 of the neighbor list\n\
+        in the order of the former double loops\
+        '''
+        NAtom   = len(self.IAnArr)
+        if self.NeighList!=None:
+            NPair   = len(self.NeighList.get_List(self.Coord)[0])
+            return [(1, k0, min(NPair, k0+DispGrim.TileSize))
+                for k0 in range(0, NPair, DispGrim.TileSize)]
+        NRow    = max(1, DispGrim.TileSize//max(NAtom,1))           # Rows i of one tile
+        return [(0, i0, min(NAtom, i0+NRow)) for i0 in range(1, NAtom, NRow)]
+    def get_PairTask(self, Task):
+        '''\
+        Generate the atom pairs of one task of "get_TaskList"; with\n\
+        "Cutoff", only the pairs within it are kept\n\
+        Return :: I, J (ARRAY of atom index), RVec (ARRAY(M,3), R_i-R_j), Rij\
+        '''
+        import numpy as np
+        Kind, k0, k1    = Task
+        if Kind==1:
+            I       = self.NeighList.I[k0:k1]
+            J       = self.NeighList.J[k0:k1]
+        elif k0==1 and k1==len(self.IAnArr)<=DispGrim.PairIndexMax:   # Whole small molecule
+            if k1 not in DispGrim.PairIndex:
+                DispGrim.PairIndex[k1]  = np.tril_indices(k1, -1)
+            I, J    = DispGrim.PairIndex[k1]
+        else:
+            NCol    = np.arange(k0, k1)                              # Pairs of each row
+            I       = np.repeat(NCol, NCol)
+            J       = np.arange(NCol.sum()) - np.repeat(np.cumsum(NCol)-NCol, NCol)
+        RVec    = self.Coord[I] - self.Coord[J]
+        Rij     = np.sqrt((RVec*RVec).sum(axis=1))
+        if self.Cutoff!=None:
+            Keep    = Rij < self.Cutoff
+            return I[Keep], J[Keep], RVec[Keep], Rij[Keep]
+        return I, J, RVec, Rij
+    def get_PairTile(self):
+        '''\
+        Generate the atom pairs (i>j) tile by tile, in the order of the\n\
+        former double loops, with at most about "TileSize" pairs a tile\n\
+        With "Cutoff", only the pairs within it are generated, from the\n\
+        neighbor list\n\
+        Yield :: I, J (ARRAY of atom index), RVec (ARRAY(M,3), R_i-R_j), Rij\
+        '''
+        for Task in self.get_TaskList():
+            yield self.get_PairTask(Task)
+        return
+    def get_ParaTable(self):
+        '''\
+        Return the Z x Z tables of the combined parameters\n\
+            Rr = R0_i+R0_j, C6ij = sqrt(C6_i*C6_j), C12ij = sqrt(C12_i*C12_j)\n\
+        They are built once for the default parameters and shared by all\n\
+        instances ("DispGrim.ParaTable"); custom "r0para", "c6para" or\n\
+        "c12para" get tables of their own instance\
+        '''
+        import numpy as np
+        if self.Table!=None:
+            return self.Table
+        Default = self.R0Para==DispGrim.R0Para and \
+                  self.C6Para==DispGrim.C6Para and \
+                  self.C12Para==DispGrim.C12Para
+        if Default and DispGrim.ParaTable!=None:
+            self.Table  = DispGrim.ParaTable
+            return self.Table
+        R0      = np.array(self.R0Para, dtype=float)
+        C6      = np.array(self.C6Para, dtype=float)
+        C12     = np.array(self.C12Para, dtype=float)
+        self.Table  = {\
+            'Rr'    : R0[:,None] + R0[None,:],
+            'C6ij'  : np.sqrt(C6[:,None]*C6[None,:]),
+            'C12ij' : np.sqrt(C12[:,None]*C12[None,:])\
+                      }
+        if Default:
+            DispGrim.ParaTable  = self.Table
+        return self.Table
+    def get_PairPara(self, I, J):
+        '''\
+        Gather the parameters of the atom pairs (I, J) needed by "ICtrl"\n\
+        from the tables of "get_ParaTable"\n\
+        Return :: [Rr, C6ij, C12ij] (ARRAY, or None if not needed)\
+        '''
+        Table   = self.get_ParaTable()
+        IAnI    = self.IAnArr[I]
+        IAnJ    = self.IAnArr[J]
+        Rr, C6ij, C12ij = None, None, None
+        if self.ICtrl in [0,4]:
+            Rr      = Table['Rr'][IAnI, IAnJ]
+        if self.ICtrl in [0,1,3]:
+            C6ij    = Table['C6ij'][IAnI, IAnJ]
+        if self.ICtrl in [2,3,4]:
+            C12ij   = Table['C12ij'][IAnI, IAnJ]
+        return [Rr, C6ij, C12ij]
+    def get_PairEngy(self, I, J, Rij, Para=None):
+        '''\
+        Calculate the dispersion of the atom pairs (I, J) for "ICtrl"\n\
+        Para   : parameters of the pairs from "get_PairPara", gathered here\n\
+                 if None\n\
+        Return :: Eny (ARRAY), and the columns printed for the pairs\
+        '''
+        import numpy as np
+        if self.ICtrl not in [0,1,2,3,4]:
+            print_Error(self.IOut,'Invalid ICtrl (%s) for "DispGrim"' % self.ICtrl)
+        if Para==None:
+            Para    = self.get_PairPara(I, J)
+        Rr, C6ij, C12ij = Para
         if self.ICtrl==0:                                            # for six-order damped disp.
-            self.EngyReal   = 0.0
-            ResuList    =[\
-                ['Atom1','Atom2','Rij','Rr','Cij','Damp','Disp_G']\
-                ]
-            Scal    = -1.0 * DispGrim.Eau6Con
-            for i in range(len(self.IAn)):
-                for j in range(i):
-                    Rij	= self.get_Dist(self.CList[i],self.CList[j])
-                    Rr  = self.R0Para[self.IAn[i]]+\
-                        self.R0Para[self.IAn[j]]
-                    Cij = sqrt(self.C6Para[self.IAn[i]]*\
-                        self.C6Para[self.IAn[j]])
-                    Dmp = self.get_Damp(self.DPara,Rij,Rr)
-                    Eny = Scal * Dmp * Cij * pow(Rij,-6)
-                    self.EngyReal = self.EngyReal + Eny
-                    ResuList.append(\
-                        [self.IAn[i],i+1,self.IAn[j],j+1,\
-                        Rij,Rr,Cij,Dmp,Eny])
-            self.EngyReal	= self.EngyReal
-            if self.IPrint>=2:
-                FormList    = [\
-                        '%4d%4dth%4d%4dth%8.4f%8.4f%8.4f%8.4f%8.4f',
-                        '%10s%10s%8s%8s%8s%8s%8s']
-                print_List_free(self.IOut,ResuList,2,FormList,
-                    'Grimme\'s six-order damped dispersion')
-            print_String(self.IOut,'E(%s)%s= %16.8f A.U. '
-                %('Disp_G',' '*3,self.EngyReal),2)
+            Dmp = 1.0/(1.0+np.exp(-self.DPara*(Rij/Rr-1.0)))
+            Eny = -1.0*DispGrim.Eau6Con * Dmp * C6ij * Rij**-6
+            return Eny, [Rij,Rr,C6ij,Dmp,Eny]
         elif self.ICtrl==1:                                          # for pure six-order disp.
-            self.EngyReal   = 0.0
-            ResuList    =[\
-                ['Atom1','Atom2','Rij','Cij','Disp_6']\
-                ]
-            Scal    = -1.0 * DispGrim.Eau6Con
-            for i in range(len(self.IAn)):
-                for j in range(i):
-                    Rij	= self.get_Dist(self.CList[i],self.CList[j])
-                    Cij = sqrt(self.C6Para[self.IAn[i]]*\
-                        self.C6Para[self.IAn[j]])
-                    Eny = Scal * Cij * pow(Rij,-6)
-                    self.EngyReal = self.EngyReal + Eny
-                    ResuList.append(\
-                        [self.IAn[i],i+1,self.IAn[j],j+1,\
-                        Rij,Cij,Eny])
-            self.EngyReal	= self.EngyReal
-            if self.IPrint>=2:
-                FormList    = ['%4d%4dth%4d%4dth%16.8f%16.8f%16.8f',
-                        '%10s%10s%16s%16s%16s']
-                print_List_free(self.IOut,ResuList,2,FormList,
-                    'Pure six-order dispersion')
-            print_String(self.IOut,'E(%s)%s= %16.8f A.U. '
-                %('Disp_6',' '*3,self.EngyReal),2)
+            Eny = -1.0*DispGrim.Eau6Con * C6ij * Rij**-6
+            return Eny, [Rij,C6ij,Eny]
         elif self.ICtrl==2:                                          # for pure twelve-order disp.
-            self.EngyReal   = 0.0
-            ResuList    =[\
-                ['Atom1','Atom2','Rij','C12ij','Disp_12']\
-                ]
-            Scal    = self.Eau12Con
-            for i in range(len(self.IAn)):
-                for j in range(i):
-                    Rij	= self.get_Dist(self.CList[i],self.CList[j])
-                    Cij = sqrt(self.C12Para[self.IAn[i]]*\
-                        self.C12Para[self.IAn[j]])
-                    Eny = Scal * Cij * pow(Rij,-12)
-                    self.EngyReal = self.EngyReal + Eny
-                    ResuList.append(\
-                        [self.IAn[i],i+1,self.IAn[j],j+1,\
-                        Rij,Cij,Eny])
-            self.EngyReal	= self.EngyReal
-            if self.IPrint>=2:
-                print_String(self.IOut,'Scal is %16.8f' %Scal ,2)
-                FormList    = ['%4d%4dth%4d%4dth%16.8f%16.8f%16.8f',
-                        '%10s%10s%16s%16s%16s']
-                print_List_free(self.IOut,ResuList,2,FormList,
-                    'Pure twelve-order dispersion')
-            print_String(self.IOut,'E(%s)%s= %16.8f A.U. '
-                %('Disp_12',' '*2,self.EngyReal),2)
+            Eny = DispGrim.Eau12Con * C12ij * Rij**-12
+            return Eny, [Rij,C12ij,Eny]
         elif self.ICtrl==3:                                          # for 6 + 12 disp.
+            Eny = -1.0*DispGrim.Eau6Con * C6ij * Rij**-6 + \
+                    DispGrim.Eau12Con * C12ij * Rij**-12
+            return Eny, [Rij,C6ij,C12ij,Eny]
+        else:                                                        # for damped 12 Disp.
+            Dmp = 1.0/(1.0+np.exp(-self.DPara/2*(Rij/Rr-1.0)))       #  scaled in "get_EngyReal"
+            Eny = Dmp * C12ij * Rij**-12
+            return Eny, [Rij,Rr,C12ij,Dmp,Eny]
+    def get_EngyTail(self):
+        '''\
+        Estimate the dispersion of the pairs beyond "Cutoff", assuming the\n\
+        atoms are spread uniformly (density N/V of the bounding box) and\n\
+        the damping is 1 there.  For a term s*Cij*r^-n :\n\
+            E_tail  = 2*pi*N*rho * s*<Cij> * Cutoff^(3-n)/(n-3)\n\
+        with <Cij> = <sqrt(C_i)>^2.  Zero if the system fits in "Cutoff"\n\
+        For a bulk-like box it is the usual tail correction; for a finite\n\
+        cluster it overestimates the magnitude (surface atoms have fewer\n\
+        far neighbors) and serves as a bound on the truncation error\
+        '''
+        from math import pi
+        import numpy as np
+        self.EngyTail   = 0.0
+        NAtom   = len(self.IAnArr)
+        if self.Cutoff==None or NAtom<2:
+            return self.EngyTail
+        Box     = self.Coord.max(axis=0) - self.Coord.min(axis=0)
+        if np.sqrt((Box*Box).sum())<=self.Cutoff:
+            return self.EngyTail
+        Volume  = np.prod(np.maximum(Box, 1.0))
+        Rho     = NAtom/Volume
+        Cut     = self.Cutoff
+        TermList= []
+        if self.ICtrl in [0,1,3]:
+            TermList.append((-1.0*DispGrim.Eau6Con, self.C6Para, 6))
+        if self.ICtrl in [2,3]:
+            TermList.append((DispGrim.Eau12Con, self.C12Para, 12))
+        if self.ICtrl==4:
+            TermList.append((-1.0*DispGrim.Eau12Con, self.C12Para, 12))
+        for Scal, Para, n in TermList:
+            CAvg    = np.sqrt(np.array(Para)[self.IAnArr]).mean()**2
+            self.EngyTail += 2.0*pi*NAtom*Rho*Scal*CAvg*Cut**(3-n)/(n-3)
+        return self.EngyTail
+    def get_EngyReal(self):
+        '''\
+        Calculate the dispersion energy\n\
+        The pair energies are summed in the order of the former double\n\
+        loops (by "cumsum"), so the total is the same as theirs\
+        '''
+        import numpy as np
+        HeadDict    = {\
+            0: [['Atom1','Atom2','Rij','Rr','Cij','Damp','Disp_G'],
+                ['%4d%4dth%4d%4dth%8.4f%8.4f%8.4f%8.4f%8.4f',
+                '%10s%10s%8s%8s%8s%8s%8s'],
+                'Grimme\'s six-order damped dispersion','Disp_G'],
+            1: [['Atom1','Atom2','Rij','Cij','Disp_6'],
+                ['%4d%4dth%4d%4dth%16.8f%16.8f%16.8f','%10s%10s%16s%16s%16s'],
+                'Pure six-order dispersion','Disp_6'],
+            2: [['Atom1','Atom2','Rij','C12ij','Disp_12'],
+                ['%4d%4dth%4d%4dth%16.8f%16.8f%16.8f','%10s%10s%16s%16s%16s'],
+                'Pure twelve-order dispersion','Disp_12'],
+            3: [['Atom1','Atom2','Rij','C6ij','C12ij','Disp.'],
+                ['%4d%4dth%4d%4dth%8.4f%8.4f%8.4f%8.4f','%10s%10s%8s%8s%8s%8s'],
+                '6+12-order dispersion','Disp'],
+            4: [None, None, None, 'Disp_12s']\
+                      }                                              # Head, [Row, Head] formats
+        if self.ICtrl not in HeadDict:
+            print_Error(self.IOut,'Invalid ICtrl (%s) for "DispGrim"' % self.ICtrl)
+        if self.ICtrl in [2,3,4] and len(self.IAnArr)>0 and \
+                self.IAnArr.max()>=len(self.C12Para):
+            print_Error(self.IOut,
+                'Twelve-order parameters are available up to IAn = %d'
+                % (len(self.C12Para)-1))
+        Head, FormList, Info, Name = HeadDict[self.ICtrl]
+        if len(self.IAn)==1:
             self.EngyReal   = 0.0
-            ResuList    =[\
-                ['Atom1','Atom2','Rij','Cij','Disp.']\
-                ]
-            ScalSix     = -1.0 * DispGrim.Eau6Con
-            ScalTwel    = DispGrim.Eau12Con
-            for i in range(len(self.IAn)):
-                for j in range(i):
-                    Rij	= self.get_Dist(self.CList[i],self.CList[j])
-                    C6ij    = sqrt(self.C6Para[self.IAn[i]]*\
-                        self.C6Para[self.IAn[j]])
-                    C12ij   = sqrt(self.C12Para[self.IAn[i]]*\
-                        self.C12Para[self.IAn[j]])
-                    Eny = ScalSix * C6ij * pow(Rij,-6) + \
-                        ScalTwel * C12ij * pow(Rij,-12)
-                    self.EngyReal = self.EngyReal + Eny
-                    ResuList.append(\
-                        [self.IAn[i],i+1,self.IAn[j],j+1,\
-                        Rij,C6ij,C12ij,Eny])
-            if self.IPrint>=2:
-                FormList    = ['%4d%4dth%4d%4dth%8.4f%8.4f%8.4f%8.4f',
-                        '%10s%10s%8s%8s%8s%8s']
-                print_List_free(self.IOut,ResuList,2,FormList,
-                    '6+12-order dispersion')
             print_String(self.IOut,'E(%s)%s= %16.8f A.U. '
                 %('Disp',' '*5,self.EngyReal),2)
-        elif self.ICtrl==4:                                          # for damped 12 Disp.
-            self.EngyReal   = 0.0
-            ResuList    =[\
-                ['Atom1','Atom2','Rij','Rr','Cij','Damp','Disp_12s']\
-                ]
-            Scal    = -1.0 * DispGrim.Eau12Con
-            for i in range(len(self.IAn)):
-                for j in range(i):
-                    Rij	= self.get_Dist(self.CList[i],self.CList[j])
-                    Rr  = self.R0Para[self.IAn[i]]+\
-                        self.R0Para[self.IAn[j]]
-                    Cij = sqrt(self.C12Para[self.IAn[i]]*\
-                        self.C12Para[self.IAn[j]])
-                    Dmp = self.get_Damp(self.DPara/2,Rij,Rr)
-                    Eny = Dmp * Cij * pow(Rij,-12.0)
-                    self.EngyReal = self.EngyReal + Eny
-                    ResuList.append(\
-                        [self.IAn[i],i+1,self.IAn[j],j+1,\
-                        Rij,Rr,Cij,Dmp,Eny])
-            self.EngyReal	= Scal * self.EngyReal
-            print_String(self.IOut,'E(%s)%s= %16.8f A.U. '
-                %('Disp_12s',' '*1,self.EngyReal),2)
+            return self.EngyReal
+        self.EngyReal   = 0.0
+        PairText        = self.IPrint>=2 and Head!=None              # Stream the pair table
+        PairBin         = None
+        if PairText:
+            if self.ICtrl==2:
+                print_String(self.IOut,'Scal is %16.8f' %DispGrim.Eau12Con ,2)
+            self.IOut.write('=>%s\n  %s\n' % (Info, FormList[1] % tuple(Head)))
+        if self.PairOut!=None:
+            PairBin     = open(self.PairOut,'wb')
+        if self.NProc>1 and not PairText and PairBin==None:
+            self.EngyReal   = self.run_DispPool(0)[0]            # Worker processes
+            TileList        = []
+        else:
+            TileList        = self.get_PairTile()
+        try:
+            for I, J, RVec, Rij in TileList:
+                Eny, ColList = self.get_PairEngy(I, J, Rij)
+                if len(Eny)==0: continue
+                SeqEny      = Eny.copy()                             # Sum in the loop order
+                SeqEny[0]   = self.EngyReal + SeqEny[0]
+                self.EngyReal = float(np.cumsum(SeqEny)[-1])
+                if PairText:
+                    self.write_PairText(self.IOut, FormList[0], I, J, ColList)
+                if PairBin!=None:
+                    self.write_PairBin(PairBin, I, J, ColList)
+        finally:
+            if PairBin!=None:
+                PairBin.close()
+        if self.ICtrl==4:
+            self.EngyReal   = -1.0 * DispGrim.Eau12Con * self.EngyReal
+        if self.Cutoff!=None and self.IPrint>=1:
+            print_String(self.IOut,
+                'Estimated dispersion beyond the cutoff of %.2f Angstrom'
+                % self.Cutoff + ' = %16.8f A.U. (not included)'
+                % self.get_EngyTail(),1)
+        print_String(self.IOut,'E(%s)%s= %16.8f A.U. '
+            %(Name,' '*(9-len(Name)),self.EngyReal),2)
         return self.EngyReal
-# Mark by Igor for uncomplete get_ForcList
+    def get_PairDeri(self, I, J, Rij, Order=1, Para=None):
+        '''\
+        Calculate the radial derivatives of the pair dispersion\n\
+        The distances and the damping of the energy pass ("get_PairEngy")\n\
+        are reused, the pair term being E(r) = E * g(r) :\n\
+            dE/dr       = E * g\n\
+            d2E/dr2     = E * (g*g + dg/dr)\n\
+        with g = -n/r for the undamped r^-n terms, and\n\
+             g = (1-Damp)*d/Rr - n/r for the damped ones\n\
+        Return :: Eny and ColList as "get_PairEngy",\n\
+                  DList = [dE/dr] (Order=1) or [dE/dr, d2E/dr2] (Order=2)\n\
+                  in A.U./Angstrom^k, "ICtrl=4" scaling included\
+        '''
+        Eny, ColList = self.get_PairEngy(I, J, Rij, Para)
+        if self.ICtrl==0:                                            # E * Damp * r^-6
+            Rr, Dmp = ColList[1], ColList[3]
+            DTerm   = [(Eny, self.DPara/Rr, Dmp, 6)]
+        elif self.ICtrl==1:
+            DTerm   = [(Eny, None, None, 6)]
+        elif self.ICtrl==2:
+            DTerm   = [(Eny, None, None, 12)]
+        elif self.ICtrl==3:                                          # split 6 + 12 again
+            E6      = -1.0*DispGrim.Eau6Con * ColList[1] * Rij**-6
+            E12     = DispGrim.Eau12Con * ColList[2] * Rij**-12
+            DTerm   = [(E6, None, None, 6), (E12, None, None, 12)]
+        else:                                                        # E * Damp(d/2) * r^-12
+            Rr, Dmp = ColList[1], ColList[3]
+            DTerm   = [(-1.0*DispGrim.Eau12Con*Eny, self.DPara/2/Rr, Dmp, 12)]
+        DList   = [0.0, 0.0][:Order]
+        for Ei, dR, Dmp, n in DTerm:
+            if dR is None:
+                g   = -n/Rij
+                dg  = n/(Rij*Rij)
+            else:
+                g   = (1.0-Dmp)*dR - n/Rij
+                dg  = -Dmp*(1.0-Dmp)*dR*dR + n/(Rij*Rij)
+            DList[0]    = DList[0] + Ei*g
+            if Order>=2:
+                DList[1]    = DList[1] + Ei*(g*g + dg)
+        return Eny, ColList, DList
+    def get_PairType(self):
+        '''\
+        Record of one pair in the binary decomposition of "get_EngyReal" :\n\
+        the atomic numbers and the 1-based indices of both atoms, and the\n\
+        columns of "get_PairEngy" (the last being the pair dispersion in\n\
+        A.U., also for "ICtrl=4")\
+        '''
+        import numpy as np
+        NameDict    = {\
+            0: ['Rij','Rr','Cij','Damp','Disp_G'],
+            1: ['Rij','Cij','Disp_6'],
+            2: ['Rij','C12ij','Disp_12'],
+            3: ['Rij','C6ij','C12ij','Disp'],
+            4: ['Rij','Rr','C12ij','Damp','Disp_12s']\
+                      }
+        return np.dtype([('IAn1','<i4'),('Atom1','<i4'),('IAn2','<i4'),('Atom2','<i4')]+
+            [(x,'<f8') for x in NameDict[self.ICtrl]])
+    def write_PairBin(self, PairBin, I, J, ColList):
+        '''\
+        Write the pairs (I, J) of one tile as records of "get_PairType"\
+        '''
+        import numpy as np
+        Record  = np.empty(len(I), self.get_PairType())
+        Record['IAn1'], Record['Atom1'] = self.IAnArr[I], I+1
+        Record['IAn2'], Record['Atom2'] = self.IAnArr[J], J+1
+        for Name, Col in zip(Record.dtype.names[4:], ColList):
+            Record[Name]    = Col
+        if self.ICtrl==4:
+            Record['Disp_12s']  = -1.0 * DispGrim.Eau12Con * Record['Disp_12s']
+        Record.tofile(PairBin)
+        return
+    def write_PairText(self, IOut, RowForm, I, J, ColList, NChunk=4096):
+        '''\
+        Write the pairs (I, J) of one tile as rows of the pair table, a\n\
+        chunk of "NChunk" rows at a time\
+        '''
+        RowForm = '  %s\n' % RowForm
+        ColList = [self.IAnArr[I], I+1, self.IAnArr[J], J+1] + list(ColList)
+        for k0 in range(0, len(I), NChunk):
+            Rows    = zip(*[x[k0:k0+NChunk].tolist() for x in ColList])
+            IOut.write(''.join([RowForm % Row for Row in Rows]))
+        return
+    @staticmethod
+    def load_PairBin(fn, iop=0):
+        '''\
+        Memory-map the binary pair decomposition "fn" written for "ICtrl=iop"\
+        '''
+        import numpy as np
+        Disp        = DispGrim.__new__(DispGrim)
+        Disp.ICtrl  = iop
+        return np.memmap(fn, dtype=Disp.get_PairType(), mode='r')
     def get_ForcList(self):
         '''\
-        Calculate the corresponding force for DFT+D methods\n\
-        Contribution of atom j in atom i is :\n\
-        Fij_x	= - Scal * (6.0 * (X_i-X_j) ) /|r_i-r_j|^(-8)\n\
-        Fij_y	= - Scal * (6.0 * (Y_i-Y_j) ) /|r_i-r_j|^(-8)\n\
-        Fij_z	= - Scal * (6.0 * (Z_i-Z_j) ) /|r_i-r_j|^(-8)\
+        Calculate the dispersion gradient for DFT+D methods\n\
+        For each pair (i>j), with RVec = R_i-R_j and Rij = |RVec| :\n\
+            dE/dR_i     = dE/dr * RVec/Rij = -dE/dR_j\n\
+        The pair contributions are gathered per atom by "bincount"\n\
+        "ForcList" is the Cartesian gradient (3N) in A.U. (Hartree/Bohr)\n\
+        in the same order as the Gaussian "Cartesian Gradient"\
         '''
-        from math import sqrt
-
-        from my_io import print_List
-        from my_io import print_String
-        Scal		= -1.0 * DFTD.FauCon * self.SixPara
-        self.ForcList	= []
-        if self.IPrint>=2:
-            print_String(self.IOut, 
-            '%10s%10s%8s%8s%8s%8s%8s%8s%8s%8s%8s%8s'
-            %('Atom1','Atom2','Rij','Rr','Cij','Damp',
-            'Fx_Disp','Fx_FDamp','Fy_Disp','Fy_FDamp',
-            'Fz_Disp','Fz_FDamp'),2)
-        if self.GauIO.NAtom==1:
-            NTT             = self.GauIO.NAtom*3
-            self.ForcList   = [0.0]*NTT
-            if self.IPrint>=2:
-                print_List(self.IOut,self.ForcList,4,
-                    'CM Dispersion Cartesian Gradient:')
-            return
-        for i in range(self.GauIO.NAtom):
-            TmpForceX	= 0.0
-            TmpForceY	= 0.0
-            TmpForceZ	= 0.0
-            for j in range(self.GauIO.NAtom):
-                if j!=i:
-                    Rij	= get_Dist(self.CList[i],self.CList[j])
-                    Rr	= DFTD.R0Para[self.IAn[i]]+\
-                          DFTD.R0Para[self.IAn[j]]
-                    Cijg= DFTD.C6Para[self.IAn[i]]*\
-                          DFTD.C6Para[self.IAn[j]]
-                    Cij	= sqrt(Cijg)
-                    Damp= get_Damp(self.d,Rij,Rr)
-                    XTerm1, YTerm1, ZTerm1	=\
-                        get_Force(self.CList[i],self.CList[j],Rij)
-                    XTerm	= XTerm1 * Damp
-                    YTerm	= YTerm1 * Damp
-                    ZTerm	= ZTerm1 * Damp
-                    XTerm2, YTerm2, ZTerm2	=\
-                        get_DampD(self.CList[i],self.CList[j],\
-                        self.d,Rij,Rr)
-                    XTermD	= XTerm2 * pow(Rij,-6)
-                    YTermD	= YTerm2 * pow(Rij,-6)
-                    ZTermD	= ZTerm2 * pow(Rij,-6)
-
-                    TmpForceX		+= XTerm * Cij 
-                    TmpForceY 		+= YTerm * Cij 
-                    TmpForceZ 		+= ZTerm * Cij 
-
-                    TmpForceX		+= XTermD * Cij 
-                    TmpForceY 		+= YTermD * Cij 
-                    TmpForceZ 		+= ZTermD * Cij 
-                    if self.IPrint>=2:
-                        self.IOut.write(\
- '%7s%3dth%5s%3dth%8.4f%8.4f%8.4f%8.4f%8.4f%8.4f%8.4f%8.4f%8.4f%8.4f\n' \
- %(self.AtLabel[i],i+1,self.AtLabel[j],j+1,\
- Rij,Rr,Cij,Damp,XTerm,XTermD,YTerm,YTermD,ZTerm,ZTermD))
-
-            TmpForceX   = Scal * TmpForceX
-            TmpForceY   = Scal * TmpForceY
-            TmpForceZ   = Scal * TmpForceZ
-            self.ForcList.append(TmpForceX)
-            self.ForcList.append(TmpForceY)
-            self.ForcList.append(TmpForceZ)
+        import numpy as np
+        if self.NProc>1:
+            Grad    = self.run_DispPool(1)[1]                        # Worker processes
+        else:
+            Grad    = np.zeros((len(self.IAnArr),3))
+            for Task in self.get_TaskList():
+                self.add_TaskGrad(Task, Grad)
+        self.ForcList   = (Grad*DispGrim.Br2Ang).reshape(-1).tolist()
         if self.IPrint>=2:
             print_List(self.IOut,self.ForcList,4,
                 'CM Dispersion Cartesian Gradient:')
-        return
-# Mark by Igor for uncomplete get_HessList
-    def get_HessList(self):
-
-        return
-# Mark by Igor for uncomplete get_DampHess
+        return self.ForcList
+    def add_TaskGrad(self, Task, Grad):
+        '''\
+        Add the gradient (A.U./Angstrom) of the pairs of "Task" into the\n\
+        ARRAY(N,3) "Grad"\n\
+        Return :: the dispersion of these pairs, unscaled as in "get_PairEngy"\
+        '''
+        I, J, RVec, Rij = self.get_PairTask(Task)
+        return self.add_PairGrad(I, J, RVec, Rij, Grad)
+    def add_PairGrad(self, I, J, RVec, Rij, Grad, Para=None):
+        '''\
+        Add the gradient (A.U./Angstrom) of the pairs (I, J) into "Grad"\n\
+        Return :: the dispersion of these pairs, unscaled as in "get_PairEngy"\
+        '''
+        import numpy as np
+        NAtom   = len(Grad)
+        Eny, ColList, DList = self.get_PairDeri(I, J, Rij, 1, Para)
+        Fac     = DList[0]/Rij
+        for k in range(3):
+            Gk  = np.bincount(I, weights=Fac*RVec[:,k], minlength=NAtom)
+            Gk -= np.bincount(J, weights=Fac*RVec[:,k], minlength=NAtom)
+            Grad[:,k] += Gk
+        return float(Eny.sum())
+    def run_DispPool(self, Order=0):
+        '''\
+        Evaluate the dispersion (Order=0), or also its gradient (Order=1),\n\
+        by "NProc" worker processes\n\
+        The coordinates, atomic numbers, neighbor list and gradient\n\
+        buffers are put into shared memory once, and only the task indices\n\
+        travel to the workers.  The tasks of "get_TaskList" are dealt out\n\
+        statically (worker w takes the tasks w, w+NProc, ...), each worker\n\
+        sums into its own gradient slab, and the partial sums are reduced\n\
+        in the worker order, so the result does not depend on scheduling\n\
+        Return :: Engy (unscaled as in "get_PairEngy"), Grad (ARRAY(N,3))\
+        '''
+        import numpy as np
+        from multiprocessing import Pool
+        from multiprocessing.shared_memory import SharedMemory
+        NAtom   = len(self.IAnArr)
+        TaskList= self.get_TaskList()                                # Build neighbor list here
+        ShmList = []
+        def put_Share(Arr):
+            Shm     = SharedMemory(create=True, size=max(Arr.nbytes,1))
+            ShmList.append(Shm)
+            np.ndarray(Arr.shape, Arr.dtype, buffer=Shm.buf)[...] = Arr
+            return (Shm.name, Arr.shape, Arr.dtype.str)
+        try:
+            Info    = {\
+                'Coord' : put_Share(self.Coord),
+                'IAn'   : put_Share(self.IAnArr),
+                'Grad'  : put_Share(np.zeros((self.NProc*Order,NAtom,3))),
+                'Para'  : [self.ICtrl, self.C6Para, self.C12Para,
+                           self.R0Para, self.DPara, self.Cutoff],
+                'Task'  : TaskList, 'NProc' : self.NProc\
+                      }
+            if self.NeighList!=None:
+                Info['I']   = put_Share(self.NeighList.I)
+                Info['J']   = put_Share(self.NeighList.J)
+            with Pool(self.NProc, init_DispWork, (Info,)) as WorkPool:
+                EngyList    = WorkPool.map(run_DispWork,
+                    [(w, Order) for w in range(self.NProc)], chunksize=1)
+            Engy    = 0.0
+            for x in EngyList:
+                Engy    = Engy + x
+            Grad    = None
+            if Order==1:
+                Slab    = np.ndarray((self.NProc,NAtom,3), float, buffer=ShmList[2].buf)
+                Grad    = Slab[0].copy()
+                for w in range(1, self.NProc):
+                    Grad    = Grad + Slab[w]
+                del Slab
+        finally:
+            for Shm in ShmList:
+                Shm.close()
+                Shm.unlink()
+        return Engy, Grad
+    def get_AtomEngy(self, Atom, Coord):
+        '''\
+        Calculate the dispersion between "Atom" at "Coord" and all others\n\
+        The other pairs do not depend on "Atom", so the differences of\n\
+        this sum are the differences of the total dispersion\
+        '''
+        import numpy as np
+        J       = np.delete(np.arange(len(self.IAnArr)), Atom)
+        RVec    = np.asarray(Coord,dtype=float) - self.Coord[J]
+        Rij     = np.sqrt((RVec*RVec).sum(axis=1))
+        if self.Cutoff!=None:
+            J, Rij  = J[Rij<self.Cutoff], Rij[Rij<self.Cutoff]
+        I       = np.full(len(J), Atom)
+        Eny, ColList = self.get_PairEngy(I, J, Rij)
+        if self.ICtrl==4:
+            return -1.0 * DispGrim.Eau12Con * Eny.sum()
+        return Eny.sum()
+    def check_ForcList(self, Step=1.0E-4, AtomList=None):
+        '''\
+        Check "ForcList" by central finite differences of the dispersion\n\
+        Step     : REAL, displacement in Angstrom\n\
+        AtomList : LIST of atoms (0-based) to check, all atoms by default\n\
+        Return   :: the maximum absolute deviation in Hartree/Bohr\
+        '''
+        import numpy as np
+        if len(self.ForcList)!=3*len(self.IAnArr):
+            self.get_ForcList()
+        if AtomList is None:
+            AtomList = range(len(self.IAnArr))
+        Grad    = np.array(self.ForcList).reshape(-1,3)
+        MaxDev  = 0.0
+        for i in AtomList:
+            for k in range(3):
+                Coord       = self.Coord[i].copy()
+                Coord[k]    = Coord[k] + Step
+                EngyP       = self.get_AtomEngy(i, Coord)
+                Coord[k]    = Coord[k] - 2.0*Step
+                EngyM       = self.get_AtomEngy(i, Coord)
+                GradFD      = (EngyP-EngyM)/(2.0*Step)*DispGrim.Br2Ang
+                MaxDev      = max(MaxDev, abs(GradFD-Grad[i,k]))
+        if self.IPrint>=1:
+            print_String(self.IOut,
+                'Max. deviation of analytic dispersion gradient '+\
+                'from finite differences = %12.4E A.U.' % MaxDev,1)
+        return MaxDev
+    def get_HessList(self, Packed=False):
+        '''\
+        Calculate the dispersion Hessian for DFT+D methods\n\
+        For each pair (i>j), with u = (R_i-R_j)/Rij, the 3x3 block is\n\
+            A   = d2E/dr2 * u*u^T + dE/dr / Rij * (1 - u*u^T)\n\
+        which adds to the blocks (i,i) and (j,j), and is subtracted from\n\
+        the blocks (i,j) and (j,i)\n\
+        Packed  : LOGIC, return the lower triangle row by row, as the\n\
+                  Gaussian "Cartesian Force Constants", instead of the\n\
+                  (3N,3N) ARRAY\n\
+        "HessList" is in A.U. (Hartree/Bohr^2)\
+        '''
+        import numpy as np
+        NAtom       = len(self.IAnArr)
+        Hess        = np.zeros((NAtom,3,NAtom,3))
+        Diag        = np.zeros((NAtom,3,3))
+        for I, J, RVec, Rij in self.get_PairTile():
+            Eny, ColList, DList = self.get_PairDeri(I, J, Rij, 2)
+            U       = RVec/Rij[:,None]
+            UU      = U[:,:,None]*U[:,None,:]
+            A       = (DList[1]-DList[0]/Rij)[:,None,None]*UU +\
+                      (DList[0]/Rij)[:,None,None]*np.eye(3)
+            Hess[I,:,J,:]   = -A                                     # A is symmetric
+            Hess[J,:,I,:]   = -A
+            for a in range(3):
+                for b in range(a,3):
+                    Dab = np.bincount(I, weights=A[:,a,b], minlength=NAtom)+\
+                          np.bincount(J, weights=A[:,a,b], minlength=NAtom)
+                    Diag[:,a,b] += Dab
+                    if b!=a:
+                        Diag[:,b,a] += Dab
+        Hess[np.arange(NAtom),:,np.arange(NAtom),:] = Diag
+        Hess        = Hess.reshape(3*NAtom,3*NAtom) * DispGrim.Br2Ang**2
+        if Packed:
+            self.HessList   = Hess[np.tril_indices(3*NAtom)]
+        else:
+            self.HessList   = Hess
+        if self.IPrint>=2:
+            print_List(self.IOut,Hess[np.tril_indices(3*NAtom)],4,
+                'CM Dispersion Cartesian Force Constants:')
+        return self.HessList
     def get_DampHess(self,Atom1,Atom2,d,Rij,Rr):
         '''\
-        Calculate the damping Hessian in Atom1 contributed by Atom2 in Grimme\'s dispersion\
+        Calculate the damping Hessian in Atom1 contributed by Atom2 in Grimme\'s dispersion\n\
+        With f = 1/(1+exp(-d*(Rij/Rr-1))) :\n\
+            f\'  = f*(1-f)*d/Rr,  f\'\' = f\'*(1-2f)*d/Rr\
         '''
-        return (XX, YY, ZZ, XY, XZ, YZ)
-# Mark by Igor for uncomplete get_HessSix
+        from math import exp
+        Damp    = pow(1.0+exp(-d*(Rij/Rr-1.0)),-1.0)
+        Deri1   = Damp*(1.0-Damp)*d/Rr
+        Deri2   = Deri1*(1.0-2.0*Damp)*d/Rr
+        return self.get_RadiHess(Atom1,Atom2,Rij,Deri1,Deri2)
     def get_HessSix(self,Atom1,Atom2):
         '''\
-        Calculate six-order dispersion Hessian of Atom1 contributed by Atom2\
+        Calculate six-order dispersion Hessian of Atom1 contributed by Atom2\n\
+        i.e. the Hessian of Rij^-6 with respect to Atom1\
         '''
-        return (XX, YY, ZZ, XY, XZ, YZ)
-# Mark by Igor for uncomplete get_ForcSix
+        Rij     = self.get_Dist(Atom1,Atom2)
+        Deri1   = -6.0 * pow(Rij,-7.0)
+        Deri2   = 42.0 * pow(Rij,-8.0)
+        return self.get_RadiHess(Atom1,Atom2,Rij,Deri1,Deri2)
+    def get_RadiHess(self,Atom1,Atom2,Rij,Deri1,Deri2):
+        '''\
+        Hessian in Atom1 of a radial function with the first and second\n\
+        derivatives Deri1 and Deri2 at Rij :\n\
+            H_ab = Deri2*u_a*u_b + Deri1/Rij*(delta_ab - u_a*u_b)\
+        '''
+        U       = [(Atom1[k]-Atom2[k])/Rij for k in range(3)]
+        HList   = []
+        for a, b in [(0,0),(1,1),(2,2),(0,1),(0,2),(1,2)]:
+            Term    = (Deri2-Deri1/Rij)*U[a]*U[b]
+            if a==b:
+                Term    = Term + Deri1/Rij
+            HList.append(Term)
+        return tuple(HList)
     def get_ForcSix(self,Atom1,Atom2,Rij):
         '''\
         Calculate six-order dispersion force of Atom1 contributed by Atom2\
@@ -413,7 +807,789 @@ class DispGrim:
         XTerm	= Factor * (Atom1[0]-Atom2[0])
         YTerm	= Factor * (Atom1[1]-Atom2[1])
         ZTerm	= Factor * (Atom1[2]-Atom2[2])
-        r         eturn (XTerm, YTerm, ZTerm)
+        return (XTerm, YTerm, ZTerm)
+
+DispWork = {}                                                        # State of a worker process
+def init_DispWork(Info):
+    '''\
+    Initialize a worker process of "DispGrim.run_DispPool": attach the\n\
+    shared memory and build a bare "DispGrim" on top of it\
+    '''
+    import numpy as np
+    from multiprocessing.shared_memory import SharedMemory
+    def get_Share(Key):
+        Name, Shape, DType = Info[Key]
+        Shm     = SharedMemory(name=Name)
+        DispWork.setdefault('Shm',[]).append(Shm)                    # Keep it attached
+        return np.ndarray(Shape, np.dtype(DType), buffer=Shm.buf)
+    Disp            = DispGrim.__new__(DispGrim)
+    Disp.IOut       = None
+    Disp.IPrint     = 0
+    Disp.Coord      = get_Share('Coord')
+    Disp.IAnArr     = get_Share('IAn')
+    Disp.ICtrl, Disp.C6Para, Disp.C12Para, Disp.R0Para, Disp.DPara, \
+        Disp.Cutoff = Info['Para']
+    Disp.NeighList  = None
+    Disp.Table      = None
+    if 'I' in Info:
+        Disp.NeighList  = DispNeigh(None, Disp.Cutoff, 0.0)
+        Disp.NeighList.I= get_Share('I')
+        Disp.NeighList.J= get_Share('J')
+    DispWork['Disp']    = Disp
+    DispWork['Grad']    = get_Share('Grad')
+    DispWork['Task']    = Info['Task']
+    DispWork['NProc']   = Info['NProc']
+    return
+def run_DispWork(Job):
+    '''\
+    Run the share (w, Order) of a worker of "DispGrim.run_DispPool"\
+    '''
+    w, Order    = Job
+    Disp        = DispWork['Disp']
+    Engy        = 0.0
+    for Task in DispWork['Task'][w::DispWork['NProc']]:
+        if Order==1:
+            Engy    = Engy + Disp.add_TaskGrad(Task, DispWork['Grad'][w])
+        else:
+            I, J, RVec, Rij = Disp.get_PairTask(Task)
+            Engy    = Engy + float(Disp.get_PairEngy(I, J, Rij)[0].sum())
+    return Engy
+
+class DispNeigh:
+    '''\
+    Neighbor list of atom pairs (i>j) within "Cutoff+Skin", built by a\n\
+    spatial cell list in O(N) for the cutoff mode of "DispGrim"\n\
+    The list is kept as long as no atom moves by more than "Skin/2"\n\
+    since the last build, so that slightly moved geometries (opt. steps,\n\
+    MC moves, MD frames) reuse it\
+    '''
+    def __init__(self, iout, cutoff, skin=2.0, bugctrl=0):
+        '''\
+        Initialize the neighbor list\n\
+        cutoff  : REAL, cutoff radius in Angstrom\n\
+        skin    : REAL, skin distance in Angstrom\
+        '''
+        self.IOut       = iout
+        self.IPrint     = bugctrl
+        self.Cutoff     = float(cutoff)                              # REAL, cutoff in Angstrom
+        self.Skin       = float(skin)                                # REAL, skin in Angstrom
+        self.RList      = self.Cutoff + self.Skin                    # REAL, radius of the list
+        self.RefCoord   = None                                       # ARRAY(N,3), of the last build
+        self.I          = None                                       # ARRAY, atom i of pairs
+        self.J          = None                                       # ARRAY, atom j of pairs
+        self.NBuild     = 0                                          # INTEGER, builds so far
+        if self.Cutoff<=0.0 or self.Skin<0.0:
+            print_Error(self.IOut,
+                'Invalid cutoff (%s) or skin (%s) for "DispNeigh"'
+                % (cutoff, skin))
+        return
+    def check_List(self, Coord):
+        '''\
+        Return True if the list must be rebuilt for "Coord"\
+        '''
+        import numpy as np
+        if self.RefCoord is None or self.RefCoord.shape!=Coord.shape:
+            return True
+        if len(Coord)==0:
+            return False
+        Shift   = ((Coord-self.RefCoord)**2).sum(axis=1).max()
+        return Shift > (0.5*self.Skin)**2
+    def get_List(self, Coord):
+        '''\
+        Return the pairs (I, J) of the list, rebuilt if necessary\
+        '''
+        if self.check_List(Coord):
+            self.build_List(Coord)
+        return self.I, self.J
+    def build_List(self, Coord):
+        '''\
+        Build the list by binning the atoms into cubic cells of edge\n\
+        "RList/2", and searching the pairs in the cell itself and in half\n\
+        of the neighboring cells up to two cells away (62 of 124)\
+        '''
+        import numpy as np
+        NAtom       = len(Coord)
+        IList, JList= [], []
+        if NAtom>1:
+            Cell    = np.floor((Coord-Coord.min(axis=0))/(0.5*self.RList)).astype(np.int64)
+            NCell   = Cell.max(axis=0) + 1
+            CellId  = (Cell[:,0]*NCell[1] + Cell[:,1])*NCell[2] + Cell[:,2]
+            Order   = np.argsort(CellId, kind='stable')              # Atoms sorted by cells
+            Uniq, Start, Count = np.unique(CellId[Order],
+                return_index=True, return_counts=True)
+            SCoord  = Coord[Order]                                   # Work on the sorted atoms
+            SCell   = Cell[Order]
+            NBlock  = max(1, DispGrim.TileSize//int(Count.max()))
+            Offset  = [(a,b,c) for a in range(-2,3)
+                for b in range(-2,3) for c in range(-2,3) if (a,b,c)>=(0,0,0)]
+            for b0 in range(0, NAtom, NBlock):
+                A       = np.arange(b0, min(NAtom, b0+NBlock))
+                for Off in Offset:
+                    NC      = SCell[A] + Off
+                    Valid   = ((NC>=0)&(NC<NCell)).all(axis=1)
+                    NId     = (NC[:,0]*NCell[1] + NC[:,1])*NCell[2] + NC[:,2]
+                    Pos     = np.minimum(np.searchsorted(Uniq, NId), len(Uniq)-1)
+                    Found   = Valid & (Uniq[Pos]==NId)
+                    Cnt     = Count[Pos[Found]]
+                    I       = np.repeat(A[Found], Cnt)
+                    J       = np.repeat(Start[Pos[Found]], Cnt) +\
+                        np.arange(Cnt.sum()) - np.repeat(np.cumsum(Cnt)-Cnt, Cnt)
+                    if Off==(0,0,0):                                 # Same cell: count once
+                        Keep    = I>J
+                        I, J    = I[Keep], J[Keep]
+                    RVec    = SCoord[I] - SCoord[J]
+                    Keep    = (RVec*RVec).sum(axis=1) < self.RList**2
+                    I, J    = Order[I[Keep]], Order[J[Keep]]
+                    IList.append(np.maximum(I,J))
+                    JList.append(np.minimum(I,J))
+        IType       = np.int32 if NAtom<2**31 else np.int64
+        self.I      = np.concatenate(IList).astype(IType) if IList else np.zeros(0,IType)
+        self.J      = np.concatenate(JList).astype(IType) if JList else np.zeros(0,IType)
+        self.RefCoord   = Coord.copy()
+        self.NBuild     = self.NBuild + 1
+        if self.IPrint>=2:
+            print_String(self.IOut,
+                'Neighbor list (%d) : %d pairs within %.2f Angstrom'
+                % (self.NBuild, len(self.I), self.RList),1)
+        return
+
+class DispBatch:
+    '''\
+    Evaluate the dispersion of "DispGrim" for K parameter sets on a set\n\
+    of molecules at once, for the fitting of the D parameters\n\
+    The molecules enter as pair tables (ZI, ZJ, Rij) : the atomic numbers\n\
+    and the distances (Angstrom) of all their atom pairs, which are\n\
+    computed once by "get_PairTable" and may be stored and reloaded\n\
+    "get_EngyMat" then returns the (K, NMol) matrix of dispersion\
+    '''
+    def __init__(self, iout, tablelist, iop=0, bugctrl=0):
+        '''\
+        Initialize the batch\n\
+        tablelist : LIST of the pair tables (ZI, ZJ, Rij) of the molecules\n\
+        iop       : INTEGER, "ICtrl" of "DispGrim"\
+        '''
+        import numpy as np
+        self.IOut   = iout
+        self.IPrint = bugctrl
+        self.ICtrl  = iop
+        if self.ICtrl not in [0,1,2,3,4]:
+            print_Error(self.IOut,'Invalid ICtrl (%s) for "DispBatch"' % self.ICtrl)
+        self.NMol   = len(tablelist)                                 # INTEGER, molecules
+        NPair       = [len(x[2]) for x in tablelist]
+        self.ZI     = np.concatenate([np.asarray(x[0],dtype=int) for x in tablelist]+[np.zeros(0,int)])
+        self.ZJ     = np.concatenate([np.asarray(x[1],dtype=int) for x in tablelist]+[np.zeros(0,int)])
+        self.Rij    = np.concatenate([np.asarray(x[2],dtype=float) for x in tablelist]+[np.zeros(0)])
+        self.MolIdx = np.repeat(np.arange(self.NMol), NPair)         # ARRAY, molecule of pairs
+        self.EngyMat= None                                           # ARRAY(K,NMol)
+        return
+    @staticmethod
+    def get_PairTable(clist, ian):
+        '''\
+        Build the pair table (ZI, ZJ, Rij) of one molecule, the pairs (i>j)\n\
+        in the order of "DispGrim"\
+        '''
+        import numpy as np
+        Coord   = np.array(clist,dtype=float).reshape(-1,3)
+        IAn     = np.array(ian,dtype=int)
+        I, J    = np.tril_indices(len(IAn), -1)
+        RVec    = Coord[I] - Coord[J]
+        return IAn[I], IAn[J], np.sqrt((RVec*RVec).sum(axis=1))
+    def get_ParaMat(self, Para, Default):
+        '''\
+        Turn "Para" (None, a LIST of Z, or an ARRAY(K,Z)) into an ARRAY(K,Z)\
+        '''
+        import numpy as np
+        if Para is None:
+            Para    = Default
+        Para    = np.asarray(Para, dtype=float)
+        if Para.ndim==1:
+            Para    = Para[None,:]
+        if len(self.ZI)>0 and max(self.ZI.max(), self.ZJ.max())>=Para.shape[1]:
+            print_Error(self.IOut,
+                'Dispersion parameters are available up to IAn = %d'
+                % (Para.shape[1]-1))
+        return Para
+    def get_EngyMat(self, c6para=None, c12para=None, r0para=None, dpara=None):
+        '''\
+        Calculate the dispersion of all molecules for K parameter sets\n\
+        c6para, c12para, r0para : LIST(Z) or ARRAY(K,Z), "DispGrim" values\n\
+                                  if None\n\
+        dpara                   : REAL or ARRAY(K)\n\
+        The parameter sets broadcast against each other along K, and the\n\
+        pairs are taken in tiles of about "TileSize" values\n\
+        Return :: ARRAY(K, NMol) in A.U.\
+        '''
+        import numpy as np
+        C6      = self.get_ParaMat(c6para, DispGrim.C6Para) \
+            if self.ICtrl in [0,1,3] else np.zeros((1,1))
+        C12     = self.get_ParaMat(c12para, DispGrim.C12Para) \
+            if self.ICtrl in [2,3,4] else np.zeros((1,1))
+        R0      = self.get_ParaMat(r0para, DispGrim.R0Para) \
+            if self.ICtrl in [0,4] else np.zeros((1,1))
+        D       = np.atleast_1d(np.asarray(
+            DispGrim.DPara if dpara is None else dpara, dtype=float))[:,None]
+        NK      = max(len(C6), len(C12), len(R0), len(D))
+        for Name, Arr in [('c6para',C6),('c12para',C12),('r0para',R0),('dpara',D)]:
+            if len(Arr) not in [1, NK]:
+                print_Error(self.IOut,
+                    '%d parameter sets in "%s" but %d in others' % (len(Arr),Name,NK))
+        self.EngyMat= np.zeros((NK, self.NMol))
+        NTile   = max(1, DispGrim.TileSize//NK)
+        for k0 in range(0, len(self.Rij), NTile):
+            ZI, ZJ  = self.ZI[k0:k0+NTile], self.ZJ[k0:k0+NTile]
+            Rij     = self.Rij[k0:k0+NTile]
+            if self.ICtrl in [0,1,3]:
+                Cij = np.sqrt(C6[:,ZI]*C6[:,ZJ])
+            if self.ICtrl in [2,3,4]:
+                C12ij   = np.sqrt(C12[:,ZI]*C12[:,ZJ])
+            if self.ICtrl in [0,4]:
+                Rr  = R0[:,ZI] + R0[:,ZJ]
+            if self.ICtrl==0:
+                Dmp = 1.0/(1.0+np.exp(-D*(Rij/Rr-1.0)))
+                Eny = -1.0*DispGrim.Eau6Con * Dmp * Cij * Rij**-6
+            elif self.ICtrl==1:
+                Eny = -1.0*DispGrim.Eau6Con * Cij * Rij**-6
+            elif self.ICtrl==2:
+                Eny = DispGrim.Eau12Con * C12ij * Rij**-12
+            elif self.ICtrl==3:
+                Eny = -1.0*DispGrim.Eau6Con * Cij * Rij**-6 + \
+                    DispGrim.Eau12Con * C12ij * Rij**-12
+            else:
+                Dmp = 1.0/(1.0+np.exp(-D/2*(Rij/Rr-1.0)))
+                Eny = -1.0*DispGrim.Eau12Con * Dmp * C12ij * Rij**-12
+            Eny     = np.broadcast_to(Eny, (NK, len(Rij)))
+            MolIdx  = self.MolIdx[k0:k0+NTile]
+            Start   = np.flatnonzero(np.r_[True, MolIdx[1:]!=MolIdx[:-1]])
+            self.EngyMat[:,MolIdx[Start]] += np.add.reduceat(Eny, Start, axis=1)
+        if self.IPrint>=1:
+            print_String(self.IOut,
+                'Dispersion of %d molecules for %d parameter sets'
+                % (self.NMol, NK),1)
+        return self.EngyMat
+
+class DispTraj:
+    '''\
+    Stream the dispersion energy and gradient of "DispGrim" over the\n\
+    frames of a trajectory (fixed atoms, moving coordinates)\n\
+    The frames come from generators ("read_XYZ", "read_GauLog") or a\n\
+    memory-mapped ARRAY(NFrame,N,3) of a binary file ("read_Bin"), the\n\
+    pair list and the pair parameters are built once (again only when\n\
+    the neighbor list is rebuilt with "cutoff"), and the results are\n\
+    written frame by frame to a binary file ("OutHead" + records of\n\
+    "get_OutType"), so that memory does not grow with the trajectory\
+    '''
+    OutMagic    = b'XDHDISP1'                                        # Head of the binary output
+    OutHead     = 64                                                 # Bytes of the head
+
+    def __init__(self, iout, ian, iop=0, bugctrl=0,\
+        c6para=None, c12para=None, r0para=None, dpara=None,\
+        cutoff=None, skin=2.0):
+        '''\
+        Initialize the trajectory with the atomic numbers "ian"; the other\n\
+        arguments are those of "DispGrim"\
+        '''
+        self.IOut   = iout
+        self.IPrint = bugctrl
+        self.IAn    = list(ian)
+        self.NAtom  = len(self.IAn)
+        self.Disp   = DispGrim(iout, [[0.0,0.0,0.0]]*self.NAtom, self.IAn,
+            iop, 0, c6para, c12para, r0para, dpara, cutoff, skin)
+        self.PairCache  = None                                       # LIST of (I, J, Para)
+        self.CacheBuild = None                                       # Neighbor list build of it
+        self.NFrame = 0                                              # INTEGER, frames done
+        return
+    @staticmethod
+    def get_IAn(Label):
+        '''\
+        Atomic number of the label (element symbol or number) "Label"\
+        '''
+        if Label.isdigit():
+            return int(Label)
+        return DispGrim.AtDict[Label.strip('0123456789').lower()]
+    @staticmethod
+    def read_XYZ(fn):
+        '''\
+        Generate the frames (IAn, Coord) of a multi-frame XYZ file\
+        '''
+        import numpy as np
+        with open(fn,'r') as tmpf:
+            while True:
+                Line    = tmpf.readline()
+                if Line.strip()=='':
+                    if Line=='':
+                        return
+                    continue
+                NAtom   = int(Line.split()[0])
+                tmpf.readline()                                      # Comment line
+                IAn     = []
+                Coord   = np.zeros((NAtom,3))
+                for i in range(NAtom):
+                    TmpList = tmpf.readline().split()
+                    IAn.append(DispTraj.get_IAn(TmpList[0]))
+                    Coord[i]= [float(x) for x in TmpList[1:4]]
+                yield IAn, Coord
+    @staticmethod
+    def read_GauLog(fn):
+        '''\
+        Generate the frames (IAn, Coord) of the geometries in a Gaussian\n\
+        log file, from the "Input orientation" or "Standard orientation"\n\
+        blocks, whichever appears first\
+        '''
+        import numpy as np
+        Kind    = None
+        with open(fn,'r') as tmpf:
+            for Line in tmpf:
+                if Line.find('orientation:')==-1:
+                    continue
+                if Kind==None:
+                    Kind    = Line.strip()
+                if Line.strip()!=Kind:
+                    continue
+                for i in range(4):                                   # Head of the table
+                    tmpf.readline()
+                IAn, Coord  = [], []
+                for Line in tmpf:
+                    if Line.strip().startswith('---'):
+                        break
+                    TmpList = Line.split()
+                    IAn.append(int(TmpList[1]))
+                    Coord.append([float(x) for x in TmpList[3:6]])
+                yield IAn, np.array(Coord)
+        return
+    @staticmethod
+    def read_Bin(fn, natom):
+        '''\
+        Memory-map the binary frames of "fn" as ARRAY(NFrame,natom,3) of\n\
+        float64 in Angstrom: a ".npy" file, or raw frames otherwise\
+        '''
+        import numpy as np
+        if fn.endswith('.npy'):
+            return np.load(fn, mmap_mode='r').reshape(-1,natom,3)
+        return np.memmap(fn, dtype=np.float64, mode='r').reshape(-1,natom,3)
+    @staticmethod
+    def get_OutType(NAtom, Forc=True):
+        '''\
+        Record of one frame in the binary output: the energy, and the\n\
+        gradient with "Forc"\
+        '''
+        import numpy as np
+        if Forc:
+            return np.dtype([('Engy','<f8'),('Grad','<f8',(NAtom,3))])
+        return np.dtype([('Engy','<f8')])
+    @staticmethod
+    def load_Out(fn):
+        '''\
+        Memory-map the records (Engy[, Grad]) of a binary output\
+        '''
+        import numpy as np
+        with open(fn,'rb') as tmpf:
+            Head    = tmpf.read(DispTraj.OutHead)
+        if Head[:8]!=DispTraj.OutMagic:
+            raise ValueError('"%s" is not a dispersion trajectory output' % fn)
+        NAtom, Forc = np.frombuffer(Head[8:24], '<i8')
+        OutType = DispTraj.get_OutType(int(NAtom), bool(Forc))
+        return np.memmap(fn, dtype=OutType, mode='r', offset=DispTraj.OutHead)
+    def get_PairCache(self):
+        '''\
+        Return the pairs and their parameters, built again only when the\n\
+        neighbor list is rebuilt\
+        '''
+        Disp    = self.Disp
+        TaskList= Disp.get_TaskList()                                # Checks the neighbor list
+        Build   = Disp.NeighList.NBuild if Disp.NeighList!=None else 0
+        if self.PairCache==None or Build!=self.CacheBuild:
+            self.PairCache  = []
+            for Kind, k0, k1 in TaskList:
+                if Kind==1:
+                    I, J    = Disp.NeighList.I[k0:k1], Disp.NeighList.J[k0:k1]
+                else:
+                    I, J, RVec, Rij = Disp.get_PairTask((Kind, k0, k1))
+                self.PairCache.append((I, J, Disp.get_PairPara(I, J)))
+            self.CacheBuild = Build
+        return self.PairCache
+    def get_Frame(self, Coord, Forc=True):
+        '''\
+        Dispersion energy (A.U.) and, with "Forc", gradient (ARRAY(N,3),\n\
+        Hartree/Bohr) of the frame "Coord" (Angstrom)\
+        '''
+        import numpy as np
+        Disp        = self.Disp
+        Disp.Coord  = np.asarray(Coord, dtype=float).reshape(-1,3)
+        if len(Disp.Coord)!=self.NAtom:
+            print_Error(self.IOut,'Frame %d has %d atoms but not %d'
+                % (self.NFrame+1, len(Disp.Coord), self.NAtom))
+        Engy        = 0.0
+        Grad        = np.zeros((self.NAtom,3))
+        for I, J, Para in self.get_PairCache():
+            RVec    = Disp.Coord[I] - Disp.Coord[J]
+            Rij     = np.sqrt((RVec*RVec).sum(axis=1))
+            if Disp.Cutoff!=None:
+                Keep    = Rij < Disp.Cutoff
+                I, J, RVec, Rij = I[Keep], J[Keep], RVec[Keep], Rij[Keep]
+                Para    = [x if x is None else x[Keep] for x in Para]
+            if Forc:
+                Engy    = Engy + Disp.add_PairGrad(I, J, RVec, Rij, Grad, Para)
+            else:
+                Engy    = Engy + float(Disp.get_PairEngy(I, J, Rij, Para)[0].sum())
+        if Disp.ICtrl==4:
+            Engy    = -1.0 * DispGrim.Eau12Con * Engy
+        return Engy, Grad*DispGrim.Br2Ang
+    def run_Traj(self, Frames, fn=None, Forc=True):
+        '''\
+        Evaluate all frames of "Frames" (an iterable of (IAn, Coord) or of\n\
+        Coord), writing the records to the binary file "fn" if given\n\
+        Return :: the number of frames\
+        '''
+        import numpy as np
+        OutType = DispTraj.get_OutType(self.NAtom, Forc)
+        OutFile = None
+        if fn!=None:
+            OutFile = open(fn,'wb')
+            Head    = DispTraj.OutMagic + np.array([self.NAtom, Forc], '<i8').tobytes()
+            OutFile.write(Head.ljust(DispTraj.OutHead, b'\0'))
+        Record  = np.zeros(1, OutType)
+        try:
+            for Frame in Frames:
+                if isinstance(Frame, tuple):
+                    IAn, Coord  = Frame
+                    if list(IAn)!=self.IAn:
+                        print_Error(self.IOut,
+                            'Atoms of frame %d differ from the trajectory'
+                            % (self.NFrame+1))
+                else:
+                    Coord   = Frame
+                Engy, Grad  = self.get_Frame(Coord, Forc)
+                self.NFrame = self.NFrame + 1
+                if OutFile!=None:
+                    Record['Engy'][0]   = Engy
+                    if Forc:
+                        Record['Grad'][0]   = Grad
+                    OutFile.write(Record.tobytes())
+                if self.IPrint>=2:
+                    print_String(self.IOut,'Frame %6d : E(Disp) = %16.8f A.U.'
+                        % (self.NFrame, Engy),1)
+        finally:
+            if OutFile!=None:
+                OutFile.close()
+        if self.IPrint>=1:
+            print_String(self.IOut,'Dispersion of %d frames' % self.NFrame
+                + ('' if fn==None else ' written into "%s"' % fn),1)
+        return self.NFrame
+
+class DispMC:
+    '''\
+    Dispersion of "DispGrim" kept up to date along Monte Carlo moves\n\
+    The pair energies are cached in an ARRAY(N,N); moving m atoms only\n\
+    computes their m*N new pairs ("try_Move"), and the move is then\n\
+    either written into the cache ("accept_Move") or dropped at no cost\n\
+    ("reject_Move")\
+    '''
+    def __init__(self, iout, clist, ian, iop=0, bugctrl=0,\
+        c6para=None, c12para=None, r0para=None, dpara=None, cutoff=None):
+        '''\
+        Initialize the cache of the pair energies for the geometry "clist";\n\
+        the other arguments are those of "DispGrim" (the cutoff is applied\n\
+        to the pairs directly)\
+        '''
+        import numpy as np
+        self.IOut   = iout
+        self.IPrint = bugctrl
+        self.Disp   = DispGrim(iout, clist, ian, iop, 0,\
+            c6para, c12para, r0para, dpara)
+        self.Cutoff = cutoff
+        self.NAtom  = len(self.Disp.IAnArr)
+        self.Coord  = self.Disp.Coord                                # ARRAY(N,3), current geometry
+        self.PairEngy   = np.zeros((self.NAtom,self.NAtom))          # ARRAY(N,N), pair energies
+        self.Trial      = None                                       # Move waiting for decision
+        self.NAccept    = 0
+        self.NReject    = 0
+        for Task in self.Disp.get_TaskList():
+            I, J, RVec, Rij = self.Disp.get_PairTask(Task)
+            Eny     = self.get_Scaled(self.Disp.get_PairEngy(I, J, Rij)[0], Rij)
+            self.PairEngy[I,J]  = Eny
+            self.PairEngy[J,I]  = Eny
+        self.EngyReal   = float(self.PairEngy.sum())/2.0             # REAL, current dispersion
+        return
+    def get_Scaled(self, Eny, Rij):
+        '''\
+        Apply the "ICtrl=4" scaling and the cutoff to pair energies\
+        '''
+        if self.Disp.ICtrl==4:
+            Eny     = -1.0 * DispGrim.Eau12Con * Eny
+        if self.Cutoff!=None:
+            Eny     = Eny * (Rij < self.Cutoff)
+        return Eny
+    def try_Move(self, Atoms, Coord):
+        '''\
+        Try to move the atoms "Atoms" (0-based) to "Coord" (ARRAY(m,3),\n\
+        Angstrom), in O(N*m)\n\
+        Return :: the trial dispersion, and its change\
+        '''
+        import numpy as np
+        Atoms   = np.atleast_1d(np.asarray(Atoms, dtype=int))
+        if len(np.unique(Atoms))!=len(Atoms):
+            print_Error(self.IOut,'Atoms moved twice in "DispMC.try_Move"')
+        Moved   = np.asarray(Coord, dtype=float).reshape(-1,3)
+        NewCoord    = self.Coord.copy()
+        NewCoord[Atoms] = Moved
+        I       = np.repeat(Atoms, self.NAtom)
+        J       = np.tile(np.arange(self.NAtom), len(Atoms))
+        Keep    = I!=J
+        I, J    = I[Keep], J[Keep]
+        RVec    = NewCoord[I] - NewCoord[J]
+        Rij     = np.sqrt((RVec*RVec).sum(axis=1))
+        NewRow  = np.zeros((len(Atoms), self.NAtom))
+        NewRow[np.repeat(np.arange(len(Atoms)), self.NAtom-1), J] = \
+            self.get_Scaled(self.Disp.get_PairEngy(I, J, Rij)[0], Rij)
+        Diff    = NewRow - self.PairEngy[Atoms]
+        Delta   = Diff.sum() - 0.5*Diff[:,Atoms].sum()               # Moved pairs were seen twice
+        self.Trial  = (Atoms, Moved, NewRow, float(Delta))
+        return self.EngyReal + self.Trial[3], self.Trial[3]
+    def accept_Move(self):
+        '''\
+        Write the trial move into the geometry and the cache\
+        '''
+        if self.Trial==None:
+            print_Error(self.IOut,'No move to accept in "DispMC"')
+        Atoms, Moved, NewRow, Delta = self.Trial
+        self.Coord[Atoms]           = Moved
+        self.PairEngy[Atoms,:]      = NewRow
+        self.PairEngy[:,Atoms]      = NewRow.T
+        self.EngyReal               = self.EngyReal + Delta
+        self.Trial      = None
+        self.NAccept    = self.NAccept + 1
+        return self.EngyReal
+    def reject_Move(self):
+        '''\
+        Drop the trial move; nothing else has been touched\
+        '''
+        self.Trial      = None
+        self.NReject    = self.NReject + 1
+        return self.EngyReal
+    def get_EngyReal(self):
+        '''\
+        Recompute the dispersion of the current geometry from scratch, to\n\
+        check the accumulated updates\
+        '''
+        Engy    = 0.0
+        for Task in self.Disp.get_TaskList():
+            I, J, RVec, Rij = self.Disp.get_PairTask(Task)
+            Engy    = Engy + float(self.get_Scaled(
+                self.Disp.get_PairEngy(I, J, Rij)[0], Rij).sum())
+        if self.IPrint>=1:
+            print_String(self.IOut,
+                'E(Disp) = %16.8f A.U. after %d accepted and %d rejected moves;'
+                % (Engy, self.NAccept, self.NReject) +
+                ' drift of the updates = %10.2E' % (self.EngyReal-Engy),1)
+        return Engy
+
+class DispD3:
+    '''\
+    This class calculates the D3 dispersion of Grimme et. al. with the\n\
+    Becke-Johnson damping, and optionally the three-body (ATM) term :\n\
+    1) Grimme... Vol.132, 154104, J. Chem. Phys. (D3)\n\
+    2) Grimme... Vol.32 , 1456, J. Comp. Chem. (BJ damping)\n\
+    E2  = -sum_ij [s6*C6/(r^6+f^6) + s8*C8/(r^8+f^8)], f = a1*sqrt(C8/C6)+a2\n\
+    E3  = s9*sum_ijk sqrt(C6ij*C6jk*C6ik)*(3cos.cos.cos+1)/(rij*rjk*rik)^3*fdmp\n\
+    C6 is interpolated in the coordination numbers (CN) of both atoms\n\
+    between the reference values, and C8 = 3*C6*r2r4_i*r2r4_j\n\
+    \n\
+    The reference data are read from a NumPy ".npz" file ("datafile", or\n\
+    $XDH_D3_DATA) with the arrays, indexed by IAn as in "DispGrim.AtDict" :\n\
+        c6ab : (NZ,NZ,NRef,NRef,3), [C6 (A.U.), CN_i ref, CN_j ref];\n\
+               the references with C6<=0 are absent\n\
+        r2r4 : (NZ), the sqrt(Q) factors of C8\n\
+        rcov : (NZ), the covalent radii (Bohr) scaled by 4/3\n\
+    as tabulated in the reference implementation of D3. "D3Convert.py"\n\
+    makes the file from "pars.f" and "dftd3.f" of the "dftd3" program\
+    '''
+    K1      = 16.0                                                   # Steepness of CN counting
+    K3      = 4.0                                                    # Gaussian of C6 interpolation
+    AlpATM  = 14.0                                                   # Damping of the ATM term
+    DataCache   = {}                                                 # Reference data per file
+
+    def __init__(self, iout, clist, ian, s6=1.0, a1=0.4, s8=1.0, a2=5.0,\
+        s9=0.0, bugctrl=0, datafile=None, cutoff=60.0, cncutoff=40.0,\
+        atmcutoff=40.0):
+        '''\
+        Initialize parameters in this class\n\
+        s6, a1, s8, a2 : BJ parameters of the functional ("DFTD.D3Dict")\n\
+        s9             : scale of the ATM term (0 to skip it)\n\
+        cutoff, cncutoff, atmcutoff : cutoffs (Bohr) of the two-body, CN\n\
+                         and three-body sums\
+        '''
+        import numpy as np
+        from os import getenv
+        self.IOut   = iout
+        self.IPrint = bugctrl
+        self.CList  = clist
+        self.IAn    = ian
+        self.Coord  = np.array(clist,dtype=float).reshape(-1,3)/DispGrim.Br2Ang   # In Bohr
+        self.IAnArr = np.array(ian,dtype=int)
+        self.S6, self.A1, self.S8, self.A2, self.S9 = s6, a1, s8, a2, s9
+        self.Cutoff     = cutoff
+        self.CNCutoff   = cncutoff
+        self.ATMCutoff  = atmcutoff
+        self.CN         = None                                       # ARRAY, coordination numbers
+        self.EngyReal   = 0.0
+        self.EngyTwo    = 0.0
+        self.EngyThree  = 0.0
+        self.ForcList   = []
+        self.HessList   = []
+        if datafile==None:
+            datafile    = getenv('XDH_D3_DATA')
+        if datafile==None:
+            print_Error(self.IOut,
+                'The D3 reference data are required by "DispD3": '+\
+                'give "datafile" or set $XDH_D3_DATA')
+        self.Data   = self.load_Data(datafile)
+        if len(self.IAnArr)>0 and self.IAnArr.max()>=len(self.Data['r2r4']):
+            print_Error(self.IOut,
+                'D3 parameters are available up to IAn = %d'
+                % (len(self.Data['r2r4'])-1))
+        return
+    def load_Data(self, datafile):
+        '''\
+        Load the reference data of "datafile", once per file\
+        '''
+        import numpy as np
+        from os.path import abspath
+        Key     = abspath(datafile)
+        if Key not in DispD3.DataCache:
+            try:
+                with np.load(Key) as tmpf:
+                    Data    = dict((x, np.array(tmpf[x],dtype=float))
+                        for x in ['c6ab','r2r4','rcov'])
+            except (IOError, KeyError, ValueError) as Err:
+                print_Error(self.IOut,
+                    'Failed in loading D3 data "%s" : %s' % (datafile, Err))
+            Data['Valid']   = Data['c6ab'][...,0] > 0.0
+            DispD3.DataCache[Key]   = Data
+        return DispD3.DataCache[Key]
+    def get_PairList(self, Cutoff):
+        '''\
+        Return the pairs (I, J, RVec, Rij) within "Cutoff" (Bohr), from\n\
+        the cell list of "DispNeigh"\
+        '''
+        import numpy as np
+        Neigh   = DispNeigh(self.IOut, Cutoff, 0.0)
+        I, J    = Neigh.get_List(self.Coord)
+        I, J    = I.astype(np.int64), J.astype(np.int64)
+        RVec    = self.Coord[I] - self.Coord[J]
+        Rij     = np.sqrt((RVec*RVec).sum(axis=1))
+        return I, J, RVec, Rij
+    def get_CN(self):
+        '''\
+        Coordination numbers CN_i = sum_j 1/(1+exp(-K1*((Rcov_i+Rcov_j)/Rij-1)))\
+        '''
+        import numpy as np
+        NAtom   = len(self.IAnArr)
+        I, J, RVec, Rij = self.get_PairList(self.CNCutoff)
+        RCov    = self.Data['rcov']
+        Cnt     = 1.0/(1.0+np.exp(-DispD3.K1*((RCov[self.IAnArr[I]]+
+            RCov[self.IAnArr[J]])/Rij-1.0)))
+        self.CN = np.bincount(I, weights=Cnt, minlength=NAtom) + \
+                  np.bincount(J, weights=Cnt, minlength=NAtom)
+        return self.CN
+    def get_PairC6(self, I, J):
+        '''\
+        C6 of the pairs (I, J), interpolated in CN between the references\n\
+        with the weights exp(-K3*((CN_i-CN_a)^2+(CN_j-CN_b)^2)).  The\n\
+        weights are taken relative to the closest reference, which gives\n\
+        it alone where all of them underflow\
+        '''
+        import numpy as np
+        C6      = np.zeros(len(I))
+        NTile   = max(1, DispGrim.TileSize//(self.Data['c6ab'].shape[2]**2*4))
+        for k0 in range(0, len(I), NTile):
+            ZI      = self.IAnArr[I[k0:k0+NTile]]
+            ZJ      = self.IAnArr[J[k0:k0+NTile]]
+            Ref     = self.Data['c6ab'][ZI,ZJ]                       # (P,NRef,NRef,3)
+            Valid   = self.Data['Valid'][ZI,ZJ]
+            Dist    = (self.CN[I[k0:k0+NTile]][:,None,None]-Ref[...,1])**2 + \
+                      (self.CN[J[k0:k0+NTile]][:,None,None]-Ref[...,2])**2
+            Dist    = np.where(Valid, Dist, np.inf)
+            DMin    = Dist.reshape(len(ZI),-1).min(axis=1)
+            Wght    = np.exp(-DispD3.K3*(Dist-DMin[:,None,None]))
+            C6[k0:k0+NTile] = (Wght*np.where(Valid, Ref[...,0], 0.0)).sum(axis=(1,2))/\
+                Wght.sum(axis=(1,2))
+        return C6
+    def get_EngyTwo(self):
+        '''\
+        Two-body BJ-damped dispersion within "Cutoff"\
+        '''
+        import numpy as np
+        I, J, RVec, Rij = self.get_PairList(self.Cutoff)
+        C6      = self.get_PairC6(I, J)
+        R2R4    = self.Data['r2r4']
+        C8      = 3.0*C6*R2R4[self.IAnArr[I]]*R2R4[self.IAnArr[J]]
+        F       = self.A1*np.sqrt(C8/C6) + self.A2
+        self.EngyTwo    = -1.0*float((self.S6*C6/(Rij**6+F**6) +
+            self.S8*C8/(Rij**8+F**8)).sum())
+        return self.EngyTwo
+    def get_EngyThree(self):
+        '''\
+        Three-body ATM dispersion of the triples (i>j>k) whose three sides\n\
+        are within "ATMCutoff", with the damping\n\
+            fdmp = 1/(1+6*(R0ij*R0jk*R0ik/(rij*rjk*rik))^(AlpATM/3))\n\
+        R0 being the BJ radius a1*sqrt(C8/C6)+a2 of each pair\
+        '''
+        import numpy as np
+        NAtom   = len(self.IAnArr)
+        self.EngyThree  = 0.0
+        if self.S9==0.0 or NAtom<3:
+            return self.EngyThree
+        I, J, RVec, Rij = self.get_PairList(self.ATMCutoff)
+        R2R4    = self.Data['r2r4']
+        C6Mat   = np.zeros((NAtom,NAtom))                            # C6 and R0 of the pairs
+        R0Mat   = np.zeros((NAtom,NAtom))
+        C6      = self.get_PairC6(I, J)
+        R0      = self.A1*np.sqrt(3.0*R2R4[self.IAnArr[I]]*R2R4[self.IAnArr[J]]) + self.A2
+        C6Mat[I,J], C6Mat[J,I]  = C6, C6
+        R0Mat[I,J], R0Mat[J,I]  = R0, R0
+        Order   = np.argsort(I, kind='stable')                       # Neighbors j<i of each i
+        NbJ     = J[Order]
+        Start   = np.searchsorted(I[Order], np.arange(NAtom+1))
+        for i in range(2, NAtom):
+            Nb      = np.sort(NbJ[Start[i]:Start[i+1]])
+            if len(Nb)<2:
+                continue
+            A, B    = np.tril_indices(len(Nb), -1)
+            Jt, Kt  = Nb[A], Nb[B]                                   # j > k
+            Keep    = C6Mat[Jt,Kt] > 0.0                             # r_jk within cutoff
+            Jt, Kt  = Jt[Keep], Kt[Keep]
+            Rij2    = ((self.Coord[i]-self.Coord[Jt])**2).sum(axis=1)
+            Rik2    = ((self.Coord[i]-self.Coord[Kt])**2).sum(axis=1)
+            Rjk2    = ((self.Coord[Jt]-self.Coord[Kt])**2).sum(axis=1)
+            RR      = np.sqrt(Rij2*Rik2*Rjk2)
+            Ang     = 0.375*(Rij2+Rjk2-Rik2)*(Rij2-Rjk2+Rik2)*(-Rij2+Rjk2+Rik2)/RR**5 + \
+                      1.0/RR**3                                      # (3cos.cos.cos+1)/RR^3
+            R0      = R0Mat[i,Jt]*R0Mat[i,Kt]*R0Mat[Jt,Kt]
+            FDmp    = 1.0/(1.0+6.0*(R0/RR)**(DispD3.AlpATM/3.0))
+            C9      = np.sqrt(C6Mat[i,Jt]*C6Mat[i,Kt]*C6Mat[Jt,Kt])
+            self.EngyThree  = self.EngyThree + float((C9*Ang*FDmp).sum())
+        self.EngyThree  = self.S9*self.EngyThree
+        return self.EngyThree
+    def get_EngyReal(self):
+        '''\
+        Calculate the D3(BJ) dispersion energy (A.U.)\
+        '''
+        self.get_CN()
+        self.EngyReal   = self.get_EngyTwo() + self.get_EngyThree()
+        if self.IPrint>=2:
+            print_List(self.IOut, self.CN.tolist(), 4,
+                'D3 coordination numbers:')
+            print_String(self.IOut,'E(D3-2body) = %16.8f A.U. ; E(D3-ATM) = %16.8f A.U.'
+                % (self.EngyTwo, self.EngyThree),1)
+        print_String(self.IOut,'E(%s)%s= %16.8f A.U. '
+            %('Disp_D3',' '*2,self.EngyReal),2)
+        return self.EngyReal
+    def get_ForcList(self):
+        '''\
+        The D3 gradient is not available yet\
+        '''
+        print_Error(self.IOut,'The gradient of "DispD3" is not available')
+        return
 
 class DFTD:
     '''\
@@ -427,7 +1603,13 @@ class DFTD:
     disp_6  is the unscaled Grimme's dispersion\n\
     disp_12 is the unscaled tweleve-order term extended by Grimme's s6 and LG form\n\
     disp_xy\n\
-    disp\
+    disp\n\
+    \n\
+    The D3(BJ) parameters [s6, a1, s8, a2] in "D3Dict" are those of\n\
+        3) Grimme... Vol.32 , 1456, J. Comp. Chem.\n\
+    "xxx+d3bj" switches on the two-body D3(BJ) dispersion of "DispD3", and\n\
+    "xxx+d3bjatm" adds the three-body ATM term; both need the data file of\n\
+    "DispD3" ("D3Convert.py"), and are for the single point only\
     '''
     GrimDict    = {\
   'b3lyp+d' : [1.05 ,  'b3lyp'] ,      'b971+d' : [0.65 ,   'b971'] , 
@@ -446,11 +1628,23 @@ class DFTD:
  'disp_12s' : [1.00 ,'disp_12s'] ,'dispersion_12s': [1.00, 'disp_12s'] ,
      'disp' : [1.00 ,   'disp'] ,   'dispersion': [1.00,    'disp']\
                   }
+    D3Dict      = {\
+ 'b3lyp+d3bj' : [1.0, 0.3981, 1.9889, 4.4211,  'b3lyp'] ,
+  'blyp+d3bj' : [1.0, 0.4298, 2.6996, 4.2359,   'blyp'] ,
+  'bp86+d3bj' : [1.0, 0.3946, 3.2822, 4.8516,   'bp86'] ,
+   'pbe+d3bj' : [1.0, 0.4289, 0.7875, 4.4407, 'pbepbe'] ,
+'pbepbe+d3bj' : [1.0, 0.4289, 0.7875, 4.4407, 'pbepbe'] ,
+  'pbe0+d3bj' : [1.0, 0.4145, 1.2177, 4.8593,   'pbe0'] ,
+  'tpss+d3bj' : [1.0, 0.4535, 1.9435, 4.4752,   'tpss'] ,
+ 'tpssh+d3bj' : [1.0, 0.4529, 2.2382, 4.6550,  'tpssh'] ,
+'b2plyp+d3bj' : [0.64,0.3065, 0.9147, 5.0570, 'b2plyp']\
+                  }
 
     def __init__(self, iout, GauIO, OptClass, bugctrl=0,\
-        c6para=None, c12para=None, r0para=None, dpara=None):
+        c6para=None, c12para=None, r0para=None, dpara=None, d3data=None):
         '''\
-        Initialize parameters\
+        Initialize parameters\n\
+        d3data  : STRING, reference data file of "DispD3"\
         '''
         self.IOut       = iout                                       # Set the logout file string
         self.GauIO      = GauIO                                      # Loading GauIO class
@@ -463,6 +1657,8 @@ class DFTD:
         self.IAn        = self.GauIO.IAn                             # List of IAn
         self.Method     = ''                                         # STRING, name of DFT+D
         self.SixPara    = 1.0                                        # REAL, Parameter of disp.
+        self.FuncName   = ''                                         # STRING, DFT of DFT+D
+        self.D3Para     = None                                       # [s6,a1,s8,a2,s9] of D3(BJ)
  #
         self.EngyReal   = 0.0                                        # REAL, dispersion energy
         self.ForcList   = []                                         # List, dispersion force
@@ -477,6 +1673,7 @@ class DFTD:
                     self.TurnOn   = True
                     self.Method   = key
                     self.SixPara=DFTD.GrimDict[key][0]
+                    self.FuncName = DFTD.GrimDict[key][1]
                     if len(TmpList)==1:
                         self.GauIO.OptionList.append(\
                             DFTD.GrimDict[key][1])
@@ -490,6 +1687,30 @@ class DFTD:
                             'determination \"DFTD.__init__\"')
                     self.GauIO.OptionList.remove(option)
                     break
+        if not self.TurnOn:                                          # Filter DFT+D3(BJ) method
+            for option in self.GauIO.OptionList:
+                TmpList = option.strip().split('/')
+                key     = TmpList[0].lower()
+                S9      = 0.0
+                if key.endswith('atm'):
+                    key, S9 = key[:-3], 1.0
+                if key not in DFTD.D3Dict:
+                    continue
+                self.TurnOn     = True
+                self.Method     = TmpList[0].lower()
+                self.FuncName   = DFTD.D3Dict[key][4]
+                self.D3Para     = DFTD.D3Dict[key][:4] + [S9]
+                if len(TmpList)==1:
+                    self.GauIO.OptionList.append(self.FuncName)
+                elif len(TmpList)==2:
+                    self.GauIO.OptionList.append(\
+                        '/'.join([self.FuncName, TmpList[1]]))
+                else:
+                    print_Error(self.IOut,
+                        'Error happens in DFT+D3 method '+\
+                        'determination \"DFTD.__init__\"')
+                self.GauIO.OptionList.remove(option)
+                break
         if not self.TurnOn:                                          # Filter pure disp. calc.
             for option in self.GauIO.OptionList:
                 for key in sorted(DFTD.DispDict.keys()):
@@ -570,14 +1791,30 @@ class DFTD:
                 if TmpList[0].lower()==self.Method:
                     if len(TmpList)==1:
                         self.OptClass.OptionList.append(\
-                            DFTD.GrimDict[self.Method][1])
+                            self.FuncName)
                     elif len(TmpList)==2:
                         self.OptClass.OptionList.append(\
-                            DFTD.GrimDict[self.Method][1])
+                            self.FuncName)
                         self.OptClass.OptionList.append(\
                             TmpList[1])
                     self.OptClass.OptionList.remove(option)
                     break
+            if self.D3Para!=None:                                    # D3(BJ), s6 inside
+                if self.OptClass.Opt or self.OptClass.Hessian:       # Before the Gaussian job
+                    print_Error(self.IOut,
+                        'The gradient of D3(BJ) is not available, and "%s" '
+                        % self.Method + 'can not be used for "opt" or "freq"')
+                S6, A1, S8, A2, S9 = self.D3Para
+                self.DispClass       =\
+                    DispD3(self.IOut, GauIO.CList, GauIO.IAn,\
+                    S6, A1, S8, A2, S9, self.IPrint, d3data)
+                if self.IPrint>=1:
+                    print_String(self.IOut,
+                        '%s is employed with s_6 = %3.2f, a_1 = %6.4f, '
+                        % (self.Method.upper(),S6,A1) +
+                        's_8 = %6.4f, a_2 = %6.4f, s_9 = %3.2f'
+                        % (S8,A2,S9),2)
+                return
             self.DispClass       =\
                 DispGrim(self.IOut, GauIO.CList, GauIO.IAn, 0,\
                 self.IPrint)
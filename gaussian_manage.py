@@ -492,6 +492,8 @@ class GauIO:
  self.MoreOptionDict : DICTIONARY of options which need more detailed handle\n\
               dict.keys() = ['checkpoint','allcheck','extraoverlay','fchk=all','%chk']\n\
  self.ExOvList       : LIST of IOPs for the option "extraoverlay"\n\
+ self.Lean           : LOGIC, "#n" instead of "#p" in "form_Inp" for the lean log\n\
+ self.Prof           : "xDH_module.xDHProfile" to time "run_GauJob", or None\n\
  ----------------------------------------------------------------------------------------\
  '''
 
@@ -541,6 +543,7 @@ class GauIO:
         self.FileName    = fn                                         # Name of the input file
 
         self.WorkDir    = getcwd().strip()                           # STRING, current DIR 
+        self.GauProc    = None                                       # Popen of "run_GauJob"
         self.HomeDir    = getenv('HOME')                             # STRING, Home DIR
         if isfile('%s/.xdh_modules_path' %self.HomeDir):           # Load Private Modules DIR
             tmpf    = open('%s/.xdh_modules_path'\
@@ -593,6 +596,8 @@ class GauIO:
         self.MachineList=[]                                          # List, machine commands
         self.OptionList= []                                          # List, options
         self.KickOptionList=['nonstd']                               # Default disable options
+        self.Lean   = False                                          # LOGIC, "#n" route, lean log
+        self.Prof   = None                                           # xDHProfile or None
         self.MoreOptionDict={'checkpoint':0,'check':0,'allcheck':0,
                 'scrf':0,'fchk=all':0,'extraoverlay':0,'%chk': 0}    # Dict., options complicated
         self.ExOvList    = []
@@ -1036,7 +1041,11 @@ class GauIO:
             wf.write('%s\n' % line)
         # Input options
         self.OptionList = [x.lower() for x in self.OptionList]
-        self.OptionList.insert(0,'p')
+        if self.Lean:                                                # Normal print level
+            self.OptionList = [x for x in self.OptionList if x not in ['p','t']]
+            self.OptionList.insert(0,'n')
+        else:
+            self.OptionList.insert(0,'p')
         for item in self.OptionList:
             for i in range(self.OptionList.count(item)-1):
                 self.OptionList.remove(item)
@@ -1123,7 +1132,9 @@ class GauIO:
         from os import getpid                                        # To make more then 2 jobs
         import shutil
         import subprocess
+        from time   import perf_counter
                                                                      # running in one DIR
+        tmpTime = perf_counter()
         CurrGID = getpid()
         CurrScr = '%s/.script%s' %(self.WorkDir,CurrGID)
         if not exists(CurrScr):
@@ -1131,9 +1142,7 @@ class GauIO:
         src = 'Job_%s.com' % self.JobName
         dst = '%s/Job_%s.com' % (CurrScr, self.JobName) 
         rename(src, dst)
-        src = '%s/ChkReplace.py' % self.ModuDir
-        dst = '%s/ChkReplace.py' % self.WorkDir
-        shutil.copy2(src, dst) # ChkReplace.py for chkpath
+        self.link_ChkReplace(1)                                      # ChkReplace.py for chkpath
 
         #print('Script is %s' %CurrScr)
         #print('self.ModuDir %s' %self.ModuDir)
@@ -1157,13 +1166,23 @@ class GauIO:
             exe = '%s/G16_Environment' % self.ModuDir
         else:
             raise RuntimeError('invalid Gaussian version %s' % iop)
-        subprocess.call([exe, dst])
+        if self.Prof!=None:
+            self.Prof.add_Phase('scratch',tmpTime)
+        tmpTime = perf_counter()
+        self.GauProc = subprocess.Popen([exe, dst],                  # Own process group, so that
+                start_new_session=True)                              #  "kill_GauJob" gets all links
+        self.GauProc.wait()
+        if self.Prof!=None:
+            self.Prof.add_Phase('gaussian',tmpTime)
 
+        tmpTime = perf_counter()
         shutil.copy2('%s/Job_%s.log' % (CurrScr, self.JobName),
                 'Job_%s.log' % self.JobName)
         #if self.MoreOptionDict['%chk']==1:                            # Do not save chk
         #    remove('%s.chk' % self.ChkName)
-        remove('ChkReplace.py')
+        self.link_ChkReplace(-1)
+        if self.Prof!=None:
+            self.Prof.add_Phase('copy_log',tmpTime)
         #if self.MoreOptionDict['fchk=all']==1:                       # save Test.FChk for fchk=all
         #    system('mv %s/Test.FChk Test.FChk' % CurrScr)
         #if self.IPrint<2:
@@ -1171,6 +1190,66 @@ class GauIO:
         #        remove('%s/%s' % (CurrScr,tmpFile))
         #    removedirs('%s' %CurrScr)
         return
+    def kill_GauJob(self,wait=10):
+        '''Terminate the running Gaussian job of "run_GauJob" with all its
+        links, by SIGTERM and then SIGKILL after "wait" seconds'''
+        from os         import killpg
+        from signal     import SIGTERM, SIGKILL
+        import subprocess
+        GauProc = self.GauProc
+        if GauProc==None or GauProc.poll()!=None:
+            return
+        try:
+            killpg(GauProc.pid,SIGTERM)
+            GauProc.wait(wait)
+        except subprocess.TimeoutExpired:
+            killpg(GauProc.pid,SIGKILL)
+        except ProcessLookupError:
+            pass
+        return
+    def link_ChkReplace(self,iop=1):
+        '''Provide "ChkReplace.py" in WorkDir for Gxx_Environment\n\
+        iop = 1 : one more job uses it, copy it for the first one\n\
+        iop =-1 : one job is over, remove it after the last one\n\
+        The jobs are counted in ".ChkReplace.count" under a file lock,\n\
+        such that several jobs can run in one DIR together (batch mode)\
+        '''
+        import shutil
+        from os         import remove
+        from os         import stat
+        from os         import fstat
+        from os.path    import isfile
+        from fcntl      import flock, LOCK_EX
+        dst = '%s/ChkReplace.py' % self.WorkDir
+        cnt = '%s/.ChkReplace.count' % self.WorkDir
+        while True:
+            tmpf = open(cnt,'a+')
+            flock(tmpf, LOCK_EX)
+            try:                                                     # The last job may have
+                if stat(cnt).st_ino==fstat(tmpf.fileno()).st_ino:    #   removed it meanwhile
+                    break
+            except FileNotFoundError:
+                pass
+            tmpf.close()
+        tmpf.seek(0)
+        try:
+            NJob = int(tmpf.read().strip())
+        except ValueError:
+            NJob = 0
+        NJob = max(NJob+iop,0)
+        if iop>0 and (NJob==1 or not isfile(dst)):
+            shutil.copy2('%s/ChkReplace.py' % self.ModuDir, dst)
+        elif NJob==0 and isfile(dst):
+            remove(dst)
+        if NJob==0:
+            remove(cnt)
+        else:
+            tmpf.seek(0)
+            tmpf.truncate()
+            tmpf.write('%d\n' % NJob)
+            tmpf.flush()
+        tmpf.close()                                                 # Release the lock
+        return
     def copy_DataIO(self,DataIO):
         '''Copy all the IO data from DataIO'''
         from copy   import deepcopy
@@ -1235,8 +1314,13 @@ class OptHandle:
         self.Opt        = False                                      # LOGIC for geom. opt. task
         self.Conv       = False                                      # LOGIC for opt convergency
         self.Hessian    = False                                      # LOGIC for freq calc. task
+        self.Polar      = False                                      # LOGIC for polar calc. task
         self.MaxStep    = 30                                         # INTEGER, maximum step size
+        self.MaxCycle   = 0                                          # INTEGER, maximum opt steps
+                                                                     #  (0: by the number of atoms)
         self.NP            = 1                                          # INTEGER, opt points
+        self.Temp       = 298.15                                     # REAL, "temperature=" (K)
+        self.Pres       = 1.0                                        # REAL, "pressure=" (atm)
         self.OptType    = 0                                          # INTEGER :: 
                                                                      #  0 for Estimated Hessian;
                                                                      #  1 for "calcfc";
@@ -1260,6 +1344,11 @@ class OptHandle:
                         print_String(self.IOut,
                             'Maximum step size (%8.4f) in Opt.'
                             % tmpStep, 1)
+                    if tmp1.find('maxcycle')!=-1:
+                        self.MaxCycle   = int(tmp1.split('=')[1])
+                        print_String(self.IOut,
+                            'Maximum number of steps (%d) in Opt.'
+                            % self.MaxCycle, 1)
                     if tmp1.find('calcfc')!=-1:
                         self.OptType=1
                         print_String(self.IOut,
@@ -1272,8 +1361,21 @@ class OptHandle:
                 self.Hessian=True
                 print_String(self.IOut,
                     'Frequence calculation turns on', 1)
+            elif tmpOpt.find('polar')!=-1:
+                self.Polar=True
+                print_String(self.IOut,
+                    'Polarizability calculation turns on', 1)
             elif tmpOpt=='force':
                 pass
+            elif tmpOpt.split('=')[0] in ['temperature','pressure']:
+                try:
+                    if tmpOpt.startswith('temp'):
+                        self.Temp   = float(tmpOpt.split('=')[1])
+                    else:
+                        self.Pres   = float(tmpOpt.split('=')[1])
+                except (IndexError, ValueError):
+                    print_Error(self.IOut,
+                        'Invalid option "%s" for the thermochemistry' % option)
             else:
                 self.OptionList.append(option)
        #self.IOClass.OptionList    = self.OptionList[:]                 # recopy Options into IOClass
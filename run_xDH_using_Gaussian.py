@@ -13,6 +13,24 @@ __version__    = '1.0(2021)'
 iprint         = 1
 __gaussian__   = 16
 syncinterval  = 6
+batchmode      = False
+batchnproc     = None
+batchmem       = None
+cachedir       = None
+cachesize      = 64
+cacheclear     = False
+savecomp       = False
+recompute      = False
+coefffile      = None
+recomputeout   = None
+abortcheck     = True
+abortcycle     = 0
+abortstall     = 0
+derivstep      = 0.005
+fieldstep      = 10
+symmmode       = 'off'
+leanmode       = False
+profile        = False
 
 WorkDir    = os.getcwd().strip()                                 # STRING, current DIR 
 HomeDir    = os.getenv('HOME')                                   # STRING, Home DIR
@@ -65,6 +83,25 @@ def prepare_Info(version):
 def parse_input(argv,version):
     global iprint
     global __gaussian__
+    global syncinterval
+    global batchmode
+    global batchnproc
+    global batchmem
+    global cachedir
+    global cachesize
+    global cacheclear
+    global savecomp
+    global recompute
+    global coefffile
+    global recomputeout
+    global abortcheck
+    global abortcycle
+    global abortstall
+    global derivstep
+    global fieldstep
+    global symmmode
+    global leanmode
+    global profile
     tmpargv = [x.lower() for x in argv]
     if '-h' in tmpargv:
         print('Usage   :  run_xDH_using_Gaussian.py [options] file')
@@ -101,11 +138,11 @@ def parse_input(argv,version):
             print('Error in specifying the version of the selected Gaussian package "-g"\n')
             print('please use the option of "--help" for more message')
     if '-s' in tmpargv:
-        i = tmpargv.index('-f') + 1
+        i = tmpargv.index('-s') + 1
         try: 
-            syncinterval = int(tmpargv[i])
+            syncinterval = float(tmpargv[i])
         except:
-            print('Error in specifying the syncronous interval of the Gaussian output to the xDH output file "-f"\n')
+            print('Error in specifying the syncronous interval of the Gaussian output to the xDH output file "-s"\n')
             print('please use the option of "--help" for more message')
     for xkey in tmpargv:
         if xkey.find('--gaussian-version=')!=-1:
@@ -122,15 +159,177 @@ def parse_input(argv,version):
                 print('please use the option of "--help" for more message')
         if xkey.find('--sync-interval=')!=-1:
             try:
-                iprint = int(xkey.strip().split('=')[1])
+                syncinterval = float(xkey.strip().split('=')[1])
             except:
                 print('Error in specifying the sync interval of the Gaussian output to the xDH output file "--sync-interval"\n')
                 print('please use the option of "--help" for more message')
+        if xkey=='--no-abort':
+            abortcheck = False
+        if xkey.find('--abort-cycle=')!=-1:
+            try:
+                abortcycle = int(xkey.strip().split('=')[1])
+            except:
+                print('Error in specifying the SCF cycles to abort the job "--abort-cycle"\n')
+                print('please use the option of "--help" for more message')
+        if xkey.find('--abort-stall=')!=-1:
+            try:
+                abortstall = float(xkey.strip().split('=')[1])
+            except:
+                print('Error in specifying the minutes without output to abort the job "--abort-stall"\n')
+                print('please use the option of "--help" for more message')
+        if xkey.find('--deriv-step=')!=-1:
+            try:
+                derivstep = float(xkey.strip().split('=')[1])
+            except:
+                print('Error in specifying the displacement (Bohr) of the numerical derivatives "--deriv-step"\n')
+                print('please use the option of "--help" for more message')
+        if xkey.find('--field-step=')!=-1:
+            try:
+                fieldstep = int(xkey.strip().split('=')[1])
+                if fieldstep<1: raise ValueError
+            except:
+                print('Error in specifying the field (0.0001 a.u.) of the finite-field properties "--field-step"\n')
+                print('please use the option of "--help" for more message')
+        if xkey.find('--symm=')!=-1:
+            symmmode = xkey.strip().split('=')[1].lower()
+            if symmmode not in ['off','on','auto']:
+                print('Error in specifying the symmetry mode "--symm"\n')
+                print('please use the option of "--help" for more message')
+                symmmode = 'off'
+        if xkey=='--lean':
+            leanmode = True
+        if xkey=='--profile':
+            profile = True
+        if xkey=='--batch':
+            batchmode = True
+        if xkey.find('--batch-nproc=')!=-1:
+            batchmode = True
+            try:
+                batchnproc = int(xkey.strip().split('=')[1])
+            except:
+                print('Error in specifying the cores of the batch "--batch-nproc"\n')
+                print('please use the option of "--help" for more message')
+        if xkey.find('--batch-mem=')!=-1:
+            import batch_manage as batm
+            batchmode = True
+            batchmem  = batm.get_MemByte(xkey.strip().split('=')[1])
+            if batchmem is None:
+                print('Error in specifying the memory of the batch "--batch-mem"\n')
+                print('please use the option of "--help" for more message')
+    for xkey in argv:                                            # Keep the case of the path
+        if xkey.lower().find('--cache-dir=')!=-1:
+            cachedir = xkey.strip().split('=',1)[1]
+        if xkey.lower().find('--cache-size=')!=-1:
+            try:
+                cachesize = float(xkey.strip().split('=')[1])
+            except:
+                print('Error in specifying the size (MB) of the xDH cache "--cache-size"\n')
+                print('please use the option of "--help" for more message')
+        if xkey.lower()=='--cache-clear':
+            cacheclear = True
+        if xkey.lower()=='--save-comp':
+            savecomp = True
+        if xkey.lower()=='--recompute':
+            recompute = True
+        if xkey.lower().find('--coeff=')!=-1:
+            recompute = True
+            coefffile = xkey.strip().split('=',1)[1]
+        if xkey.lower().find('--recompute-out=')!=-1:
+            recompute = True
+            recomputeout = xkey.strip().split('=',1)[1]
+    if cachedir is None and os.getenv('XDH_CACHE_DIR'):
+        cachedir = os.getenv('XDH_CACHE_DIR')
+    if cachedir is not None:                                     # Before changing to the input DIR
+        cachedir = os.path.abspath(os.path.expanduser(cachedir))
+    return
+
+def get_ChildOption(argv):
+    '''The driver options of "argv" for the child jobs (batch inputs,
+    "--Link1--" sections, derivative points), which run in other DIRs
+    and at the same time: the cache is cleared once by this driver, and
+    shared by its absolute DIR'''
+    import batch_manage as batm
+
+    OptList = [x for x in batm.split_BatchArgv(argv)[0] if
+            x.lower()!='--cache-clear' and x.lower().find('--cache-dir=')==-1]
+    if cachedir is not None:                                     # Jobs share one absolute cache
+        OptList.append('--cache-dir=%s' % cachedir)
+    return OptList
+
+def run_Batch(argv):
+    import batch_manage as batm
+    from  gaussian_manage  import print_String
+
+    TargetList  = batm.split_BatchArgv(argv)[1]
+    OptList     = get_ChildOption(argv)
+    InpList     = []
+    for Target in TargetList:
+        InpList.extend(batm.get_BatchInput(Target))
+    with open('xDHBatch.sum','w') as iout:
+        print_String(iout,
+            'Start the batch of %d inputs using the Gaussian %02i package'
+            % (len(InpList),__gaussian__),2)
+        BatchClass = batm.BatchHandle(iout,InpList,OptList,
+                batchnproc,batchmem,iprint)
+        BatchClass.run_Batch()
+        for line in BatchClass.collect_Summary():
+            print(line)
+    return
+
+def run_Recompute(argv):
+    import batch_manage as batm
+    import xDH_module as xDH
+
+    OptList, TargetList = batm.split_BatchArgv(argv)
+    if len(TargetList)==0 and cachedir is not None:              # Rescore the whole cache
+        TargetList  = [cachedir]
+    RecClass    = xDH.xDHRecompute(sys.stdout,iprint)
+    if coefffile is not None:
+        RecClass.load_Coeff(coefffile)
+    RecClass.load_Comp(TargetList)
+    RecClass.get_EngyMat()
+    RecClass.save_Engy(recomputeout)
+    return
+
+def run_Link(name,LinkList):
+    '''Run the "--Link1--" sections of "name": the independent ones run
+    together on the cores of the node, the ones sharing a chkfile run in
+    order; then merge the section outputs into "name.xDH" in order'''
+    import batch_manage as batm
+    from  gaussian_manage  import print_String
+
+    DepList = batm.get_LinkDepend(LinkList)
+    try:
+        if DepList.count(None)<2:                                # One chain, run in order
+            for tmpName in LinkList:
+                run_xDH(['xDH.py',tmpName])
+        else:
+            with open('%s.xDH' % name,'w') as iout:
+                print_String(iout,
+                    'Run %d "--Link1--" sections of "%s" in %d independent chains'
+                    % (len(LinkList),name,DepList.count(None)),2)
+                OptList = get_ChildOption(sys.argv)
+                BatchClass = batm.BatchHandle(iout,LinkList,OptList,
+                        batchnproc,batchmem,iprint,DepList)
+                BatchClass.run_Batch()
+    finally:                                                     # Also after "print_Error"
+        with open('%s.xDH' % name,'a') as iout:
+            for tmpName in LinkList:                             # Merge in the input order
+                tmpName = os.path.splitext(tmpName)[0]
+                if os.path.isfile('%s.xDH' % tmpName):
+                    with open('%s.xDH' % tmpName,'r') as tmpf:
+                        iout.write(tmpf.read())
+                    os.remove('%s.xDH' % tmpName)
+                if os.path.isfile('%s.out' % tmpName):           # Screen output of the batch
+                    os.remove('%s.out' % tmpName)
+        for tmpName in LinkList:
+            os.remove(tmpName)
     return
 
 def run_xDH(argv=None):
     from os      import remove
     from os.path import isfile
+    from time    import perf_counter
     import sys
     import gaussian_manage as gaum                               # Import private modules
     import xDH_module as xDH                                     # Import private modules
@@ -155,16 +354,38 @@ def run_xDH(argv=None):
     print_String(iout,
             'Start the job of "%s" using the Gaussian %02i package'
             % (FileName,__gaussian__),2)
+    if isfile('%s.xDHAbort' % Name):                             # From the last run
+        remove('%s.xDHAbort' % Name)
+    ProfClass   = None
+    if profile:                                                  # Timing of the phases
+        ProfClass   = xDH.xDHProfile(iout,Name,iprint)
+    tmpTime   = perf_counter()
     MainIO    = gaum.GauIO(iout,'%s%s' %(Name,extension),iprint)
+    MainIO.Prof = ProfClass
 
-    MainIO.KickOptionList    = ['extraoverlay','oniom','opt']         # Disable options for xDH
+    MainIO.KickOptionList    = ['extraoverlay','oniom']               # Disable options for xDH
     MainIO.get_MachAndOpt()
     MainIO.ctrl_Option()
     MainIO.get_TCSGR()
+    if ProfClass!=None: ProfClass.add_Phase('parse',tmpTime)
 
 
+    tmpTime     = perf_counter()
     OptClass    = gaum.OptHandle(iout,MainIO,iprint)
-    R5Class    = xDH.xDH(iout,MainIO,OptClass,iprint,__gaussian__,syncinterval)
+    DerivClass  = None
+    if OptClass.Opt or OptClass.Hessian or OptClass.Polar:       # Before "xDH" modifies MainIO
+        import deriv_manage as derm
+        DerivClass  = derm.DerivHandle(iout,MainIO,OptClass,
+                get_ChildOption(sys.argv),None,None,derivstep,fieldstep,iprint)
+    CacheClass  = None
+    if cachedir is not None:                                     # Reuse the finished jobs
+        CacheClass  = xDH.xDHCache(iout,cachedir,cachesize,iprint)
+    AbortClass  = None
+    if abortcheck:                                               # Stop the hopeless job early
+        AbortClass  = xDH.xDHAbort(iout,abortcycle,abortstall,iprint)
+    R5Class    = xDH.xDH(iout,MainIO,OptClass,iprint,__gaussian__,syncinterval,
+            CacheClass,AbortClass,symmmode,leanmode)
+    if ProfClass!=None: ProfClass.add_Phase('setup',tmpTime)
     #if not MainIO.CartesianFlag:
     #    MainIO.collect_Geom()
     #DFTDClass    = gaum.DFTD(iout,MainIO,OptClass,iprint)
@@ -176,31 +397,69 @@ def run_xDH(argv=None):
         #R5Class.gen_OptionList()
         EngyPos = iout.tell()
         iout.write('%s\n' % (' '*640))
-        print_String(iout,
-            'The following is the output for preparing KS orbitals and density ::',2)
-        iout.flush()                                                 # Flush the output
-        R5Class.run_Job(sync=True)
-        R5Class.collect_EngyReal(EngyPos)                            # Bring energy print to front
-        if not OptClass.Opt:
-            if iprint>=1:
-                print_String(iout,
-                    'Job Type :: Single-Point Calculation',1)
-            else:
-                os.remove('Job_%s.log' % MainIO.JobName)
-            iout.write('='*80+'\n')
-            iout.write('**%s**\n' % (' '*76))
-            iout.write('** THE JOB OF \"%s\" IS DONE%s**\n'
-                % (Name,(' '*(54-len(Name)))))
-            iout.write('**%s**\n' % (' '*76))
-            iout.write('='*80+'\n')
-            #del DFTDClass 
-            del R5Class 
-            del OptClass 
-            del MainIO
-            return
+        if DerivClass is None:
+            print_String(iout,
+                'The following is the output for preparing KS orbitals and density ::',2)
+            iout.flush()                                             # Flush the output
+            tmpTime = perf_counter()
+            R5Class.run_Job(sync=True)
+            if ProfClass!=None: ProfClass.add_Phase('run_Job',tmpTime)
+            tmpTime = perf_counter()
+            R5Class.collect_EngyReal(EngyPos)                        # Bring energy print to front
+            if ProfClass!=None: ProfClass.add_Phase('collect',tmpTime)
+            JobType = 'Single-Point Calculation'
         else:
-            print_Error(iout,'Geom. optimization is not supported'\
-                    +' in this version')
+            JobList = []
+            if OptClass.Opt:
+                tmpTime = perf_counter()
+                Comp    = DerivClass.run_Opt()
+                JobList.append('Geometry Optimization')
+                if ProfClass!=None: ProfClass.add_Phase('opt',tmpTime)
+            if OptClass.Hessian and (OptClass.Conv or not OptClass.Opt):
+                tmpTime = perf_counter()
+                Comp    = DerivClass.run_Freq()
+                JobList.append('Frequency Calculation')
+                if ProfClass!=None: ProfClass.add_Phase('freq',tmpTime)
+            elif OptClass.Hessian:
+                print_String(iout,
+                    'Frequencies are skipped for the unconverged geometry',1)
+            if OptClass.Polar and (OptClass.Conv or not OptClass.Opt):
+                tmpTime = perf_counter()
+                Comp    = DerivClass.run_Polar()
+                JobList.append('Polarizability Calculation')
+                if ProfClass!=None: ProfClass.add_Phase('polar',tmpTime)
+            elif OptClass.Polar:
+                print_String(iout,
+                    'Polarizabilities are skipped for the unconverged geometry',1)
+            DerivClass.clean_Deriv()
+            R5Class.load_Comp(Comp)
+            iout.seek(EngyPos)                                       # Bring energy print to front
+            R5Class.print_Engy()
+            iout.seek(0,2)
+            JobType = ' and '.join(JobList)
+        if savecomp:                                                 # For "--recompute"
+            import json
+            with open('%s.xDHComp' % Name,'w') as tmpf:
+                json.dump(R5Class.dump_Comp(),tmpf)
+        if ProfClass!=None:                                          # "FILE.xDHProf"
+            ProfClass.dump('%s.xDHProf' % Name)
+        if iprint>=1:
+            print_String(iout,
+                'Job Type :: %s' % JobType,1)
+        elif isfile('Job_%s.log' % MainIO.JobName):                  # No log for a cache hit
+            os.remove('Job_%s.log' % MainIO.JobName)
+        iout.write('='*80+'\n')
+        iout.write('**%s**\n' % (' '*76))
+        iout.write('** THE JOB OF \"%s\" IS DONE%s**\n'
+            % (Name,(' '*(54-len(Name)))))
+        iout.write('**%s**\n' % (' '*76))
+        iout.write('='*80+'\n')
+        #del DFTDClass 
+        del R5Class 
+        del DerivClass
+        del OptClass 
+        del MainIO
+        return
     else:
         print_Error(iout, 
             'Normal Gaussian job does not need the xDH4Gau package') 
@@ -220,6 +479,17 @@ import os
 import os.path
 
 parse_input(sys.argv,__version__)
+if cacheclear and cachedir is not None:                          # Empty the xDH cache
+    import xDH_module as xDH
+    xDH.xDHCache(sys.stdout,cachedir,cachesize,iprint).clear_Comp()
+    if len(sys.argv)==1 or sys.argv[-1][0]=='-':                 # No input file is given
+        sys.exit(0)
+if recompute:                                                    # No Gaussian at all
+    run_Recompute(sys.argv)
+    sys.exit(0)
+if batchmode:                                                    # Batch of many inputs
+    run_Batch(sys.argv)
+    sys.exit(0)
 
 FileName    = sys.argv[-1]
 WorkDir     = os.getcwd().strip()
@@ -232,17 +502,20 @@ f=open('%s%s' %(name,extension),'r')
 if f.read().lower().find('--link1--')!=-1:  #For InputFile containing "--link1--"
     f.seek(0)
     SperateInputList=re.split('--[Ll][Ii][Nn][Kk]1--',f.read())
+    LinkList=[]
     tmpI=0
     for input in SperateInputList:
-        tmpf=open('Link%d.com' %tmpI,'w')
+        # Prefix the section with the input name, so that
+        # the inputs in one DIR can run together in batch mode
+        tmpf=open('%s-Link%d.com' %(name,tmpI),'w')
         tmpf.write(input.strip())
         tmpf.write(' \n')
         tmpf.write(' \n')
         tmpf.write(' \n')
         tmpf.close()
-        run_xDH(['xDH.py','Link%d.com' %tmpI])
-        os.remove('Link%d.com' %tmpI)
+        LinkList.append('%s-Link%d.com' %(name,tmpI))
         tmpI+=1
+    run_Link(name,LinkList)
 else:    #for InputFile without "--Link1--"
    run_xDH(['xDH.py','%s%s' %(name,extension)]) 
 os.chdir(WorkDir)
@@ -56,9 +56,15 @@ class xDH:
                   }
     SP_OptList  = ['IOP(5/33=1)','NoSymm']
 
-    def __init__(self, IOut, GauIO, OptClass, bugctrl=1, gauversion=16, syncinterval=12):
+    def __init__(self, IOut, GauIO, OptClass, bugctrl=1, gauversion=16, syncinterval=12,
+            cache=None, abort=None, symm='off', lean=False):
         '''\
-        Open the current filename, and initialize some variable belonged to current object\
+        Open the current filename, and initialize some variable belonged to current object\n\
+        cache is an "xDHCache" object to reuse the xDH components of the same job\n\
+        abort is an "xDHAbort" object to stop the Gaussian job on fatal conditions\n\
+        symm is "off", "on" or "auto" for the point-group symmetry by "check_Symm"\n\
+        lean is True for the Gaussian log of the normal print level, "#n" without\n\
+        "IOP(5/33=1)", which still has the lines of "xDHLogParser"\
         ''' 
         from re     import compile
         from os.path    import isfile
@@ -73,6 +79,11 @@ class xDH:
         self.GauVersion = gauversion
         self.SyncInterval = syncinterval
         self.WorkDir    = getcwd().strip()                           # STRING, current DIR 
+        self.Cache      = cache                                      # xDHCache or None
+        self.CacheKey   = None                                       # STRING, key of this job
+        self.CacheHit   = False                                      # LOGIC, components cached
+        self.Abort      = abort                                      # xDHAbort or None
+        self.Symm       = False                                      # LOGIC, symmetry kept in SP
 
         self.xDHPara    = []
         FC_Method   = 'FC'                                           # Frozen-core xDH is the default choice
@@ -128,8 +139,20 @@ class xDH:
         if self.TurnOn:
             if not self.OptClass.Opt:                                # For sp calc.
                 GauIO.OptionList.append(self.xDHPara[0])
+                self.Symm = self.check_Symm(symm)
+                GauIO.Lean  = lean
                 for iterm in xDH.SP_OptList:
+                    if iterm=='NoSymm' and self.Symm:
+                        continue
+                    if iterm=='IOP(5/33=1)' and lean:                # SCF print
+                        continue
                     GauIO.OptionList.append(iterm)
+                if lean:
+                    print_String(self.IOut,
+                        'The lean log is experimental, not validated against "#p"',1)
+                if lean and self.Abort!=None and self.Abort.MaxCycle>0:
+                    print_String(self.IOut,
+                        'The lean log has no SCF cycles for "--abort-cycle"',1)
                 GauIO.OptionList.append('ExtraOverlay')
                 GauIO.MoreOptionDict['extraoverlay']    = 1
                 tmpExOvLay = xDH.SP_ExOvLay[FC_Method][:]
@@ -170,15 +193,58 @@ class xDH:
             else:                                                    # For geom. opt. calc.
                 pass
         return
+    def check_Symm(self, mode='off'):
+        '''\
+        Return True to keep the point-group symmetry of Gaussian in the SCF\n\
+        and MP2 steps, by "mode" of "--symm":\n\
+          off  : "NoSymm" as always\n\
+          on   : no "NoSymm"\n\
+          auto : no "NoSymm" if the D2h subgroup, which Gaussian uses beyond\n\
+                 the SCF, has 4 operations or more (needs NumPy and the\n\
+                 Cartesian geometry)\n\
+        The xDH components are total energies, the same in any orientation.\n\
+        "NoSymm", "Symmetry" or "Field" in the input decides by itself\
+        '''
+        GauIO   = self.GauIO
+        if mode=='off':
+            return False
+        for option in GauIO.OptionList:
+            tmpOpt  = option.lower().strip()
+            if tmpOpt.startswith('nosymm') or tmpOpt.startswith('field'):
+                print_String(self.IOut,
+                    'Symmetry turns off by "%s" in the input' % option,1)
+                return False
+            elif tmpOpt.startswith('symm'):
+                print_String(self.IOut,
+                    'Symmetry is controlled by "%s" in the input' % option,1)
+                return True
+        if mode=='on':
+            print_String(self.IOut,'Symmetry turns on',1)
+            return True
+        if not GauIO.CartesianFlag or len(GauIO.CList)!=GauIO.NAtom:
+            print_String(self.IOut,
+                'Symmetry turns off for the geometry not in Cartesian coordinates',1)
+            return False
+        try:
+            import numpy as np
+            import deriv_manage as derm
+        except ImportError:
+            print_String(self.IOut,'Symmetry turns off without NumPy',1)
+            return False
+        XSym, Center, Frame, Group, OpList = derm.get_PointGroup(
+                np.array(GauIO.CList,dtype=float).reshape(-1)/derm.Br2Ang,GauIO.IAn)
+        print_String(self.IOut,
+            'Symmetry turns %s: the point group has %d operations, %d in the'
+            ' D2h subgroup' % ('on' if len(OpList)>=4 else 'off',
+            len(Group),len(OpList)),1)
+        return len(OpList)>=4
     def __del__(self):
         '''\
         To del several class variables\
         '''
         if self.OptClass.Opt and self.TurnOn:
-            del self.One
-            del self.Two
-            del self.MP2
-            del self.HF
+            for x in ['One','Two','MP2','HF']:
+                if hasattr(self,x): delattr(self,x)
         return
     def collect_EngyReal(self,EngyPos=None):
         '''\
@@ -187,52 +253,67 @@ class xDH:
         if EngyPos!=None: self.IOut.seek(EngyPos)
 
         if not self.OptClass.Opt:                                    # For SG Calc::GauIO.EngyReal
-            self.collect_xDH_component()
-            # now print the energies of the scf procedure and the selected xDH
-            tmpEnergy = self.EnoXC
-            for x,y in zip(self.ExcList,xDH.xDHDict[self.xDH][2:]):
-                tmpEnergy = tmpEnergy + x*y
-            print_String(self.IOut,
-                'E(%s)%s= %16.8f A.U.    E(%s)%s= %16.8f A.U.'  
-                %(self.Method,' '*(9-len(self.Method)),\
-                self.EngySCF,\
-                self.xDH,' '*(9-len(self.xDH)),\
-                tmpEnergy),2)
-            if len(xDH.xDHFamily[self.xDHPara[1]])>1:
-                print_String(self.IOut,'%s belongs to the family of %s'
-                        % (self.xDH, self.xDHPara[1]),1)
-            for xMethod in xDH.xDHFamily[self.xDHPara[1]]:
-                if xMethod.lower() == self.xDH.lower(): continue
-                tmpEnergy = self.EnoXC
-                #print(xDH.xDHDict[xMethod][2:])
-                for x,y in zip(self.ExcList,xDH.xDHDict[xMethod][2:]):
-                    tmpEnergy = tmpEnergy + x*y
+            if not self.CacheHit:
+                self.collect_xDH_component()
+                if self.CacheKey!=None:
+                    self.Cache.save_Comp(self.CacheKey,self.dump_Comp())
+            self.print_Engy()
+            if self.CacheHit:                                        # After the energy block
+                self.IOut.seek(0,2)
                 print_String(self.IOut,
-                    'E(%s)%s= %16.8f A.U.'  
-                    %(xMethod,' '*(9-len(xMethod)),\
-                    tmpEnergy),1)
+                    'xDH components are loaded from the cache (%s)'
+                    % self.CacheKey[:16],1)
         return self.GauIO.EngyReal
-    def cut_Log(self,pos,currdir):
-        '''get log information in synchronism,\n
-        return current end position'''
-        with open('%s/Job_%s.log' \
-                %(currdir.value,self.GauIO.JobName), 'r') as tf:
-            tf.seek(pos.value)
-            tmpString   = tf.read()
-            if pos.value != tf.tell():
-                try:
-                    tmpString   = self.filter_Log(tmpString)
-                    self.IOut.write(tmpString)
-                    self.IOut.flush()
-                except:
-                    print('Error happens in cut_Log()')
-                pos.value   = tf.tell()
-            else:
-                pass
-            return
-        print(('Error happens in cut_Log() to open %s/Job_%s.log' \
-                % (currdir.value, self.GauIO.JobName)))
+    def get_Engy(self,xMethod=None):
+        '''Return the energy of "xMethod" (default: the selected xDH)
+        from the loaded xDH components'''
+        if xMethod==None: xMethod = self.xDH
+        tmpEnergy = self.EnoXC
+        for x,y in zip(self.ExcList,xDH.xDHDict[xMethod][2:]):
+            tmpEnergy = tmpEnergy + x*y
+        return tmpEnergy
+    def print_Engy(self):
+        '''Print the energies of the scf procedure and the xDH family,
+        and keep the energy of the selected xDH in "GauIO.EngyReal"'''
+        self.GauIO.EngyReal = self.get_Engy()
+        print_String(self.IOut,
+            'E(%s)%s= %16.8f A.U.    E(%s)%s= %16.8f A.U.'  
+            %(self.Method,' '*(9-len(self.Method)),\
+            self.EngySCF,\
+            self.xDH,' '*(9-len(self.xDH)),\
+            self.GauIO.EngyReal),2)
+        if len(xDH.xDHFamily[self.xDHPara[1]])>1:
+            print_String(self.IOut,'%s belongs to the family of %s'
+                    % (self.xDH, self.xDHPara[1]),1)
+        for xMethod in xDH.xDHFamily[self.xDHPara[1]]:
+            if xMethod.lower() == self.xDH.lower(): continue
+            print_String(self.IOut,
+                'E(%s)%s= %16.8f A.U.'  
+                %(xMethod,' '*(9-len(xMethod)),\
+                self.get_Engy(xMethod)),1)
         return
+    def cut_Log(self,tf):
+        '''get log information in synchronism from the open log "tf",\n
+        return True if the log grows'''
+        from time   import perf_counter
+        tmpTime     = perf_counter()
+        tmpString   = tf.read()                                      # From the last position
+        if tmpString=='':
+            return False
+        self.LogParser.feed(tmpString)                               # The same text, read once
+        if self.Abort!=None:
+            self.Abort.feed(tmpString)
+        if self.GauIO.Prof!=None:
+            self.GauIO.Prof.feed(tmpString)
+        try:
+            tmpString   = self.filter_Log(tmpString)
+            self.IOut.write(tmpString)
+            self.IOut.flush()
+        except:
+            print('Error happens in cut_Log()')
+        if self.GauIO.Prof!=None:
+            self.GauIO.Prof.add_Phase('sync_log',tmpTime)
+        return True
     def run_Job(self,sync=True):
         '''\
         Interface to call the Gaussian package\
@@ -241,39 +322,60 @@ class xDH:
         from os     import removedirs
         from os     import listdir
         from os.path import isfile
-        from multiprocessing    import Process, Manager
-        from time               import sleep                         # sync log file by threads
+        from threading          import Thread                        # sync log file by threads
+        from time   import perf_counter
+        if self.Cache!=None and not self.OptClass.Opt:               # Reuse the cached job
+            self.CacheKey = self.Cache.get_Key(self)
+            tmpDict = self.Cache.load_Comp(self.CacheKey)
+            if tmpDict!=None:
+                self.load_Comp(tmpDict)
+                self.CacheHit = True
+                return
         if sync==True:
             if not self.OptClass.Opt:
+                tmpTime = perf_counter()
                 self.GauIO.form_Inp()
-                Pos     = Manager().Value('i',0)
-                SyncValue = Manager().Value('c','.script')
-                MainJob = Process(target = self.GauIO.run_GauJob,
-                        args=(self.GauVersion,SyncValue))
+                if self.GauIO.Prof!=None:
+                    self.GauIO.Prof.add_Phase('form_Inp',tmpTime)
+                self.LogParser = xDHLogParser()                      # Components while syncing
+                self.LogFilter = xDHLogFilter()                      # Output while syncing
+                SyncValue = xDHLogSync(self.SyncInterval)            # ".value" is the scratch DIR
+                def run_GauThread():
+                    try:
+                        self.GauIO.run_GauJob(self.GauVersion,SyncValue)
+                    finally:
+                        SyncValue.set_Done()                         # Wake up the sync at once
+                MainJob = Thread(target = run_GauThread)
                 MainJob.start()
-                while MainJob.is_alive():
-                    if not isfile('%s/Job_%s.log' \
+                LogFile = None
+                Grow    = False
+                while True:
+                    Done    = SyncValue.wait_Event(Grow)
+                    if LogFile==None and isfile('%s/Job_%s.log' \
                             %(SyncValue.value,self.GauIO.JobName)):
-                            sleep(self.SyncInterval)
-                            continue
-                    #print(Pos.value, SyncValue.value)
-                    SyncJob = Process(target = self.cut_Log,
-                        args=(Pos,SyncValue))
-                    SyncJob.start()
-                    SyncJob.join()
-                    #print('sync log during Gaussian procedure')
-                    sleep(self.SyncInterval)
-                else:
-                    #SyncValue.value   = './'
-                    SyncJob = Process(target = self.cut_Log,
-                        args=(Pos,SyncValue))
-                    SyncJob.start()
-                    SyncJob.join()
-                    #print('sync log after Gaussian procedure')
+                        LogFile = open('%s/Job_%s.log' \
+                            %(SyncValue.value,self.GauIO.JobName),'r')
+                    if LogFile!=None:
+                        Grow    = self.cut_Log(LogFile)
+                    if Done: break
+                    if self.Abort!=None and not self.Abort.Killed and\
+                            (self.Abort.Reason!=None or self.Abort.check_Stall()):
+                        self.Abort.Killed = True                     # Free the cores at once
+                        self.GauIO.kill_GauJob()
+                MainJob.join()
+                if LogFile!=None:                                    # The rest after exit
+                    self.cut_Log(LogFile)
+                    LogFile.close()
+                    self.LogParser.close()
+                    self.IOut.write(self.LogFilter.flush())
+                    self.IOut.flush()
+                SyncValue.close()
                 if self.IPrint<2:
                     for tmpFile in listdir('%s' % SyncValue.value):
                         remove('%s/%s' % (SyncValue.value,tmpFile))
                     removedirs('%s' %SyncValue.value)
+                if self.Abort!=None and self.Abort.Reason!=None:
+                    self.abort_Job(self.Abort.Reason,self.Abort.Detector)
             else:
                 pass
         else:                                                        # Do not sync log file
@@ -286,84 +388,57 @@ class xDH:
     def collect_xDH_component(self):
         '''Collect each energy terms of DFT method'''
         # LogFile of single point calculation is valid but not geometry optimization job
-        from re        import compile
-        with open('Job_%s.log' %self.GauIO.JobName,'r') as self.rf:
-            self.rf.seek(0)
-            lsf = self.rf.read()
-        tmpP = 'SCF Done:  E\([RU](?P<scf>\S*)\)\s*=\s*(?P<engy>-?\d+.\d+)\s*A.U. after\s*(?P<snum>\d+) cycles'
-        p1   = compile(tmpP)
-        p1p  = p1.search(lsf)
-        if p1p:
-            self.Method = p1p.group('scf')
-            self.CycNum = int(p1p.group('snum'))
-            self.EngySCF = float(p1p.group('engy'))
+        LogParser = getattr(self,'LogParser',None)
+        if LogParser==None or not LogParser.Closed or\
+                not LogParser.is_Complete(self.GauIO.MoreOptionDict['scrf']!=0):
+            LogParser = xDHLogParser()                               # Stream the copied log
+            with open('Job_%s.log' %self.GauIO.JobName,'r') as self.rf:
+                while True:
+                    tmpString = self.rf.read(LogParser.BlockSize)
+                    if tmpString=='': break
+                    LogParser.feed(tmpString)
+            LogParser.close()
+        if LogParser.EngySCF!=None:
+            self.Method = LogParser.Method
+            self.CycNum = LogParser.CycNum
+            self.EngySCF = LogParser.EngySCF
         else:
-            print_Error(self.IOut,\
+            self.abort_Job(\
             'Error happens in collecting the SCF energies from %s/Job_%s.log' \
                     % (self.WorkDir,self.GauIO.JobName))
         if self.Method == 'B+HF-LYP': self.Method = 'B3LYP'
 
         #print('debug: %s%s%s' %(self.Method,self.CycNum, self.EngyReal))
 
-        tmpP = 'ENTVJ=\s*(?P<EnoSCF>-?\d*.\d*)\s*Ex=\s*(?P<Ex>-?\d*.\d*)\s*Ec'
-        tmpP = tmpP+'=\s*(?P<Ec>-?\d*.\d*)\s*ETotM2e=\s*(?P<ETot>-?\d*.\d*)'
-        p2   = compile(tmpP)
-        p2p  = p2.findall(lsf)
-        self.xDHComp = []
-        if p2p:
-           for xList in p2p:
-               #print(xList)
-               self.xDHComp.append([float(x) for x in xList])
-        else:
-            print_Error(self.IOut,\
+        self.xDHComp = LogParser.xDHComp[:]
+        if len(self.xDHComp)<3:                                      # HF, LDA and GGA parts
+            self.abort_Job(\
             'Error happens in collecting the DFT components from %s/Job_%s.log' \
-                    % (self.GauIO.JobName))
+                    % (self.WorkDir,self.GauIO.JobName))
 
         self.xDHPT2 = []
-        tmpP = 'alpha-beta\s*T2 =\s*(?P<t2>-?\d*.\d*D[-|+]\d\d)\s*E2=\s*(?P<os>-?\d*.\d*D[-|+]\d\d)'
-        p3   = compile(tmpP)
-        p3p  = p3.search(lsf)
-        if p3p:
-            self.xDHPT2.append(float(p3p.group('os').replace('D','E')))
-        else:
-            print_Error(self.IOut,\
-            'Error happens in collecting the alpha-beta osPT2 from %s/Job_%s.log' \
-                    % (self.GauIO.JobName))
-        tmpP = 'alpha-alpha\s*T2 =\s*(?P<t2>-?\d*.\d*D[-|+]\d\d)\s*E2=\s*(?P<ss>-?\d*.\d*D[-|+]\d\d)'
-        p4   = compile(tmpP)
-        p4p  = p4.search(lsf)
-        if p4p:
-            self.xDHPT2.append(float(p4p.group('ss').replace('D','E')))
-        else:
-            print_Error(self.IOut,\
-            'Error happens in collecting the alpha-alpha ssPT2 from %s/Job_%s.log' \
-                    % (self.GauIO.JobName))
-        tmpP = 'beta-beta\s*T2 =\s*(?P<t2>-?\d*.\d*D[-|+]\d\d)\s*E2=\s*(?P<ss>-?\d*.\d*D[-|+]\d\d)'
-        p5   = compile(tmpP)
-        p5p  = p5.search(lsf)
-        if p5p:
-            self.xDHPT2[1]=self.xDHPT2[1]+float(p5p.group('ss').replace('D','E'))
-        else:
-            print_Error(self.IOut,\
-            'Error happens in collecting the beta-beta ssPT2 from %s/Job_%s.log' \
-                    % (self.GauIO.JobName))
+        for key, tmpS in zip(['alpha-beta','alpha-alpha','beta-beta'],
+                ['alpha-beta osPT2','alpha-alpha ssPT2','beta-beta ssPT2']):
+            if LogParser.PT2Dict[key]==None:
+                self.abort_Job(\
+                'Error happens in collecting the %s from %s/Job_%s.log' \
+                        % (tmpS,self.WorkDir,self.GauIO.JobName))
+        self.xDHPT2.append(LogParser.PT2Dict['alpha-beta'])
+        self.xDHPT2.append(LogParser.PT2Dict['alpha-alpha']+LogParser.PT2Dict['beta-beta'])
         #Now re-order the xDH components:
         self.EnoXC = self.xDHComp[0][0]
 
         if self.GauIO.MoreOptionDict['scrf']!=0:
-            tmpP = 'Erf\(P\)=\s*(?P<scrf>-?\d*.\d*)'
-            p6   = compile(tmpP)
-            p6p  = p6.findall(lsf)
-            if p6p:
-                self.SCRF = float(p6p[-1])
+            if LogParser.SCRF!=None:
+                self.SCRF = LogParser.SCRF
                 print_String(self.IOut,
                     'Solvation energy is considered by %s'
                     % self.GauIO.MoreOptionDict['scrf'],1)
                 self.EnoXC =  self.EnoXC + self.SCRF
             else:
-                print_Error(self.IOut,\
+                self.abort_Job(\
                 'Error happens in collecting the solvation energy from %s/Job_%s.log' \
-                        % (self.GauIO.JobName))
+                        % (self.WorkDir,self.GauIO.JobName))
                        
         self.ExcList = [self.xDHComp[0][1],       #Ex[HF]
                         self.xDHComp[1][1],       #Ex[LDA]
@@ -374,68 +449,810 @@ class xDH:
                         self.xDHPT2[1],           #Ec[ssPT2]
                        ]
         return
+    def abort_Job(self,Reason,Detector='collect'):
+        '''Record the failure of this job in "JobName.xDHAbort" (JSON),
+        and abort the process by "print_Error"'''
+        from json       import dump
+        from time       import strftime
+        tmpDict = {\
+            'JobName' : self.GauIO.JobName,  'Detector': Detector,
+            'Reason'  : Reason,              'Time'    : strftime('%Y-%m-%d %H:%M:%S')\
+                  }
+        with open('%s/%s.xDHAbort' % (self.WorkDir,self.GauIO.JobName),'w') as tmpf:
+            dump(tmpDict,tmpf)
+        print_Error(self.IOut,'The job is aborted by "%s": %s' % (Detector,Reason))
+        return
+    def dump_Comp(self):
+        '''Return the xDH components of this job as a dictionary'''
+        tmpDict = {\
+            'JobName': self.GauIO.JobName,  'xDH'    : self.xDH,
+            'Family' : self.xDHPara[1],     'Method' : self.Method,
+            'EngySCF': self.EngySCF,        'EnoXC'  : self.EnoXC,
+            'ExcList': self.ExcList[:],
+            'SCRF'   : getattr(self,'SCRF',None)\
+                  }
+        return tmpDict
+    def load_Comp(self,tmpDict):
+        '''Load the xDH components from the dictionary of "dump_Comp"'''
+        self.Method     = tmpDict['Method']
+        self.EngySCF    = tmpDict['EngySCF']
+        self.EnoXC      = tmpDict['EnoXC']
+        self.ExcList    = tmpDict['ExcList'][:]
+        if tmpDict['SCRF']!=None:
+            self.SCRF   = tmpDict['SCRF']
+        return
     def filter_Log(self,cons):
         '''filter log information for routine use'''
-        import re
-        p6 = re.compile(r'(?P<cons1>[^$]*)'                  # Input
-                r'\sAdditional\soverlay\scards:\n\s*-*\n\s*8/7=1,10=[0-9]{1,2}/1;\s9/16=-[0-9]/6;\s6//8;\n\s*-*\n'                                                          # seperate 1
-                r'(?P<cons2>[^$]*)'                          # SCF+MP2
-                r'\s\(Enter\s[^\n]*l608.exe\)\n'             #           # seperate 2
-                r'(?P<cons3>[^$]*)'                          # Detail DFT portions
-                r'\sLeave\sLink\s*608\sat\s[a-z]{1,3}\s[a-z]{1,3}\s*[0-9]{1,2}\s*[0-9]{1,2}:[0-9]{1,2}:[0-9]{1,2}\s[0-9]{1,4},sMaxMem=\s*[0-9]*\scpu:\s*[0-9]*.[0-9]\n'     # seperate 3
-                r'(?P<cons4>[^$]*$)',                        # End
-                re.VERBOSE|re.IGNORECASE)
+        if getattr(self,'LogFilter',None)==None:                     # Kept through the whole log
+            self.LogFilter = xDHLogFilter()
+        return self.LogFilter.feed(cons)
 
-        p5 = re.compile(r'(?P<cons1>[^$]*)'                  # Input
-                r'\sAdditional\soverlay\scards:\n\s*-*\n\s*8/7=1,10=[0-9]{1,2}/1;\s9/16=-[0-9]/6;\s6//8;\n\s*-*\n'                                                          # seperate 1
-                r'(?P<cons2>[^$]*)'                          # SCF+MP2
-                r'\s\(Enter\s[^\n]*l608.exe\)\n'             #           # seperate 2
-                r'(?P<cons3>[^$]*$)',                        # Detail DFT portions
-                re.VERBOSE|re.IGNORECASE)
 
-        p4 = re.compile(r'(?P<cons2>[^$]*)'                  # SCF+MP2
-                r'\s\(Enter\s[^\n]*l608.exe\)\n'             #           # seperate 2
-                r'(?P<cons3>[^$]*)'                          # Detail DFT portions
-                r'\sLeave\sLink\s*608\sat\s[a-z]{1,3}\s[a-z]{1,3}\s*[0-9]{1,2}\s*[0-9]{1,2}:[0-9]{1,2}:[0-9]{1,2}\s[0-9]{1,4},sMaxMem=\s*[0-9]*\scpu:\s*[0-9]*.[0-9]\n'     # seperate 3
-                r'(?P<cons4>[^$]*$)',                        # End
-                re.VERBOSE|re.IGNORECASE)
+class xDHAbort:
+    '''\
+    Detectors of the fatal conditions in the live log of "xDH.run_Job".\n\
+    "feed" runs every detector of "DetectorList" on the complete lines\n\
+    synced from the log; a detector returns the reason (STRING) to stop\n\
+    the job, or None. The first reason is kept in "Reason", its detector\n\
+    in "Detector", and "xDH.run_Job" then kills the Gaussian job and\n\
+    records both in "JobName.xDHAbort". More detectors can be plugged in\n\
+    by "add_Detector".\n\
+      check_Error : the known error strings of Gaussian in "ErrorList"\n\
+      check_Cycle : more SCF cycles than "maxcycle" (0 to bypass)\n\
+      check_ENTVJ : Link 608 is left without the "ENTVJ=" components\n\
+      check_Stall : no growth of the log in "stall" minutes (0 to bypass)\
+    '''
+    ErrorList   = [\
+            'Error termination', 'Convergence failure', 'Erroneous write',
+            'Out-of-memory error', 'galloc:  could not allocate memory'\
+                  ]
+    def __init__(self, IOut, maxcycle=0, stall=0, bugctrl=1):
+        from re     import compile
+        from time   import time
+        self.IOut       = IOut
+        self.IPrint     = bugctrl
+        self.MaxCycle   = maxcycle                                   # INTEGER, SCF cycles
+        self.Stall      = stall*60                                   # FLOAT, seconds
+        self.Tail       = ''                                         # STRING, partial line
+        self.LastGrow   = time()                                     # FLOAT, last log growth
+        self.Reason     = None                                       # STRING, why to stop
+        self.Detector   = None                                       # STRING, who stops it
+        self.Killed     = False                                      # LOGIC, job is killed
+        self.NENTVJ     = 0                                          # INTEGER, ENTVJ= found
+        self.pCycle     = compile(r'\n Cycle\s+(\d+)\s')
+        self.pLeave     = compile(r'\n\s*Leave\s+Link\s+608\s')
+        self.DetectorList = [self.check_Error, self.check_Cycle, self.check_ENTVJ]
+        return
+    def add_Detector(self, func):
+        '''Plug in "func(tmpString)", which returns the reason or None'''
+        self.DetectorList.append(func)
+        return
+    def feed(self, tmpString):
+        '''Run the detectors on the complete lines, return the reason'''
+        from time   import time
+        self.LastGrow   = time()
+        tmpString   = self.Tail + tmpString
+        iend        = tmpString.rfind('\n') + 1
+        self.Tail   = tmpString[iend:]
+        if iend==0 or self.Reason!=None:
+            return self.Reason
+        tmpString   = '\n' + tmpString[:iend]                         # Every line after "\n"
+        for func in self.DetectorList:
+            Reason  = func(tmpString)
+            if Reason!=None:
+                self.Reason     = Reason
+                self.Detector   = getattr(func,'__name__','detector')
+                if self.IPrint>=2:
+                    print_String(self.IOut,
+                        '"%s" stops the job: %s' % (self.Detector,Reason),1)
+                break
+        return self.Reason
+    def check_Error(self, tmpString):
+        for key in xDHAbort.ErrorList:
+            i = tmpString.find(key)
+            if i!=-1:
+                return tmpString[tmpString.rfind('\n',0,i)+1:
+                        tmpString.find('\n',i)].strip()
+        return None
+    def check_Cycle(self, tmpString):
+        if self.MaxCycle<=0 or tmpString.find(' Cycle ')==-1:
+            return None
+        for xCycle in self.pCycle.findall(tmpString):
+            if int(xCycle)>self.MaxCycle:
+                return 'SCF does not converge in %d cycles' % self.MaxCycle
+        return None
+    def check_ENTVJ(self, tmpString):
+        self.NENTVJ += tmpString.count('ENTVJ=')
+        if self.NENTVJ<3 and self.pLeave.search(tmpString):
+            return 'Link 608 is left without the "ENTVJ=" components'
+        return None
+    def check_Stall(self):
+        '''Return True if the log does not grow in "Stall" seconds'''
+        from time   import time
+        if self.Stall<=0 or self.Reason!=None:
+            return self.Reason!=None
+        if time()-self.LastGrow>self.Stall:
+            self.Reason     = 'No output in the log for %g minutes' % (self.Stall/60)
+            self.Detector   = 'check_Stall'
+            return True
+        return False
 
-        p3 = re.compile(r'(?P<cons1>[^$]*)'                  # Input
-                r'\sAdditional\soverlay\scards:\n\s*-*\n\s*8/7=1,10=[0-9]{1,2}/1;\s9/16=-[0-9]/6;\s6//8;\n\s*-*\n'                                                          # seperate 1
-                r'(?P<cons2>[^$]*$)',                        # SCF+MP2
-                re.VERBOSE|re.IGNORECASE)
+class xDHLogSync:
+    '''\
+    Wait for the growth of the log in the scratch DIR of "GauIO.run_GauJob"\n\
+    or the end of the Gaussian job, for the log sync of "xDH.run_Job".\n\
+    The DIR is watched by inotify (Linux) when it is available; otherwise\n\
+    the wait backs off from 0.05 s to "interval" while the log does not\n\
+    grow. The end of the job is sent through a pipe by "set_Done", so it\n\
+    is noticed at once in both cases.\n\
+    "value" is set to the scratch DIR by "GauIO.run_GauJob"\
+    '''
+    IN_MODIFY       = 0x00000002
+    IN_CLOSE_WRITE  = 0x00000008
+    IN_CREATE       = 0x00000100
+    IN_NONBLOCK     = 0o4000
+    IN_CLOEXEC      = 0o2000000
+    MinDelay        = 0.05                                           # FLOAT, first wait (s)
 
-        p2 = re.compile(r'(?P<cons2>[^$]*)'                  # SCF+MP2
-                r'\s\(Enter\s[^\n]*l608.exe\)\n'             #           # seperate 2
-                r'(?P<cons3>[^$]*$)',                        # Detail DFT portions
-                re.VERBOSE|re.IGNORECASE)
+    def __init__(self, interval=12):
+        from os     import pipe
+        self.value      = '.script'                                  # STRING, scratch DIR
+        self.Interval   = max(interval,xDHLogSync.MinDelay)          # FLOAT, longest wait (s)
+        self.Delay      = xDHLogSync.MinDelay
+        self.PipeR, self.PipeW = pipe()                              # Sent by "set_Done"
+        self.INotify    = self.init_INotify()                        # INTEGER, fd or None
+        self.WatchDir   = None                                       # STRING, DIR watched
+        return
+    def init_INotify(self):
+        '''Return the inotify fd, or None without inotify'''
+        try:
+            import ctypes
+            self.LibC   = ctypes.CDLL(None, use_errno=True)
+            fd = self.LibC.inotify_init1(xDHLogSync.IN_NONBLOCK|xDHLogSync.IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd<0:
+            return None
+        return fd
+    def add_Watch(self):
+        '''Watch the scratch DIR once "run_GauJob" creates it'''
+        from os.path    import isdir
+        if self.INotify==None or self.WatchDir!=None or not isdir(self.value):
+            return
+        wd = self.LibC.inotify_add_watch(self.INotify, self.value.encode(),
+                xDHLogSync.IN_MODIFY|xDHLogSync.IN_CLOSE_WRITE|xDHLogSync.IN_CREATE)
+        if wd<0:                                                     # Use the back-off instead
+            self.close_INotify()
+            return
+        self.WatchDir   = self.value
+        return
+    def wait_Event(self, grow=False):
+        '''Wait for the next change, return True if the job is over'''
+        from os         import read
+        from select     import select
+        self.add_Watch()
+        if self.WatchDir!=None:                                      # Waken by inotify
+            tmpList = [self.PipeR, self.INotify]
+            Delay   = self.Interval
+        else:                                                        # Adaptive back-off
+            if grow:
+                self.Delay = xDHLogSync.MinDelay
+            else:
+                self.Delay = min(self.Delay*2, self.Interval)
+            tmpList = [self.PipeR]
+            Delay   = self.Delay
+        ReadList = select(tmpList,[],[],Delay)[0]
+        if self.INotify!=None and self.INotify in ReadList:
+            try:
+                while read(self.INotify,65536): pass                 # Drain the events
+            except BlockingIOError:
+                pass
+            if self.PipeR not in ReadList:                           # Gather a burst of writes
+                ReadList = select([self.PipeR],[],[],xDHLogSync.MinDelay)[0]
+        return self.PipeR in ReadList
+    def set_Done(self):
+        '''The Gaussian job is over'''
+        from os     import write
+        write(self.PipeW,b'x')
+        return
+    def close_INotify(self):
+        from os     import close
+        if self.INotify!=None:
+            close(self.INotify)
+        self.INotify    = None
+        self.WatchDir   = None
+        return
+    def close(self):
+        from os     import close
+        self.close_INotify()
+        close(self.PipeR)
+        close(self.PipeW)
+        return
 
-        p1 = re.compile(r'(?P<cons3>[^$]*)'                  # Detail DFT portions
-                r'\sLeave\sLink\s*608\sat\s[a-z]{1,3}\s[a-z]{1,3}\s*[0-9]{1,2}\s*[0-9]{1,2}:[0-9]{1,2}:[0-9]{1,2}\s[0-9]{1,4},sMaxMem=\s*[0-9]*\scpu:\s*[0-9]*.[0-9]\n'     # seperate 3
-                r'(?P<cons4>[^$]*$)',                        # End
-                re.VERBOSE|re.IGNORECASE)
+class xDHLogFilter:
+    '''\
+    Filter the Gaussian log for routine use, as "cut_Log" copies it into\n\
+    the xDH output. Two blocks are dropped:\n\
+      1) " Additional overlay cards:" with its dashed frame and cards\n\
+      2) from " (Enter .../l608.exe)" to " Leave Link  608 at ..." included,\n\
+         i.e. the detail DFT portions of the xDH components\n\
+    It is a two-state machine ("In608") working on complete lines, and it\n\
+    keeps its state between the pieces given to "feed", so a block may be\n\
+    split by any sync boundary. Only the keywords are searched in the text,\n\
+    and each character is scanned once per keyword\
+    '''
+    def __init__(self):
+        from re     import compile
+        self.Tail       = ''                                         # STRING, pending text
+        self.In608      = False                                      # LOGIC, in Link 608
+        self.pDash      = compile(r'\s*-+\s*$')                      # Frame of overlay cards
+        self.pLeave     = compile(r'\s*Leave\s+Link\s+608\s')
+        self.pEnter     = compile(r'\s*\(Enter\s\S*l608\.exe\)\s*$')
+        return
+    def feed(self, tmpString):
+        '''Return the filtered text of the complete lines received'''
+        tmpString   = self.Tail + tmpString
+        iend        = tmpString.rfind('\n') + 1
+        self.Tail   = tmpString[iend:]
+        OutList     = []
+        i           = 0
+        while i<iend:
+            if self.In608:                                           # Drop to "Leave Link 608"
+                j = tmpString.find('Leave Link',i,iend)
+                while j!=-1:
+                    ibeg    = tmpString.rfind('\n',0,j) + 1
+                    inext   = tmpString.find('\n',j) + 1
+                    if self.pLeave.match(tmpString,ibeg,inext):
+                        break
+                    j = tmpString.find('Leave Link',inext,iend)
+                if j==-1:
+                    i = iend
+                else:
+                    self.In608 = False
+                    i = inext
+                continue
+            j1 = tmpString.find('Additional overlay cards:',i,iend)
+            j2 = tmpString.find('l608.exe)',i,iend)
+            if j1==-1 and j2==-1:
+                OutList.append(tmpString[i:iend])
+                break
+            j       = j2 if j1==-1 or (j2!=-1 and j2<j1) else j1
+            ibeg    = tmpString.rfind('\n',0,j) + 1
+            inext   = tmpString.find('\n',j) + 1
+            OutList.append(tmpString[i:ibeg])
+            if j==j2:
+                if self.pEnter.match(tmpString,ibeg,inext):
+                    self.In608 = True
+                else:
+                    OutList.append(tmpString[ibeg:inext])
+                i = inext
+                continue
+            iover   = self.get_Overlay(tmpString,ibeg,inext,iend)
+            if iover==None:                                          # Wait for the frame
+                self.Tail = tmpString[ibeg:iend] + self.Tail
+                break
+            elif iover==-1:                                          # Not the overlay cards
+                OutList.append(tmpString[ibeg:inext])
+                i = inext
+            else:
+                i = iover
+        return ''.join(OutList)
+    def get_Overlay(self, tmpString, ibeg, inext, iend):
+        '''Return the end of the overlay cards which begin at "ibeg",
+        -1 if they are not, or None if the closing frame is not received'''
+        if tmpString[ibeg:inext].strip()!='Additional overlay cards:':
+            return -1
+        NDash   = 0
+        for k in range(12):                                          # Frame, cards and frame
+            if inext>=iend:
+                return None
+            i       = inext
+            inext   = tmpString.find('\n',i,iend) + 1
+            if self.pDash.match(tmpString,i,inext):
+                NDash += 1
+                if NDash==2:
+                    return inext
+            elif NDash==0:
+                return -1
+        return -1
+    def flush(self):
+        '''Return the pending text at the end of the log'''
+        tmpString   = self.Tail
+        self.Tail   = ''
+        if self.In608:
+            return ''
+        return tmpString
 
-        if p1.match(cons):                                           # End (- "cons3")
-            tmpGroup    = p1.match(cons)
-            cons        = tmpGroup.group('cons4')
-        elif p2.match(cons):                                         # (SCF+MP2) (- "cons3")
-            tmpGroup    = p2.match(cons)
-            cons        = tmpGroup.group('cons2')
-        elif p3.match(cons):                                         # Input+(SCF+MP2)
-            tmpGroup    = p3.match(cons)
-            cons        =\
-                    tmpGroup.group('cons1') + tmpGroup.group('cons2')
-        elif p4.match(cons):                                         # (SCF+MP2)+End (- "cons3")
-            tmpGroup    = p4.match(cons)
-            cons        = \
-                    tmpGroup.group('cons2') + tmpGroup.group('cons4')
-        elif p5.match(cons):                                         # Input+(SCF+MP2) (- "cons3")
-            tmpGroup    = p5.match(cons)
-            cons        =\
-                    tmpGroup.group('cons1') + tmpGroup.group('cons2')
-        elif p6.match(cons):                                         # Input+(SCF+MP2)+End
-            tmpGroup    = p6.match(cons)
-            cons        = tmpGroup.group('cons1') + \
-                    tmpGroup.group('cons2') + tmpGroup.group('cons4')
-        return cons
+class xDHLogParser:
+    '''\
+    Single-pass parser of the Gaussian log for the xDH components.\n\
+    "feed" takes the text of the log in pieces of any size, as "cut_Log"\n\
+    tails it; only the lines with the keywords below are matched, and the\n\
+    memory is bounded by one piece plus the partial last line.\n\
+      SCF Done  : the first one -> "Method", "CycNum", "EngySCF"\n\
+      ENTVJ=    : all of them   -> "xDHComp" [[EnoSCF, Ex, Ec, ETot],...]\n\
+      T2 =      : the first alpha-beta, alpha-alpha, beta-beta -> "PT2Dict"\n\
+      Erf(P)=   : the last one  -> "SCRF"\n\
+    The regexes are the ones "collect_xDH_component" used on the whole log\
+    '''
+    BlockSize   = 4*1024**2                                          # Read the log by 4 MB
+    def __init__(self):
+        from re     import compile
+        self.Tail       = ''                                         # STRING, partial line
+        self.Closed     = False                                      # LOGIC, the log is over
+        self.Method     = None
+        self.CycNum     = None
+        self.EngySCF    = None
+        self.xDHComp    = []
+        self.PT2Dict    = {'alpha-beta':None,'alpha-alpha':None,'beta-beta':None}
+        self.SCRF       = None
+        self.pSCF       = compile(r'SCF Done:  E\([RU](?P<scf>\S*)\)\s*=\s*(?P<engy>-?\d+.\d+)'
+                r'\s*A.U. after\s*(?P<snum>\d+) cycles')
+        self.pENTVJ     = compile(r'ENTVJ=\s*(?P<EnoSCF>-?\d*.\d*)\s*Ex=\s*(?P<Ex>-?\d*.\d*)\s*Ec'
+                r'=\s*(?P<Ec>-?\d*.\d*)\s*ETotM2e=\s*(?P<ETot>-?\d*.\d*)')
+        self.pT2        = compile(r'(?P<spin>alpha-beta|alpha-alpha|beta-beta)'
+                r'\s*T2 =\s*(?P<t2>-?\d*.\d*D[-|+]\d\d)\s*E2=\s*(?P<e2>-?\d*.\d*D[-|+]\d\d)')
+        self.pSCRF      = compile(r'Erf\(P\)=\s*(?P<scrf>-?\d*.\d*)')
+        return
+    def feed(self, tmpString):
+        '''Parse the next piece of the log'''
+        tmpString   = self.Tail + tmpString
+        iend        = tmpString.rfind('\n') + 1                        # Complete lines only
+        self.Tail   = tmpString[iend:]
+        if iend>0:
+            self.parse_Lines(tmpString,iend)
+        return
+    def close(self):
+        '''Parse the last line without "\\n", the log is over'''
+        if self.Tail!='':
+            tmpString   = self.Tail + '\n'
+            self.Tail   = ''
+            self.parse_Lines(tmpString,len(tmpString))
+        self.Closed     = True
+        return
+    def get_Lines(self, tmpString, key, iend):
+        '''Yield the lines of tmpString[:iend] containing "key"'''
+        i = tmpString.find(key,0,iend)
+        while i!=-1:
+            ibeg    = tmpString.rfind('\n',0,i) + 1
+            inext   = tmpString.find('\n',i) + 1
+            yield tmpString[ibeg:inext]
+            i = tmpString.find(key,inext,iend)
+        return
+    def parse_Lines(self, tmpString, iend):
+        '''Match the keyword lines of tmpString[:iend], which ends by "\\n"'''
+        if self.EngySCF==None:
+            for line in self.get_Lines(tmpString,'SCF Done:',iend):
+                p1p = self.pSCF.search(line)
+                if p1p:
+                    self.Method  = p1p.group('scf')
+                    self.CycNum  = int(p1p.group('snum'))
+                    self.EngySCF = float(p1p.group('engy'))
+                    break
+        for line in self.get_Lines(tmpString,'ENTVJ=',iend):
+            for xList in self.pENTVJ.findall(line):
+                self.xDHComp.append([float(x) for x in xList])
+        if None in self.PT2Dict.values():
+            for line in self.get_Lines(tmpString,'T2 =',iend):
+                for p3p in self.pT2.finditer(line):
+                    if self.PT2Dict[p3p.group('spin')]==None:
+                        self.PT2Dict[p3p.group('spin')] = \
+                                float(p3p.group('e2').replace('D','E'))
+        for line in self.get_Lines(tmpString,'Erf(P)=',iend):
+            for xScrf in self.pSCRF.findall(line):
+                self.SCRF = float(xScrf)
+        return
+    def is_Complete(self, scrf=False):
+        '''Return True if all the xDH components are found'''
+        return self.EngySCF!=None and len(self.xDHComp)>=3 and \
+                None not in self.PT2Dict.values() and \
+                (not scrf or self.SCRF!=None)
+
+class xDHProfile:
+    '''\
+    Wall time of the phases of one xDH job by the monotonic clock, and the\n\
+    time of the Gaussian links from the lines\n\
+      " Leave Link  502 at ..., MaxMem= ... cpu: 12.3 elap: 3.4"\n\
+    of the log ("#p" only, not in "--lean"), fed by "xDH.cut_Log".\n\
+    Phases of the same name add up. The phases are\n\
+      parse     : "GauIO", "get_MachAndOpt", "ctrl_Option" and "get_TCSGR"\n\
+      setup     : "OptHandle", "DerivHandle", "xDHCache" and "xDH"\n\
+      run_Job   : "xDH.run_Job", including\n\
+        form_Inp  : the Gaussian input\n\
+        scratch   : the scratch DIR and "ChkReplace.py" in "GauIO.run_GauJob"\n\
+        gaussian  : the process of "Gxx_Environment"; the time beyond the\n\
+                    links is the scratch setup and chkfile copy of the script\n\
+        copy_log  : the log and chkfile copied back\n\
+        sync_log  : "cut_Log", parallel to "gaussian"\n\
+      collect   : "xDH.collect_EngyReal"\n\
+      opt, freq, polar : "DerivHandle.run_Opt", "run_Freq" and "run_Polar"\n\
+    "dump" writes them into the JSON file "NAME.xDHProf"\
+    '''
+    Version     = 1
+
+    def __init__(self, IOut, JobName, bugctrl=1):
+        '''\
+        Start the clock of the job\
+        '''
+        from re     import compile
+        from time   import perf_counter
+        self.IOut       = IOut
+        self.IPrint     = bugctrl
+        self.JobName    = JobName
+        self.Start      = perf_counter()
+        self.PhaseDict  = {}                                         # {Name: [count, seconds]}
+        self.LinkDict   = {}                                         # {Link: [count, cpu, elap]}
+        self.Tail       = ''                                         # STRING, partial line
+        self.pLeave     = compile(r'Leave\s+Link\s+(?P<link>\d+)\s+at\s.*?cpu:\s*'
+                r'(?P<cpu>\d+\.\d*)(\s+elap:\s*(?P<elap>\d+\.\d*))?')
+        return
+    def add_Phase(self, Name, Start):
+        '''Add the time since "Start" of "time.perf_counter" to the phase
+        "Name"'''
+        from time   import perf_counter
+        tmpList     = self.PhaseDict.setdefault(Name,[0,0.0])
+        tmpList[0] += 1
+        tmpList[1] += perf_counter()-Start
+        return
+    def feed(self, tmpString):
+        '''Collect the link time from the next piece of the log'''
+        tmpString   = self.Tail + tmpString
+        iend        = tmpString.rfind('\n') + 1                        # Complete lines only
+        self.Tail   = tmpString[iend:]
+        i = tmpString.find('Leave Link',0,iend)
+        while i!=-1:
+            inext   = tmpString.find('\n',i) + 1
+            p1p     = self.pLeave.match(tmpString,i,inext)
+            if p1p:
+                tmpList     = self.LinkDict.setdefault('l%s' % p1p.group('link'),[0,0.0,0.0])
+                tmpList[0] += 1
+                tmpList[1] += float(p1p.group('cpu'))
+                tmpList[2] += float(p1p.group('elap') or 0.0)
+            i = tmpString.find('Leave Link',inext,iend)
+        return
+    def dump(self, FileName):
+        '''Write the profile into the JSON file "FileName", and print it'''
+        from json   import dump
+        from time   import perf_counter
+        Total       = perf_counter()-self.Start
+        LinkElap    = sum([x[2] for x in self.LinkDict.values()])
+        tmpDict     = {\
+            'Version'  : xDHProfile.Version,   'JobName'  : self.JobName,
+            'Total'    : Total,
+            'Phases'   : [{'Name':x, 'Count':y[0], 'Seconds':y[1]}
+                    for x, y in self.PhaseDict.items()],
+            'Links'    : [{'Link':x, 'Count':y[0], 'CPU':y[1], 'Elap':y[2]}
+                    for x, y in sorted(self.LinkDict.items(),key=lambda z: int(z[0][1:]))],
+            'Environment': self.PhaseDict['gaussian'][1]-LinkElap
+                    if 'gaussian' in self.PhaseDict and LinkElap>0.0 else None\
+                  }
+        with open(FileName,'w') as tmpf:
+            dump(tmpDict,tmpf,indent=1)
+        TmpList     = ['%-16s%6d%12.3f' % (x['Name'],x['Count'],x['Seconds'])
+                for x in tmpDict['Phases']]
+        TmpList    += ['%-16s%6d%12.3f%12.3f' % (x['Link'],x['Count'],x['Elap'],x['CPU'])
+                for x in tmpDict['Links']]
+        if tmpDict['Environment']!=None:
+            TmpList.append('%-16s%6s%12.3f' % ('Environment','',tmpDict['Environment']))
+        TmpList.append('%-16s%6s%12.3f' % ('Total','',Total))
+        print_List(self.IOut,TmpList,2,
+            'Profile of the job in "%s" (phase or link, count, seconds, cpu) ::'
+            % FileName)
+        return
+
+class xDHCache:
+    '''\
+    Persistent on-disk cache of the xDH components "EnoXC", "ExcList" and\n\
+    "EngySCF", such that the same job is never sent to Gaussian twice.\n\
+    Key  : SHA-256 of the normalized job, including the options without\n\
+           "GauIO.MachineList", the charge, spin and geometry without\n\
+           "GauIO.TitleList", "GauIO.RestList" with the basis set,\n\
+           "GauIO.ExOvList" from "xDH.SP_ExOvLay" (FC or AE), the xDH family\n\
+           with its "xDH.xDHComp", and the Gaussian version.\n\
+           Changing "xDHComp", "SP_ExOvLay" or the IOPs in "SP_OptList"\n\
+           changes the key, so the stale entries are never hit and will be\n\
+           evicted. Bump "xDHCache.Version" to invalidate all entries.\n\
+           A lean job ("GauIO.Lean") has its own key, without "IOP(5/33=1)",\n\
+           until its components are validated against the "#p" job.\n\
+    Value: one JSON file per job, from "xDH.dump_Comp".\n\
+    The total size is bounded by "maxsize" (in MB); the least recently\n\
+    used entries are evicted first.\
+    '''
+    Version     = 1
+
+    def __init__(self, IOut, cachedir, maxsize=64, bugctrl=1):
+        '''\
+        Open (or create) the cache directory\
+        '''
+        from os         import makedirs
+        from os.path    import abspath
+        from os.path    import expanduser
+        self.IOut       = IOut
+        self.IPrint     = bugctrl
+        self.CacheDir   = abspath(expanduser(cachedir))
+        self.MaxSize    = int(maxsize*1024**2)                       # INTEGER, bytes
+        makedirs(self.CacheDir, exist_ok=True)
+        return
+    def get_Key(self, xDHClass):
+        '''Return the key of the normalized job, or None if the job can
+        not be cached (geometry or guess from a checkpoint file)'''
+        from hashlib    import sha256
+        from json       import dumps
+        from os.path    import isfile
+        from re         import compile
+        GauIO   = xDHClass.GauIO
+        if GauIO.MoreOptionDict['checkpoint']==1 or\
+                GauIO.MoreOptionDict['allcheck']==1:
+            return None
+        for option in GauIO.OptionList:
+            if option.lower().find('guess')!=-1:                     # Converged from some guess
+                return None
+        p1      = compile(r'\s+')
+        OptList = set([x.lower() for x in GauIO.OptionList]) - set(['p','sp'])
+        OptList = sorted(OptList)
+        if GauIO.CartesianFlag and len(GauIO.CList)==GauIO.NAtom:
+            GeomList = [[x.lower()]+['%.8f' % y for y in z]
+                    for x, z in zip(GauIO.AtLabel,GauIO.CList)]
+        else:
+            GeomList = [p1.sub(' ',x.strip().lower())
+                    for x in GauIO.GeomList + GauIO.ZListR]
+        RestList = []
+        for line in GauIO.RestList:
+            line = line.strip()
+            if line[:1]=='@' and isfile(line[1:]):                   # External basis set file
+                with open(line[1:],'rb') as tmpf:
+                    line = 'file:%s' % sha256(tmpf.read()).hexdigest()
+            RestList.append(p1.sub(' ',line.lower()))
+        tmpDict = {\
+            'Version'  : xDHCache.Version,
+            'Gaussian' : xDHClass.GauVersion,
+            'xDHPara'  : xDHClass.xDHPara[:2],
+            'xDHComp'  : xDH.xDHComp[xDHClass.xDHPara[1]],
+            'ExOvList' : [x.strip() for x in GauIO.ExOvList],
+            'OptionList': OptList,
+            'Charge'   : GauIO.Charge,
+            'Spin'     : GauIO.Spin,
+            'GeomList' : GeomList,
+            'RestList' : RestList\
+                  }
+        return sha256(dumps(tmpDict,sort_keys=True).encode()).hexdigest()
+    def load_Comp(self, key):
+        '''Return the cached components of "key", or None if missing'''
+        from json       import load
+        from os         import utime
+        if key==None:
+            return None
+        FileName = '%s/%s.json' % (self.CacheDir,key)
+        try:
+            with open(FileName,'r') as tmpf:
+                tmpDict = load(tmpf)
+            utime(FileName)                                          # Mark it recently used
+        except (OSError, ValueError):
+            return None
+        return tmpDict
+    def save_Comp(self, key, tmpDict):
+        '''Save the components of "key", and evict the old entries'''
+        from json       import dump
+        from os         import getpid
+        from os         import replace
+        if key==None:
+            return
+        tmpDict = dict(tmpDict, Key=key)
+        tmpName = '%s/.%s.%d' % (self.CacheDir,key,getpid())
+        with open(tmpName,'w') as tmpf:
+            dump(tmpDict,tmpf)
+        replace(tmpName,'%s/%s.json' % (self.CacheDir,key))          # Atomic for batch jobs
+        self.evict_Comp()
+        return
+    def evict_Comp(self):
+        '''Remove the least recently used entries beyond "MaxSize"'''
+        from os         import scandir
+        from os         import remove
+        EntryList = []
+        TotSize   = 0
+        for entry in scandir(self.CacheDir):
+            if not entry.name.endswith('.json'): continue
+            try:
+                tmpStat = entry.stat()
+            except OSError:
+                continue
+            EntryList.append((tmpStat.st_mtime,tmpStat.st_size,entry.path))
+            TotSize += tmpStat.st_size
+        if TotSize<=self.MaxSize:
+            return
+        EntryList.sort()
+        for mtime, size, path in EntryList:
+            if TotSize<=self.MaxSize: break
+            try:
+                remove(path)
+            except OSError:
+                pass
+            TotSize -= size
+        if self.IPrint>=2:
+            print_String(self.IOut,
+                'The xDH cache is trimmed to %d KB' % (TotSize//1024),1)
+        return
+    def clear_Comp(self):
+        '''Remove all entries of the cache'''
+        from os         import scandir
+        from os         import remove
+        for entry in scandir(self.CacheDir):
+            if entry.name.endswith('.json'):
+                remove(entry.path)
+        return
 
+class xDHRecompute:
+    '''\
+    Evaluate the xDH functionals offline from the stored components.\n\
+    E(xDH) = EnoXC + ExcList . Coeff for every job and functional, so\n\
+    all jobs (N) and functionals (M) are one N x 7 by 7 x M product.\n\
+    The components come from the "xDHCache" directory, the "*.xDHComp"\n\
+    files of "--save-comp", or a ".npz" archive saved by "save_Engy".\n\
+    A functional is applied only to the jobs of its own family, as the\n\
+    components of "xDH@B3LYP" and "xDH@PBE0" differ; others are "nan".\n\
+    NumPy is needed by this class only\
+    '''
+    def __init__(self, IOut, bugctrl=1):
+        '''\
+        Prepare the functionals of "xDH.xDHDict"\
+        '''
+        self.IOut       = IOut
+        self.IPrint     = bugctrl
+        self.NameList   = []                                         # LIST, job names
+        self.FamilyList = []                                         # LIST, xDH family of jobs
+        self.MethodList = []                                         # LIST, DFA of jobs
+        self.EngySCF    = None                                       # ARRAY(N), E(DFA)
+        self.EnoXC      = None                                       # ARRAY(N)
+        self.ExcMat     = None                                       # ARRAY(N,7), ExcList
+        self.FuncList   = []                                         # LIST, functionals
+        self.FuncFamily = []                                         # LIST, family of functionals
+        self.CoeffMat   = None                                       # ARRAY(M,7)
+        self.EngyMat    = None                                       # ARRAY(N,M), E(xDH)
+        for key in xDH.xDHFamily:
+            for xMethod in xDH.xDHFamily[key]:
+                self.FuncList.append(xMethod)
+                self.FuncFamily.append(key)
+        self.CoeffMat   = [xDH.xDHDict[x][2:] for x in self.FuncList]
+        return
+    def load_Coeff(self, FileName):
+        '''\
+        Append the user-supplied functionals from "FileName", one per line\n\
+          NAME  FAMILY  Ex_HF Ex_LDA Ex_GGA Ec_LDA Ec_GGA Ec_osPT2 Ec_ssPT2\n\
+        like "XYG3  xDH@B3LYP  0.8033 -0.0140 0.2107 0.0 0.6789 0.3211 0.3211".\n\
+        A known NAME is replaced by the new coefficients\
+        '''
+        from os.path    import isfile
+        if not isfile(FileName):
+            print_Error(self.IOut,
+                'The coefficient file "%s" does not exist' % FileName)
+        with open(FileName,'r') as tmpf:
+            for line in tmpf:
+                tmpList = line.split('#')[0].split()
+                if len(tmpList)==0: continue
+                if len(tmpList)!=9 or tmpList[1] not in xDH.xDHFamily:
+                    print_Error(self.IOut,
+                        'Error in the coefficient line of "%s": %s'
+                        % (FileName,line.strip()))
+                try:
+                    tmpCoeff = [float(x) for x in tmpList[2:]]
+                except ValueError:
+                    print_Error(self.IOut,
+                        'Error in the coefficient line of "%s": %s'
+                        % (FileName,line.strip()))
+                if tmpList[0] in self.FuncList:
+                    i = self.FuncList.index(tmpList[0])
+                    self.FuncFamily[i]  = tmpList[1]
+                    self.CoeffMat[i]    = tmpCoeff
+                else:
+                    self.FuncList.append(tmpList[0])
+                    self.FuncFamily.append(tmpList[1])
+                    self.CoeffMat.append(tmpCoeff)
+        if self.IPrint>=2:
+            print_String(self.IOut,
+                '%d functionals are loaded from "%s"'
+                % (len(self.FuncList),FileName),1)
+        return
+    def load_Comp(self, TargetList):
+        '''\
+        Load the xDH components of the jobs in "TargetList", each being\n\
+        a directory, a glob pattern, a ".json"/".xDHComp" file or a ".npz"\
+        '''
+        from glob       import glob
+        from json       import load
+        from os.path    import isdir
+        from os.path    import join
+        import numpy as np
+        FileList = []
+        for Target in TargetList:
+            if isdir(Target):
+                FileList.extend(sorted(glob(join(Target,'*.json')) +
+                    glob(join(Target,'*.xDHComp'))))
+            else:
+                FileList.extend(sorted(glob(Target)) or [Target])
+        EngySCF = []
+        EnoXC   = []
+        ExcMat  = []
+        NpzList = []
+        for FileName in FileList:
+            if FileName.endswith('.npz'):
+                NpzList.append(FileName)
+                continue
+            try:
+                with open(FileName,'r') as tmpf:
+                    tmpDict = load(tmpf)
+                self.NameList.append(tmpDict['JobName'])
+                self.FamilyList.append(tmpDict['Family'])
+                self.MethodList.append(tmpDict['Method'])
+                EngySCF.append(tmpDict['EngySCF'])
+                EnoXC.append(tmpDict['EnoXC'])
+                ExcMat.append(tmpDict['ExcList'])
+            except (OSError, ValueError, KeyError):
+                print_String(self.IOut,
+                    'Skip "%s" without valid xDH components' % FileName,1)
+        self.FamilyList = np.array(self.FamilyList,dtype=str)
+        self.EngySCF    = np.array(EngySCF,dtype=float)
+        self.EnoXC      = np.array(EnoXC,dtype=float)
+        self.ExcMat     = np.array(ExcMat,dtype=float).reshape(-1,7)
+        for FileName in NpzList:                                     # Archived components
+            with np.load(FileName) as tmpNpz:
+                self.NameList.extend(tmpNpz['NameList'].tolist())
+                self.FamilyList = np.concatenate((self.FamilyList,tmpNpz['FamilyList']))
+                self.MethodList.extend(tmpNpz['MethodList'].tolist())
+                self.EngySCF = np.concatenate((self.EngySCF,tmpNpz['EngySCF']))
+                self.EnoXC   = np.concatenate((self.EnoXC,tmpNpz['EnoXC']))
+                self.ExcMat  = np.concatenate((self.ExcMat,tmpNpz['ExcMat']))
+        if len(self.NameList)==0:
+            print_Error(self.IOut,
+                'No xDH components are found in %s' % ' '.join(TargetList))
+        print_String(self.IOut,
+            'xDH components of %d jobs are loaded' % len(self.NameList),1)
+        return
+    def get_EngyMat(self):
+        '''\
+        Return E(xDH) of all jobs (rows) and functionals (columns)\
+        '''
+        import numpy as np
+        CoeffMat    = np.array(self.CoeffMat,dtype=float)
+        self.EngyMat = self.EnoXC[:,None] + self.ExcMat.dot(CoeffMat.T)
+        FamilyArr   = np.asarray(self.FamilyList)
+        RowCode     = np.full(len(FamilyArr),-1)                     # Family index of jobs
+        ColCode     = np.full(len(self.FuncFamily),-1)               # Family index of functionals
+        for i, key in enumerate(xDH.xDHFamily):
+            RowCode[FamilyArr==key] = i
+            ColCode[[x==key for x in self.FuncFamily]] = i
+        self.EngyMat[RowCode[:,None]!=ColCode[None,:]] = np.nan      # Not the same family
+        return self.EngyMat
+    def save_Engy(self, FileName=None):
+        '''\
+        Write the energies as a table into "FileName" (or "IOut").\n\
+        A ".npz" file keeps the energies with the components, so that\n\
+        it can be loaded again by "load_Comp"\
+        '''
+        import numpy as np
+        if self.EngyMat is None:
+            self.get_EngyMat()
+        if FileName!=None and FileName.endswith('.npz'):
+            np.savez(FileName,
+                NameList=np.array(self.NameList),
+                FamilyList=np.array(self.FamilyList),
+                MethodList=np.array(self.MethodList),
+                EngySCF=self.EngySCF, EnoXC=self.EnoXC, ExcMat=self.ExcMat,
+                FuncList=np.array(self.FuncList), EngyMat=self.EngyMat)
+            print_String(self.IOut,
+                'E(xDH) of %d jobs and %d functionals are saved in "%s"'
+                % (len(self.NameList),len(self.FuncList),FileName),1)
+            return
+        LineList = ['%-20s%18s' % ('Job','E(SCF)') +
+                ''.join(['%18s' % ('E(%s)' % x) for x in self.FuncList])]
+        LineList.append('-'*len(LineList[0]))
+        for i, name in enumerate(self.NameList):
+            LineList.append('%-20s%18.8f' % (name,self.EngySCF[i]) +
+                ''.join(['%18s' % ('' if np.isnan(x) else '%.8f' % x)
+                    for x in self.EngyMat[i]]))
+        if FileName!=None:
+            with open(FileName,'w') as tmpf:
+                tmpf.write('\n'.join(LineList)+'\n')
+        else:
+            print_List(self.IOut,LineList,2,
+                'E(xDH) recomputed from the stored components :')
+        return